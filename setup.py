@@ -16,5 +16,6 @@ setup(
     url="https://github.com/vantage6/v6-kaplan-meier-py",
     packages=find_packages(),
     python_requires=">=3.10",
-    install_requires=["vantage6-algorithm-tools", "numpy", "pandas"],
+    install_requires=["vantage6-algorithm-tools", "numpy", "pandas", "cryptography"],
+    extras_require={"parquet": ["pyarrow"]},
 )
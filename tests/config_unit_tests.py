@@ -8,7 +8,9 @@ from tests.federated_solution import get_federated_solution
 
 
 # Datasets to be used for testing
-data_path = os.path.join(os.getcwd(), 'vtg_km', 'local')
+data_path = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'v6-kaplan-meier-py', 'local'
+)
 data_paths = []
 for i in range(1, 4):
     data_paths.append(os.path.join(data_path, f'data{i}.csv'))
@@ -1,69 +1,80 @@
 # -*- coding: utf-8 -*-
 import os
+import numpy as np
 import pandas as pd
 
 from io import StringIO
 from typing import List, Tuple
 from vantage6.algorithm.tools.mock_client import MockAlgorithmClient
-from vtg_km.v6_km_utils import aggregate_unique_event_times
-from vtg_km.v6_km_utils import launch_subtask
 from .enconding_env_vars import _encode_env_var
 
 
 def get_federated_solution(
         data_paths: list, filter_value: str, time_column_name: str,
-        censor_column_name: str, bin_size: int = None
+        censor_column_name: str
 ) -> Tuple[List[int], List[pd.DataFrame], pd.DataFrame]:
     """ Federated solution for Kaplan-Meier to be used for unit testing
 
     Parameters:
 
     - data_paths: List with data paths for testing data
-    - filter_value: Value to be filtered using specified column from node configuration
+    - filter_value: Cohort to select, using the node preprocessing
     - time_column_name: Name for event time column
     - censor_column_name: Name for censor column
-    - bin_size: Size of the bin, when None binning method is not used
 
     Returns:
 
     - Unique event times, local events tables, and global events table
     """
 
-    # Datasets to be used for federated Kaplan-Meier
+    # Datasets to be used for federated Kaplan-Meier, the cohort is selected by
+    # the preprocessing of the nodes
+    preprocessing = [{
+        'function': 'filter_range',
+        'parameters': {
+            'column': 'COHORT_DEFINITION_ID',
+            'min_': int(filter_value),
+            'max_': int(filter_value),
+            'include_min': True,
+            'include_max': True,
+        },
+    }]
     datasets = []
     for data_path in data_paths:
-        data = {'database': data_path, 'db_type': 'csv'}
+        data = {
+            'database': data_path,
+            'db_type': 'csv',
+            'preprocessing': preprocessing
+        }
         datasets.append([data])
 
     # MockAlgorithmClient does not handle node-side environment variables
     # so we set them here, to their encoded values
-    os.environ['V6_FILTER_COLUMN'] = _encode_env_var('COHORT_DEFINITION_ID')
-    os.environ['V6_FILTER_VALUES_ALLOWED'] = _encode_env_var('1029')
+    os.environ['KAPLAN_MEIER_TYPE_NOISE'] = _encode_env_var('NONE')
 
     # Setting up mock client for testing purposes
     org_ids = [i for i in range(len(datasets))]
     client = MockAlgorithmClient(
         datasets=datasets,
         organization_ids=org_ids,
-        module='vtg_km'
+        module='v6-kaplan-meier-py'
     )
 
     # Computing unique global times
-    unique_event_times = aggregate_unique_event_times(
-        client, org_ids, time_column_name, bin_size, filter_value
+    local_unique_event_times = _launch_subtask(
+        client, 'get_unique_event_times', org_ids,
+        time_column_name=time_column_name
     )
+    unique_event_times = np.unique(
+        np.concatenate(local_unique_event_times)
+    ).tolist()
 
     # Computing local tables
-    method_kwargs = dict(
+    local_events_tables = _launch_subtask(
+        client, 'get_km_event_table', org_ids,
         time_column_name=time_column_name,
-        unique_event_times=list(unique_event_times),
         censor_column_name=censor_column_name,
-        bin_size=bin_size,
-        filter_value=filter_value
-    )
-    method = 'get_km_event_table'
-    local_events_tables = launch_subtask(
-        client, method, org_ids, **method_kwargs
+        unique_event_times=unique_event_times
     )
 
     # Computing global table
@@ -77,3 +88,13 @@ def get_federated_solution(
           )
 
     return unique_event_times, local_events_tables, km
+
+
+def _launch_subtask(
+        client: MockAlgorithmClient, method: str, org_ids: List[int], **kwargs
+) -> list:
+    """ Run a partial method on all organizations and collect the results """
+    task = client.task.create(
+        input_={'method': method, 'kwargs': kwargs}, organizations=org_ids
+    )
+    return client.wait_for_results(task['id'])
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+""" Mock federation of many simulated nodes, to test the algorithm at scale
+
+The ``MockAlgorithmClient`` of vantage6 runs every node in the same process and
+copies the client, including the data of all nodes, for every node of every task.
+This harness only implements the parts of the client that are used by
+``kaplan_meier_central``, and runs the partial tasks of the nodes in a process pool.
+Every node reads its own data file for every task, like a real node does.
+
+Usage:
+
+    python -m tests.mock_federation --nodes 200 --records 10000 --processes 8
+"""
+import os
+import time
+import argparse
+import importlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+from io import StringIO
+from typing import List, Union
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+from lifelines import KaplanMeierFitter
+from .enconding_env_vars import _encode_env_var
+
+MODULE = 'v6-kaplan-meier-py'
+TIME_COLUMN_NAME = 'TIME_AT_RISK'
+CENSOR_COLUMN_NAME = 'MORTALITY_FLAG'
+
+
+def generate_node_frames(
+        number_of_nodes: int, records_per_node: int, seed: int = 0
+) -> List[pd.DataFrame]:
+    """ Generate survival data for a number of nodes
+
+    Event times are exponentially distributed with a different median for
+    every node, and records are censored at a uniformly distributed time.
+
+    Parameters:
+
+    - number_of_nodes: Number of nodes to generate data for
+    - records_per_node: Number of records of every node
+    - seed: Seed of the random generator
+
+    Returns:
+
+    - Data of every node
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for node in range(number_of_nodes):
+        scale = rng.uniform(500, 2000)
+        event_times = rng.exponential(scale, size=records_per_node)
+        censor_times = rng.uniform(0, 3 * scale, size=records_per_node)
+        frames.append(pd.DataFrame({
+            TIME_COLUMN_NAME: np.ceil(np.minimum(event_times, censor_times))
+            .astype(int),
+            CENSOR_COLUMN_NAME: (event_times <= censor_times).astype(int),
+        }))
+    return frames
+
+
+def generate_node_data(
+        directory: str, number_of_nodes: int, records_per_node: int,
+        seed: int = 0
+) -> List[str]:
+    """ Generate survival data for a number of nodes, see
+    ``generate_node_frames``, and store it in CSV files
+
+    Parameters:
+
+    - directory: Directory in which the data files are stored
+    - number_of_nodes: Number of nodes to generate data for
+    - records_per_node: Number of records of every node
+    - seed: Seed of the random generator
+
+    Returns:
+
+    - Paths of the CSV files, one for every node
+    """
+    paths = []
+    frames = generate_node_frames(number_of_nodes, records_per_node, seed)
+    for node, frame in enumerate(frames):
+        path = os.path.join(directory, f'node_{node}.csv')
+        frame.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def _run_partial(
+        method_name: str, kwargs: dict, data: Union[str, pd.DataFrame]
+):
+    """ Run a partial method of the algorithm on the data of one node """
+    method = getattr(importlib.import_module(MODULE), method_name)
+    # the partial methods may modify the data, e.g. by adding noise
+    df = pd.read_csv(data) if isinstance(data, str) else data.copy()
+    return method(**kwargs, mock_data=[df])
+
+
+class MockFederationClient:
+    """ Algorithm client of a mock federation with one node per data file
+
+    Parameters:
+
+    - data_paths: Paths of the CSV files of the nodes, or the data of the
+      nodes itself
+    - processes: Number of processes used to run the nodes, use 1 to run the
+      nodes one after another in this process
+
+    The runs of a method crash for the organizations that are listed for the
+    method in ``failing_organizations``, which can be used to test resuming an
+    analysis.
+    """
+
+    def __init__(
+            self, data_paths: List[Union[str, pd.DataFrame]],
+            processes: int = 1
+    ):
+        self.data_paths = dict(enumerate(data_paths))
+        self.executor = (
+            ProcessPoolExecutor(processes) if processes > 1 else None
+        )
+        self.failing_organizations = {}
+        self.tasks = {}
+        self.runs = {}
+        self.organization = SimpleNamespace(
+            list=lambda: [{'id': id_} for id_ in self.data_paths]
+        )
+        self.task = SimpleNamespace(
+            create=self._create_task, get=lambda task_id: self.tasks[task_id]
+        )
+        self.run = SimpleNamespace(
+            from_task=lambda task_id: [
+                self.runs[run_id] for run_id in self.tasks[task_id]['runs']
+            ]
+        )
+        self.result = SimpleNamespace(
+            get=lambda run_id: self.runs[run_id]['result']
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor:
+            self.executor.shutdown()
+
+    def _create_task(
+            self, input_: dict, organizations: List[int],
+            name: str = 'subtask', description: str = '', **kwargs
+    ):
+        method_name = input_['method']
+        method_kwargs = input_.get('kwargs', {})
+        failing = [
+            id_ for id_ in organizations
+            if id_ in self.failing_organizations.get(method_name, [])
+        ]
+        organizations = [id_ for id_ in organizations if id_ not in failing]
+        paths = [self.data_paths[id_] for id_ in organizations]
+        if self.executor:
+            results = list(self.executor.map(
+                _run_partial, [method_name] * len(paths),
+                [method_kwargs] * len(paths), paths
+            ))
+        else:
+            results = [
+                _run_partial(method_name, method_kwargs, path) for path in paths
+            ]
+        task_id = len(self.tasks) + 1
+        self.tasks[task_id] = {
+            'id': task_id, 'name': name, 'description': description, 'runs': []
+        }
+        runs = [('completed', id_, result)
+                for id_, result in zip(organizations, results)]
+        runs += [('crashed', id_, None) for id_ in failing]
+        for status, id_, result in runs:
+            run_id = len(self.runs) + 1
+            self.runs[run_id] = {
+                'id': run_id,
+                'organization': {'id': id_},
+                'status': status,
+                'result': result,
+            }
+            self.tasks[task_id]['runs'].append(run_id)
+        return {'id': task_id}
+
+    def wait_for_results(self, task_id: int, interval: float = 1) -> list:
+        return [
+            run['result'] for run in self.run.from_task(task_id)
+            if run['status'] == 'completed'
+        ]
+
+
+def run_mock_federation(
+        number_of_nodes: int, records_per_node: int, processes: int = 1,
+        seed: int = 0, **central_kwargs
+) -> dict:
+    """ Run the federated Kaplan-Meier on generated data and compare it with a
+    centralised lifelines fit
+
+    Parameters:
+
+    - number_of_nodes: Number of simulated nodes
+    - records_per_node: Number of records of every node
+    - processes: Number of processes used to run the nodes
+    - seed: Seed of the data generation
+    - central_kwargs: Additional arguments of ``kaplan_meier_central``
+
+    Returns:
+
+    - Timings in seconds and the maximum absolute difference between the
+      federated and the centralised survival curve
+    """
+    central = importlib.import_module(MODULE).kaplan_meier_central
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        data_paths = generate_node_data(
+            directory, number_of_nodes, records_per_node, seed
+        )
+        generation_time = time.perf_counter() - start
+
+        with MockFederationClient(data_paths, processes) as client:
+            start = time.perf_counter()
+            km = pd.read_json(StringIO(central(
+                time_column_name=TIME_COLUMN_NAME,
+                censor_column_name=CENSOR_COLUMN_NAME,
+                mock_client=client,
+                **central_kwargs
+            )))
+            federation_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = pd.concat(
+            [pd.read_csv(path) for path in data_paths], ignore_index=True
+        )
+        kmf = KaplanMeierFitter().fit(
+            df[TIME_COLUMN_NAME], event_observed=df[CENSOR_COLUMN_NAME]
+        )
+        centralised_time = time.perf_counter() - start
+
+    times = km[TIME_COLUMN_NAME].to_numpy()
+    difference = np.abs(
+        km['survival_cdf'].to_numpy()
+        - kmf.survival_function_at_times(times).to_numpy()
+    )
+    return {
+        'generation_time': generation_time,
+        'federation_time': federation_time,
+        'centralised_time': centralised_time,
+        'max_survival_difference': float(difference.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a mock federation')
+    parser.add_argument('-n', '--nodes', type=int, default=100,
+                        help='Number of simulated nodes')
+    parser.add_argument('-r', '--records', type=int, default=1000,
+                        help='Number of records per node')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help='Number of processes used to run the nodes')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='Seed of the data generation')
+    parser.add_argument('--noise', type=str, default='NONE',
+                        help='Noise type of the nodes')
+    args = parser.parse_args()
+
+    # The nodes normally supply (encoded) environment variables, these are
+    # inherited by the processes of the pool
+    os.environ['KAPLAN_MEIER_TYPE_NOISE'] = _encode_env_var(args.noise)
+    os.environ['KAPLAN_MEIER_MINIMUM_ORGANIZATIONS'] = _encode_env_var('1')
+
+    report = run_mock_federation(
+        args.nodes, args.records, args.processes, args.seed
+    )
+    for key, value in report.items():
+        print(f'{key}: {value:.6g}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the batch of Kaplan-Meier analyses with shared node tasks
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from vantage6.algorithm.tools.exceptions import InputError
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+algorithm = importlib.import_module(MODULE)
+
+ANALYSES = [
+    {'time_column_name': 'TIME', 'censor_column_name': 'CENSOR'},
+    {'time_column_name': 'OS_TIME', 'censor_column_name': 'OS_CENSOR'},
+    {
+        'time_column_name': 'TIME', 'censor_column_name': 'CENSOR',
+        'weight_column_name': 'WEIGHT'
+    },
+    {
+        'time_column_name': 'OS_TIME', 'censor_column_name': 'OS_CENSOR',
+        'organizations_to_include': [0, 1]
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+@pytest.fixture
+def frames() -> list:
+    """ Node datasets with two outcomes and sampling weights """
+    rng = np.random.default_rng(0)
+    return [
+        pd.DataFrame({
+            'TIME': rng.integers(1, 100, 200),
+            'CENSOR': rng.integers(0, 2, 200),
+            'OS_TIME': rng.integers(1, 200, 200),
+            'OS_CENSOR': rng.integers(0, 2, 200),
+            'WEIGHT': rng.uniform(0.5, 2, 200),
+        })
+        for _ in range(3)
+    ]
+
+
+class TestBatchCentral:
+
+    def test_batch_results_equal_individual_runs(self, frames):
+        with MockFederationClient(frames) as client:
+            batch = algorithm.kaplan_meier_batch_central(
+                analyses=ANALYSES, mock_client=client
+            )
+        for analysis, result in zip(ANALYSES, batch):
+            with MockFederationClient(frames) as client:
+                assert result == algorithm.kaplan_meier_central(
+                    **analysis, mock_client=client
+                )
+
+    def test_analyses_on_same_organizations_share_tasks(self, frames):
+        with MockFederationClient(frames) as client:
+            algorithm.kaplan_meier_batch_central(
+                analyses=ANALYSES, mock_client=client
+            )
+        # two steps for the three analyses on all organizations and two steps for
+        # the analysis on a subset, instead of two steps for every analysis
+        assert len(client.tasks) == 4
+
+    def test_invalid_analysis_is_rejected(self, frames):
+        with MockFederationClient(frames) as client:
+            with pytest.raises(InputError, match='Invalid analysis'):
+                algorithm.kaplan_meier_batch_central(
+                    analyses=[{'time_column': 'TIME'}], mock_client=client
+                )
+            with pytest.raises(InputError):
+                algorithm.kaplan_meier_batch_central(analyses=[], mock_client=client)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the bootstrap confidence bands
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import (
+    MODULE, TIME_COLUMN_NAME, CENSOR_COLUMN_NAME, MockFederationClient,
+    generate_node_frames
+)
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+
+class TestBootstrap:
+
+    @pytest.fixture(autouse=True)
+    def node_configuration(self, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        monkeypatch.setenv('KAPLAN_MEIER_RANDOM_SEED', _encode_env_var('1011'))
+
+    def test_replicates_of_nodes_are_independent(self):
+        # nodes with the same event table and seed draw different replicates
+        km_df = pd.DataFrame({
+            'observed': [5, 3, 8, 2], 'censored': [1, 4, 0, 6]
+        })
+        first = partial._bootstrap_event_counts(km_df, 1000)
+        second = partial._bootstrap_event_counts(km_df, 1000)
+        observed = np.asarray(first['observed'], dtype=float)
+        other = np.asarray(second['observed'], dtype=float)
+        assert not np.array_equal(observed, other)
+        for column in range(km_df.shape[0]):
+            correlation = np.corrcoef(observed[:, column], other[:, column])[0, 1]
+            assert abs(correlation) < 0.15
+
+        # Poisson(1) resampling of the records: mean and variance equal the count
+        np.testing.assert_allclose(
+            observed.mean(axis=0), km_df['observed'], rtol=0.15
+        )
+        np.testing.assert_allclose(
+            observed.var(axis=0), km_df['observed'], rtol=0.25
+        )
+
+    def test_bands_match_lifelines_confidence_interval(self):
+        frames = generate_node_frames(3, 1000)
+        central = importlib.import_module(MODULE).kaplan_meier_central
+        with MockFederationClient(frames) as client:
+            km = pd.read_json(StringIO(central(
+                time_column_name=TIME_COLUMN_NAME,
+                censor_column_name=CENSOR_COLUMN_NAME,
+                bootstrap_replicates=1000,
+                organizations_to_include=[0, 1, 2],
+                mock_client=client,
+            )))
+
+        df = pd.concat(frames, ignore_index=True)
+        kmf = KaplanMeierFitter(alpha=0.05).fit(
+            df[TIME_COLUMN_NAME], event_observed=df[CENSOR_COLUMN_NAME]
+        )
+        times = km[TIME_COLUMN_NAME].to_numpy()
+        interval = kmf.confidence_interval_survival_function_.loc[times]
+        # the tails are determined by few records, where the intervals differ
+        body = (km['survival_cdf'] > 0.1).to_numpy() & (times > 0)
+        lifelines_width = (interval.iloc[:, 1] - interval.iloc[:, 0]).to_numpy()
+        width = (km['survival_cdf_upper'] - km['survival_cdf_lower']).to_numpy()
+        np.testing.assert_allclose(
+            width[body], lifelines_width[body], rtol=0.25, atol=0.005
+        )
+        np.testing.assert_allclose(
+            km['survival_cdf_lower'].to_numpy()[body],
+            interval.iloc[:, 0].to_numpy()[body], atol=0.015
+        )
+        np.testing.assert_allclose(
+            km['survival_cdf_upper'].to_numpy()[body],
+            interval.iloc[:, 1].to_numpy()[body], atol=0.015
+        )
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the node-local cache
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+cache = importlib.import_module(f'{MODULE}.cache')
+partial = importlib.import_module(f'{MODULE}.partial')
+
+
+class TestSidecarPath:
+
+    @pytest.fixture(autouse=True)
+    def database(self, monkeypatch, tmp_path):
+        source = tmp_path / 'data.sqlite'
+        source.write_bytes(b'records')
+        monkeypatch.setenv('USER_REQUESTED_DATABASE_LABELS', 'default')
+        monkeypatch.setenv('DEFAULT_DATABASE_URI', str(source))
+        monkeypatch.setenv('DEFAULT_DATABASE_TYPE', 'sql')
+        monkeypatch.setenv('DEFAULT_QUERY', 'SELECT * FROM records')
+        self.source = str(source)
+
+    def test_same_settings_give_same_path(self):
+        assert (
+            cache.sidecar_path(self.source, 'index', 'TIME')
+            == cache.sidecar_path(self.source, 'index', 'TIME')
+        )
+
+    @pytest.mark.parametrize('setting, value', [
+        ('DEFAULT_DATABASE_TYPE', 'excel'),
+        ('DEFAULT_QUERY', 'SELECT * FROM records WHERE cohort = 1'),
+        ('DEFAULT_SHEET_NAME', 'cohort'),
+        ('DEFAULT_PREPROCESSING', '[{"function": "filter_range"}]'),
+    ])
+    def test_database_settings_change_path(self, monkeypatch, setting, value):
+        path = cache.sidecar_path(self.source, 'index', 'TIME')
+        monkeypatch.setenv(setting, value)
+        assert cache.sidecar_path(self.source, 'index', 'TIME') != path
+
+    def test_modified_source_changes_path(self):
+        path = cache.sidecar_path(self.source, 'index', 'TIME')
+        with open(self.source, 'ab') as fp:
+            fp.write(b' and more records')
+        assert cache.sidecar_path(self.source, 'index', 'TIME') != path
+
+
+class TestColumnarCache:
+
+    @pytest.fixture(autouse=True)
+    def csv_file(self, monkeypatch, tmp_path):
+        rng = np.random.default_rng(0)
+        self.records = pd.DataFrame({
+            'TIME': rng.integers(1, 50, 200),
+            'T2': rng.integers(1, 80, 200),
+            'CENSOR': rng.integers(0, 2, 200),
+            'NAME': [f'record {i}' for i in range(200)],
+        })
+        self.source = tmp_path / 'data.csv'
+        self.records.to_csv(self.source, index=False)
+        self.cache_directory = tmp_path / 'cache'
+        self.cache_directory.mkdir()
+        monkeypatch.setenv('USER_REQUESTED_DATABASE_LABELS', 'default')
+        monkeypatch.setenv('DEFAULT_DATABASE_URI', str(self.source))
+        monkeypatch.setenv('DEFAULT_DATABASE_TYPE', 'csv')
+        monkeypatch.setenv('KAPLAN_MEIER_CACHE', _encode_env_var('true'))
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_CACHE_DIRECTORY', _encode_env_var(str(self.cache_directory))
+        )
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+
+    def test_only_requested_columns_are_loaded(self):
+        df = cache._load_cached_columns(str(self.source), ['TIME', 'CENSOR'])
+        assert list(df.columns) == ['TIME', 'CENSOR']
+        pd.testing.assert_frame_equal(
+            df, self.records[['TIME', 'CENSOR']], check_dtype=False
+        )
+
+    def test_numerical_columns_are_mapped_from_sidecars(self, capsys):
+        cache._load_cached_columns(str(self.source), ['TIME', 'NAME'])
+        assert 'Reading columns' in capsys.readouterr().out
+        # text columns can not be memory-mapped
+        assert len(list(self.cache_directory.glob('*.npy'))) == 1
+
+        df = cache._load_cached_columns(str(self.source), ['TIME'])
+        assert 'Reading columns' not in capsys.readouterr().out
+        assert isinstance(df['TIME'].to_numpy().base, np.memmap)
+        assert df['TIME'].tolist() == self.records['TIME'].tolist()
+
+    def test_modified_source_is_read_again(self):
+        cache._load_cached_columns(str(self.source), ['TIME'])
+        self.records['TIME'] += 1
+        self.records.to_csv(self.source, index=False)
+        df = cache._load_cached_columns(str(self.source), ['TIME'])
+        assert df['TIME'].tolist() == self.records['TIME'].tolist()
+
+    def test_event_table_equals_event_table_of_records(self):
+        kwargs = dict(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            unique_event_times=np.unique(self.records['TIME']).tolist()
+        )
+        cached = partial.get_km_event_table(**kwargs)
+        # the second call uses the sidecars
+        assert partial.get_km_event_table(**kwargs) == cached
+        expected = partial.get_km_event_table(
+            mock_data=[self.records.copy()], **kwargs
+        )
+        pd.testing.assert_frame_equal(
+            pd.read_json(StringIO(cached)), pd.read_json(StringIO(expected))
+        )
+
+    def test_indexes_of_different_columns_stay_cached(self, capsys):
+        for time_column_name in ['TIME', 'T2', 'TIME', 'T2']:
+            partial._get_event_time_index(
+                self.records.copy(), time_column_name, 'CENSOR'
+            )
+        out = capsys.readouterr().out
+        # every index is built once, and used from the cache afterwards
+        assert out.count('Building sorted event time index') == 2
+        assert len(list(self.cache_directory.glob('*.km-index-*.npy'))) == 2
+
+    def test_modified_source_removes_stale_index(self):
+        partial._get_event_time_index(self.records.copy(), 'TIME', 'CENSOR')
+        partial._get_event_time_index(self.records.copy(), 'T2', 'CENSOR')
+        self.records['TIME'] += 1
+        self.records.to_csv(self.source, index=False)
+        index = partial._get_event_time_index(self.records.copy(), 'TIME', 'CENSOR')
+        assert index['time'].tolist() == sorted(self.records['TIME'])
+
+        # the index of T2 is computed from the earlier version of the source as well
+        partial._get_event_time_index(self.records.copy(), 'T2', 'CENSOR')
+        assert len(list(self.cache_directory.glob('*.km-index-*.npy'))) == 2
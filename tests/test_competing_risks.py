@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the competing-risks cumulative incidence against lifelines
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import AalenJohansenFitter
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+NUMBER_OF_NODES = 3
+CAUSES = [1, 2]
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+@pytest.fixture
+def frames() -> list:
+    """ Node datasets with two causes, without tied times
+
+    The times are rounded so that they are written exactly in the results.
+    """
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(NUMBER_OF_NODES):
+        size = 300
+        frames.append(pd.DataFrame({
+            'TIME': np.round(rng.exponential(10, size), 6),
+            'CENSOR': rng.integers(0, 2, size),
+            'CAUSE': rng.choice(CAUSES, size),
+        }))
+    return frames
+
+
+@pytest.fixture
+def km(frames) -> pd.DataFrame:
+    kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+    with MockFederationClient(frames) as client:
+        return pd.read_json(StringIO(kaplan_meier_central(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            event_type_column_name='CAUSE', mock_client=client
+        )), precise_float=True)
+
+
+class TestCompetingRisks:
+
+    @pytest.mark.parametrize('cause', CAUSES)
+    def test_cumulative_incidence_equals_lifelines(self, frames, km, cause):
+        df = pd.concat(frames)
+        ajf = AalenJohansenFitter(calculate_variance=False).fit(
+            df['TIME'], df['CENSOR'] * df['CAUSE'], event_of_interest=cause
+        )
+        expected = ajf.cumulative_density_.iloc[:, 0]
+        times = km['TIME'].to_numpy()
+        positions = np.searchsorted(expected.index.to_numpy(), times, side='right') - 1
+        np.testing.assert_allclose(
+            km[f'cumulative_incidence_{cause}'], expected.to_numpy()[positions],
+            atol=1e-9
+        )
+
+    def test_cumulative_incidences_add_up_to_failure(self, km):
+        total = sum(km[f'cumulative_incidence_{cause}'] for cause in CAUSES)
+        np.testing.assert_allclose(total, 1 - km['survival_cdf'], atol=1e-9)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the noise on the event counts (LAPLACE and GEOMETRIC)
+"""
+import json
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from vantage6.algorithm.tools.exceptions import (
+    EnvironmentVariableError, PrivacyThresholdViolation
+)
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+partial = importlib.import_module(f'{MODULE}.partial')
+count_noise = getattr(partial, '__count_noise')
+
+TIMES = [1, 2, 3, 5, 8]
+
+
+def _event_table(unique_event_times: list, **kwargs) -> pd.DataFrame:
+    """ Compute the event table of a small dataset
+
+    Parameters:
+
+    - unique_event_times: Event times of the event table
+    - kwargs: Additional arguments of ``get_km_event_table``
+
+    Returns:
+
+    - The event table
+    """
+    df = pd.DataFrame({
+        'TIME': [1, 2, 2, 3, 5, 5, 5, 8],
+        'CENSOR': [1, 0, 1, 1, 1, 0, 1, 0],
+    })
+    result = partial.get_km_event_table(
+        mock_data=[df], time_column_name='TIME', censor_column_name='CENSOR',
+        unique_event_times=unique_event_times, **kwargs
+    )
+    return pd.read_json(StringIO(result)).set_index('TIME')
+
+
+class TestCountNoise:
+
+    @pytest.fixture(autouse=True)
+    def node_configuration(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('LAPLACE'))
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS', _encode_env_var('0.1')
+        )
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_CACHE_DIRECTORY', _encode_env_var(str(tmp_path))
+        )
+
+    def test_padding_does_not_reveal_noise(self, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_NOISE_SECRET', _encode_env_var('secret'))
+        km = _event_table(TIMES)
+        # nobody is removed at negative times, but the noise of the other event
+        # times stays the same
+        padded = _event_table([-3, -2, -1, *TIMES])
+        columns = ['observed', 'censored']
+        pd.testing.assert_frame_equal(padded.loc[TIMES, columns], km[columns])
+
+    def test_secret_makes_noise_reproducible(self, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_NOISE_SECRET', _encode_env_var('secret'))
+        pd.testing.assert_frame_equal(_event_table(TIMES), _event_table(TIMES))
+
+        times = np.arange(100)
+        noise = _keyed_noise(monkeypatch, 'secret', times)
+        assert np.array_equal(noise, _keyed_noise(monkeypatch, 'secret', times))
+        assert not np.array_equal(noise, _keyed_noise(monkeypatch, 'other', times))
+
+    def test_noise_is_fresh_without_secret(self):
+        times = np.arange(1000)
+        first = count_noise(times, ['observed', 'censored'], 'LAPLACE', 0.1)
+        second = count_noise(times, ['observed', 'censored'], 'LAPLACE', 0.1)
+        assert not np.array_equal(first, second)
+
+    @pytest.mark.parametrize('secret', ['', 'secret'])
+    @pytest.mark.parametrize('epsilon', [0.1, 1.0])
+    def test_laplace_noise_distribution(self, monkeypatch, secret, epsilon):
+        monkeypatch.setenv('KAPLAN_MEIER_NOISE_SECRET', _encode_env_var(secret))
+        noise = count_noise(np.arange(100_000), ['observed'], 'LAPLACE', epsilon)
+        # rounded Laplace noise with scale 1 / epsilon
+        scale = 1 / epsilon
+        assert np.all(noise == np.round(noise))
+        assert abs(noise.mean()) < 5 * np.sqrt(2) * scale / np.sqrt(noise.size)
+        assert np.median(np.abs(noise)) == pytest.approx(
+            scale * np.log(2), abs=1
+        )
+
+    @pytest.mark.parametrize('secret', ['', 'secret'])
+    @pytest.mark.parametrize('epsilon', [0.1, 1.0])
+    def test_geometric_noise_distribution(self, monkeypatch, secret, epsilon):
+        monkeypatch.setenv('KAPLAN_MEIER_NOISE_SECRET', _encode_env_var(secret))
+        noise = count_noise(np.arange(100_000), ['observed'], 'GEOMETRIC', epsilon)
+        # P(noise = k) is proportional to exp(-epsilon |k|)
+        alpha = np.exp(-epsilon)
+        variance = 2 * alpha / (1 - alpha) ** 2
+        assert np.all(noise == np.round(noise))
+        assert noise.var() == pytest.approx(variance, rel=0.05)
+        assert np.mean(noise == 0) == pytest.approx(
+            (1 - alpha) / (1 + alpha), abs=0.01
+        )
+
+    def test_budget_is_recorded_and_capped(self, monkeypatch, tmp_path):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS', _encode_env_var('0.4')
+        )
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_PRIVACY_BUDGET_EVENT_COUNTS', _encode_env_var('1')
+        )
+        _event_table(TIMES)
+        _event_table(TIMES)
+        with pytest.raises(PrivacyThresholdViolation):
+            _event_table(TIMES)
+
+        ledgers = list(tmp_path.glob('km-privacy-budget-*.json'))
+        assert len(ledgers) == 1
+        assert json.loads(ledgers[0].read_text())['total'] == pytest.approx(0.8)
+
+    def test_budget_requires_ledger_location(self, monkeypatch):
+        monkeypatch.delenv('KAPLAN_MEIER_CACHE_DIRECTORY')
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_PRIVACY_BUDGET_EVENT_COUNTS', _encode_env_var('1')
+        )
+        with pytest.raises(EnvironmentVariableError):
+            _event_table(TIMES)
+
+    def test_no_budget_is_spent_without_count_noise(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        km = _event_table(TIMES)
+        assert km['observed'].tolist() == [1, 1, 1, 2, 0]
+        assert km['censored'].tolist() == [0, 1, 0, 1, 1]
+        assert km['at_risk'].tolist() == [8, 7, 5, 4, 1]
+        assert not list(tmp_path.glob('km-privacy-budget-*.json'))
+
+
+def _keyed_noise(monkeypatch, secret: str, times: np.ndarray) -> np.ndarray:
+    """ Draw the Laplace noise of the observed counts with a noise secret
+
+    Parameters:
+
+    - monkeypatch: Fixture used to set the secret
+    - secret: Noise secret of the node
+    - times: Event times
+
+    Returns:
+
+    - The noise at every event time
+    """
+    monkeypatch.setenv('KAPLAN_MEIER_NOISE_SECRET', _encode_env_var(secret))
+    return count_noise(times, ['observed'], 'LAPLACE', 0.1)
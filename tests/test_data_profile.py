@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the data quality profile of the event table
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from vantage6.algorithm.tools.exceptions import InputError
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+TIMES = [1, 2, 3, 4, 5, 6]
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    """ Records with a missing time, a missing censor value and a missing entry """
+    return pd.DataFrame({
+        'TIME': [1, 2, np.nan, 4, 5, 6],
+        'CENSOR': [1, 0, 1, np.nan, 1, 0],
+        'ENTRY': [0, 1.5, 0, np.nan, 5.5, 0],
+        'WEIGHT': [1, 0.5, np.nan, 2, -1, 1],
+    })
+
+
+def _event_table(df: pd.DataFrame, **kwargs) -> dict | str:
+    """ Compute the event table of a dataset at the TIMES
+
+    Parameters:
+
+    - df: Dataset with the TIME and CENSOR columns
+    - kwargs: Additional arguments of ``get_km_event_table``
+
+    Returns:
+
+    - The result of ``get_km_event_table``
+    """
+    return partial.get_km_event_table(
+        mock_data=[df], time_column_name='TIME', censor_column_name='CENSOR',
+        unique_event_times=TIMES, **kwargs
+    )
+
+
+class TestDataProfile:
+
+    def test_profile_equals_hand_computation(self, df):
+        profile = partial._profile_data(df, 'TIME', 'CENSOR', 'ENTRY')
+        assert profile == {
+            'records': 6,
+            'complete_records': 4,
+            'time': {'null': 1, 'negative': 0},
+            'censor': {'null': 1, '0': 2, '1': 3, 'other': 0},
+            'entry_time': {'null': 1, 'after_time': 1},
+        }
+        profile = partial._profile_data(
+            df, 'TIME', 'CENSOR', weight_column_name='WEIGHT'
+        )
+        assert profile['weight'] == {'null': 1, 'negative': 1}
+
+    def test_time_range_is_shared_when_allowed(self, df, monkeypatch):
+        assert 'min' not in partial._profile_data(df, 'TIME', 'CENSOR')['time']
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_DATA_PROFILE_TIME_RANGE', _encode_env_var('true')
+        )
+        time_profile = partial._profile_data(df, 'TIME', 'CENSOR')['time']
+        assert time_profile['min'] == 1 and time_profile['max'] == 6
+
+    def test_profile_is_returned_with_the_event_table(self, df, capsys):
+        df = df.drop(columns=['ENTRY', 'WEIGHT'])
+        result = _event_table(df.copy(), data_profile=True)
+        assert 'Ignoring 2 records with a missing time' in capsys.readouterr().out
+        assert result['profile'] == partial._profile_data(df, 'TIME', 'CENSOR')
+        # the profile does not change the event table
+        assert result['event_table'] == _event_table(df.copy())
+
+    @pytest.mark.parametrize('column, values, message', [
+        ('TIME', [1, 2, -3, 4, 5, 6], 'negative time'),
+        ('CENSOR', [1, 0, 2, 1, 1, 0], 'censor value other'),
+        ('TIME', ['1', '2', '3', '4', '5', '6'], 'should contain numbers'),
+        ('CENSOR', [np.nan] * 6, 'no records'),
+    ])
+    def test_invalid_data_is_rejected(self, column, values, message):
+        df = pd.DataFrame({'TIME': TIMES, 'CENSOR': [1, 0, 1, 1, 1, 0]})
+        df[column] = values
+        with pytest.raises(InputError, match=message):
+            _event_table(df)
+
+    def test_entry_after_event_time_is_rejected(self, df):
+        with pytest.raises(InputError, match='entry time after'):
+            _event_table(df, entry_time_column_name='ENTRY')
+
+    def test_central_returns_profile_of_every_node(self):
+        frames = [
+            pd.DataFrame({'TIME': TIMES, 'CENSOR': [1, 0, 1, 1, 1, 0]}),
+            pd.DataFrame({'TIME': [*TIMES, np.nan], 'CENSOR': [0, 0, 1, 1, 0, 1, 1]}),
+        ]
+        kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+        kwargs = dict(time_column_name='TIME', censor_column_name='CENSOR')
+        with MockFederationClient(frames) as client:
+            result = kaplan_meier_central(
+                **kwargs, data_profile=True, mock_client=client
+            )
+        with MockFederationClient(frames) as client:
+            assert result['kaplan_meier'] == kaplan_meier_central(
+                **kwargs, mock_client=client
+            )
+        assert [profile['records'] for profile in result['data_profiles']] == [6, 7]
+        assert result['data_profiles'][1]['time']['null'] == 1
+        assert result['data_profiles'][1]['censor'] == {
+            'null': 0, '0': 3, '1': 4, 'other': 0
+        }
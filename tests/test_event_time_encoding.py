@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the compact encoding of the unique event times
+"""
+import json
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+partial = importlib.import_module(f'{MODULE}.partial')
+utils = importlib.import_module(f'{MODULE}.utils')
+
+
+def _round_trip(event_times) -> np.ndarray:
+    """ Encode event times, send them as JSON and decode them
+
+    Parameters:
+
+    - event_times: Event times to encode
+
+    Returns:
+
+    - The decoded event times
+    """
+    encoded = json.loads(json.dumps(utils.encode_event_times(event_times)))
+    return utils.decode_event_times(encoded)
+
+
+class TestEventTimeEncoding:
+
+    @pytest.mark.parametrize('event_times', [
+        [5, 1, 3, 3, 1, 250],
+        [-10, 0, 7, 2 ** 40],
+        [0, 70_000, 2 ** 53 - 1],
+        [42],
+    ])
+    def test_integer_event_times_are_delta_encoded(self, event_times):
+        encoded = utils.encode_event_times(event_times)
+        assert encoded['encoding'] == 'delta'
+        decoded = _round_trip(event_times)
+        assert decoded.dtype == np.int64
+        assert decoded.tolist() == sorted(set(event_times))
+
+    def test_smallest_delta_type_is_used(self):
+        assert utils.encode_event_times([1, 2, 255])['dtype'] == '|u1'
+        assert utils.encode_event_times([1, 2, 258])['dtype'] == '<u2'
+
+    def test_float_event_times_are_exact(self):
+        rng = np.random.default_rng(0)
+        event_times = rng.exponential(10, 1000)
+        event_times = np.concatenate([event_times, event_times[:10], [np.nan]])
+        encoded = utils.encode_event_times(event_times)
+        assert encoded['encoding'] == 'sorted'
+        np.testing.assert_array_equal(
+            _round_trip(event_times), np.unique(event_times[~np.isnan(event_times)])
+        )
+
+    @pytest.mark.parametrize('event_times', [[], [np.nan]])
+    def test_no_event_times(self, event_times):
+        assert len(_round_trip(event_times)) == 0
+
+    def test_plain_list_is_decoded(self):
+        assert utils.decode_event_times([3, 1.5, 3]).tolist() == [1.5, 3]
+
+    def test_encoding_is_smaller_than_list(self):
+        event_times = np.arange(0, 100_000, 3)
+        encoded = json.dumps(utils.encode_event_times(event_times))
+        assert len(encoded) < len(json.dumps(event_times.tolist())) / 100
+
+    @pytest.mark.parametrize('times', [
+        [1, 2, 2, 5, 5, 9, 12, 12, 30],
+        [0.5, 1.25, 1.25, 2.0, 7.75, 7.75, 10.5, 11.0, 12.5],
+    ])
+    def test_partial_returns_encoded_unique_event_times(self, monkeypatch, times):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        df = pd.DataFrame({'TIME': times, 'CENSOR': 1})
+        encoded = partial.get_unique_event_times(
+            mock_data=[df], time_column_name='TIME', compact=True
+        )
+        listed = partial.get_unique_event_times(
+            mock_data=[df], time_column_name='TIME'
+        )
+        np.testing.assert_array_equal(
+            utils.decode_event_times(encoded), np.unique(listed)
+        )
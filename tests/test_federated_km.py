@@ -1,6 +1,15 @@
 # -*- coding: utf-8 -*-
+import importlib
 import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter
+from vantage6.algorithm.tools.exceptions import InputError
 from .config_unit_tests import *
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
 
 
 class TestFederatedKaplanMeier:
@@ -34,13 +43,71 @@ class TestFederatedKaplanMeier:
     def test_compare_censored_events_with_centralised(self):
         assert km['censored'].values.tolist() == kmc['censored'].values.tolist()
 
-    # TODO: no overlap in the times
-    # TODO: negative times
-    # TODO: wrong format for censor column
-    # TODO: node with empty data
-    # TODO: node with wrong format for data
-    # def test_binning_unique_times(self):
-    #     assert sum(rows) == 3
-    #
-    # def test_size_local_event_tables_with_binning(self):
-    #     assert sum(cols) == 3
+
+@pytest.fixture
+def node() -> pd.DataFrame:
+    """ Valid data of a node """
+    return pd.DataFrame({'TIME': [1, 2, 3, 4, 5, 6], 'CENSOR': [1, 0, 1, 1, 0, 1]})
+
+
+def _federated_km(frames: list) -> pd.DataFrame:
+    """ Compute the federated Kaplan-Meier curve of the node datasets
+
+    Parameters:
+
+    - frames: Datasets of the nodes
+
+    Returns:
+
+    - The Kaplan-Meier curve
+    """
+    kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+    with MockFederationClient(frames) as client:
+        return pd.read_json(StringIO(kaplan_meier_central(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            mock_client=client
+        )))
+
+
+class TestFederatedKaplanMeierNodeData:
+    """ Unit tests for the federated Kaplan-Meier algorithm with unusual or
+    invalid data at one of the nodes
+    """
+    @pytest.fixture(autouse=True)
+    def node_configuration(self, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1')
+        )
+
+    def test_no_overlap_in_the_times(self, node):
+        other = node.assign(TIME=node['TIME'] + 10)
+        km = _federated_km([node, other])
+        assert km['TIME'].tolist() == [*node['TIME'], *other['TIME']]
+
+        df = pd.concat([node, other])
+        kmf = KaplanMeierFitter().fit(df['TIME'], df['CENSOR'])
+        np.testing.assert_allclose(
+            km['survival_cdf'], kmf.survival_function_at_times(km['TIME']),
+            atol=1e-10
+        )
+
+    @pytest.mark.parametrize('column, values, message', [
+        ('TIME', [1, 2, -3, 4, 5, 6], 'negative time'),
+        ('TIME', ['1', '2', '3', '4', '5', '6'], 'should contain numbers'),
+        ('CENSOR', ['yes', 'no', 'yes', 'yes', 'no', 'yes'], 'censor value other'),
+        ('CENSOR', [1, 0, 2, 1, 1, 0], 'censor value other'),
+    ])
+    def test_invalid_node_data_is_rejected(self, node, column, values, message):
+        invalid = node.copy()
+        invalid[column] = values
+        with pytest.raises(InputError, match=message):
+            _federated_km([node, invalid])
+
+    def test_node_with_empty_data_is_rejected(self, node):
+        with pytest.raises(InputError, match='must be greater than'):
+            _federated_km([node, node.iloc[:0]])
+
+    def test_missing_censor_column_is_rejected(self, node):
+        with pytest.raises(InputError, match="Column 'CENSOR' not found"):
+            _federated_km([node, node.drop(columns=['CENSOR'])])
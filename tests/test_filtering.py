@@ -1,87 +1,126 @@
-import pytest
+# -*- coding: utf-8 -*-
+""" Unit tests of the cohort filter of the node preprocessing
+"""
+import json
+import sqlite3
+import importlib
 import lifelines
+import numpy as np
 import pandas as pd
+import pytest
+
+from io import StringIO
+from vantage6.algorithm.tools.preprocessing.functions import filter_range
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+cache = importlib.import_module(f'{MODULE}.cache')
+partial = importlib.import_module(f'{MODULE}.partial')
+
+STEPS = [
+    {'column': 'T', 'min_': 10, 'max_': 50},
+    {'column': 'T', 'min_': 10, 'max_': 50, 'include_min': True, 'include_max': True},
+    {'column': 'T', 'min_': 30},
+    {'column': 'T', 'max_': 30, 'include_max': True},
+]
+
+
+@pytest.fixture(scope='module')
+def waltons() -> pd.DataFrame:
+    waltons = lifelines.datasets.load_waltons()
+    # Cheaply and badly check if the dataset has changed, as we want to further make
+    # sure differences in test results are due to potential errors in our code, not
+    # unexpected upstream changes to datasets from lifelines.
+    if pd.util.hash_pandas_object(waltons).sum() != 11603055737657237860:
+        pytest.skip('Waltons dataset from lifelines _seems_ to have changed.')
+    return waltons
+
+
+def _preprocessing(**parameters) -> str:
+    """ Encode a ``filter_range`` step as node preprocessing
+
+    Parameters:
+
+    - parameters: Parameters of ``filter_range``
+
+    Returns:
+
+    - The JSON encoded preprocessing
+    """
+    return json.dumps([{'function': 'filter_range', 'parameters': parameters}])
+
+
+class TestFilterConditions:
+
+    def test_no_preprocessing(self):
+        assert cache.filter_conditions(None) == []
+        assert cache.filter_conditions('[]') == []
+
+    def test_filter_range_is_translated(self):
+        assert cache.filter_conditions(_preprocessing(**STEPS[0])) == [
+            ('T', '>', 10), ('T', '<', 50)
+        ]
+        assert cache.filter_conditions(_preprocessing(**STEPS[1])) == [
+            ('T', '>=', 10), ('T', '<=', 50)
+        ]
+
+    @pytest.mark.parametrize('step', [
+        {'function': 'select_rows', 'parameters': {'query': 'T > 10'}},
+        # filter_range on the index can not be pushed down
+        {'function': 'filter_range', 'parameters': {'min_': 10}},
+    ])
+    def test_other_steps_are_not_translated(self, step):
+        assert cache.filter_conditions(json.dumps([step])) is None
+
+    @pytest.mark.parametrize('step', STEPS)
+    def test_conditions_select_same_records_as_vantage6(self, waltons, step):
+        selection = np.ones(len(waltons), dtype=bool)
+        for column, comparison, value in cache.filter_conditions(
+            _preprocessing(**step)
+        ):
+            selection &= cache.FILTER_OPERATORS[comparison](waltons[column], value)
+        pd.testing.assert_frame_equal(
+            waltons[selection], filter_range(waltons, **step)
+        )
+
+
+class TestFilteredEventTable:
+
+    @pytest.fixture(autouse=True)
+    def node_configuration(self, monkeypatch):
+        monkeypatch.setenv('USER_REQUESTED_DATABASE_LABELS', 'default')
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        monkeypatch.setenv('KAPLAN_MEIER_SQL_PUSHDOWN', _encode_env_var('true'))
+
+    @pytest.fixture(params=['csv', 'sql'])
+    def database(self, request, monkeypatch, tmp_path, waltons) -> str:
+        """ The waltons dataset as CSV file, or in a SQLite database """
+        if request.param == 'csv':
+            path = tmp_path / 'waltons.csv'
+            waltons.to_csv(path, index=False)
+        else:
+            path = tmp_path / 'waltons.sqlite'
+            with sqlite3.connect(path) as connection:
+                waltons.to_sql('waltons', connection, index=False)
+            monkeypatch.setenv('DEFAULT_QUERY', 'SELECT * FROM waltons')
+        monkeypatch.setenv('DEFAULT_DATABASE_URI', str(path))
+        monkeypatch.setenv('DEFAULT_DATABASE_TYPE', request.param)
+        return request.param
+
+    @pytest.mark.parametrize('step', STEPS)
+    def test_filtered_survival_equals_lifelines(
+            self, database, waltons, monkeypatch, step
+    ):
+        monkeypatch.setenv('DEFAULT_PREPROCESSING', _preprocessing(**step))
+        cohort = filter_range(waltons, **step)
+        km = pd.read_json(StringIO(partial.get_km_event_table(
+            time_column_name='T', censor_column_name='E',
+            unique_event_times=np.unique(cohort['T']).tolist()
+        )))
+        assert km['removed'].sum() == len(cohort)
 
-from unittest.mock import patch
-from vtg_km.v6_km_utils import filter_df
-
-class TestFiltering:
-    @pytest.fixture(scope="class")
-    def lifeline_waltons(self):
-        waltons = lifelines.datasets.load_waltons()
-        # Cheaply and badly check if the dataset has changed, as we want to
-        # further make sure differences in test results are due to potential
-        # errors in our code, not unexpected upstream changes to datasets from
-        # lifeines.
-        if pd.util.hash_pandas_object(waltons).sum() != 11603055737657237860:
-            pytest.exit("Waltons dataset from lifelines _seems_ to have changed. Aborting tests with it.")
-
-        kmf = lifelines.KaplanMeierFitter()
-        kmf.fit(waltons['T'], waltons['E'])
-
-        return waltons, kmf
-
-    def test_filtering_unset_filter_column(self, lifeline_waltons):
-        waltons_df, kmf = lifeline_waltons
-        # Due to encoding of vars in vantage6 early 4 versions, we resort to mocking
-        def get_env_var_mock(env_var, default=None):
-            return {
-                "V6_FILTER_VALUES_ALLOWED": None,
-            }.get(env_var, default)
-
-        with patch("vtg_km.v6_km_utils.get_env_var", side_effect=get_env_var_mock):
-            with pytest.raises(ValueError) as excinfo:
-                filter_df(waltons_df, "control")
-            assert "No filter column set" in str(excinfo.value)
-
-    def test_filter_df_not_allowed(self, lifeline_waltons):
-        waltons_df, kmf = lifeline_waltons
-        # Due to encoding of vars in vantage6 early 4 versions, we resort to mocking
-        def get_env_var_mock(env_var, default=None):
-            return {
-                "V6_FILTER_COLUMN": "group",
-                "V6_FILTER_VALUES_ALLOWED": "control,miR-137",
-            }.get(env_var, default)
-
-        with patch("vtg_km.v6_km_utils.get_env_var", side_effect=get_env_var_mock):
-            with pytest.raises(ValueError) as excinfo:
-                filter_df(waltons_df, "age")
-            assert "Filter value not allowed" in str(excinfo.value)
-
-    def test_filter_df_allowed(self, lifeline_waltons):
-        waltons_df, kmf = lifeline_waltons
-        # Due to encoding of vars in vantage6 early 4 versions, we resort to mocking
-        def get_env_var_mock(env_var, default=None):
-            return {
-                "V6_FILTER_COLUMN": "group",
-                "V6_FILTER_VALUES_ALLOWED": "control,miR-137",
-            }.get(env_var, default)
-
-        with patch("vtg_km.v6_km_utils.get_env_var", side_effect=get_env_var_mock):
-            filtered = filter_df(waltons_df, "control")
-            assert filtered.shape[0] == 129
-
-    def test_filter_nonexisting_column(self, lifeline_waltons):
-        waltons_df, kmf = lifeline_waltons
-        # Due to encoding of vars in vantage6 early 4 versions, we resort to mocking
-        def get_env_var_mock(env_var, default=None):
-            return {
-                "V6_FILTER_COLUMN": "nonexisting"
-            }.get(env_var, default)
-
-        with patch("vtg_km.v6_km_utils.get_env_var", side_effect=get_env_var_mock):
-            with pytest.raises(ValueError) as excinfo:
-                filter_df(waltons_df, "control")
-            assert "Filter column not found" in str(excinfo.value)
-
-    def test_filter_no_restrictions(self, lifeline_waltons):
-        waltons_df, kmf = lifeline_waltons
-        # Due to encoding of vars in vantage6 early 4 versions, we resort to mocking
-        def get_env_var_mock(env_var, default=None):
-            return {
-                "V6_FILTER_COLUMN": "group"
-            }.get(env_var, default)
-
-        with patch("vtg_km.v6_km_utils.get_env_var", side_effect=get_env_var_mock):
-            filtered = filter_df(waltons_df, "control")
-            assert filtered.shape[0] == 129
+        survival = np.cumprod(1 - km['observed'] / km['at_risk'])
+        kmf = lifelines.KaplanMeierFitter().fit(cohort['T'], cohort['E'])
+        np.testing.assert_allclose(
+            survival, kmf.survival_function_at_times(km['T']), atol=1e-12
+        )
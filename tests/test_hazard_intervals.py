@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the piecewise constant hazard, compared with hand computed tables
+"""
+import json
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+partial = importlib.import_module(f'{MODULE}.partial')
+count_noise = getattr(partial, '__count_noise')
+
+BOUNDARIES = [0, 2, 5, 10]
+
+
+@pytest.fixture
+def records() -> pd.DataFrame:
+    return pd.DataFrame({
+        'TIME': [1, 3, 4, 6, 12],
+        'CENSOR': [1, 0, 1, 1, 0],
+    })
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch, tmp_path):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+    monkeypatch.setenv(
+        'KAPLAN_MEIER_CACHE_DIRECTORY', _encode_env_var(str(tmp_path))
+    )
+
+
+def _interval_table(records: pd.DataFrame) -> pd.DataFrame:
+    """ Compute the interval table of a node
+
+    Parameters:
+
+    - records: Data of the node
+
+    Returns:
+
+    - The interval table
+    """
+    return pd.read_json(StringIO(partial.get_km_event_table(
+        mock_data=[records], time_column_name='TIME', censor_column_name='CENSOR',
+        hazard_intervals=BOUNDARIES
+    )))
+
+
+class TestHazardIntervals:
+
+    def test_interval_table_equals_hand_computation(self, records):
+        km = _interval_table(records)
+        assert km['TIME'].tolist() == [0, 2, 5]
+        assert km['observed'].tolist() == [1, 1, 1]
+        assert km['censored'].tolist() == [0, 1, 0]
+        # e.g. in [2, 5): 1 (time 3) + 2 (time 4) + 3 (time 6) + 3 (time 12)
+        assert km['person_time'].tolist() == [9, 9, 6]
+
+    def test_merged_intervals_keep_their_person_time(self, records, monkeypatch):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME', _encode_env_var('2')
+        )
+        km = _interval_table(records)
+        # all intervals form a single group with 3 events, 1 censored record and 24
+        # person-time, which is spread in proportion to the person-time
+        assert km['TIME'].tolist() == [0, 2, 5]
+        assert km['person_time'].tolist() == [9, 9, 6]
+        np.testing.assert_allclose(km['observed'], [1.125, 1.125, 0.75])
+        np.testing.assert_allclose(km['censored'], [0.375, 0.375, 0.25])
+        np.testing.assert_allclose(km['removed'], [1.5, 1.5, 1])
+        np.testing.assert_allclose(km['observed'] / km['person_time'], 3 / 24)
+
+    def test_piecewise_constant_hazard_equals_hand_computation(self, records):
+        kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+        with MockFederationClient([records, records.copy()]) as client:
+            km = pd.read_json(StringIO(kaplan_meier_central(
+                time_column_name='TIME', censor_column_name='CENSOR',
+                hazard_intervals=BOUNDARIES, mock_client=client
+            )))
+        hazard = np.array([2 / 18, 2 / 18, 2 / 12])
+        np.testing.assert_allclose(km['hazard'], hazard)
+        np.testing.assert_allclose(
+            km['survival_cdf'], np.exp(-np.cumsum(hazard * np.diff(BOUNDARIES)))
+        )
+
+    def test_person_time_receives_noise(self, records, monkeypatch, tmp_path):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('LAPLACE'))
+        monkeypatch.setenv('KAPLAN_MEIER_NOISE_SECRET', _encode_env_var('secret'))
+        km = _interval_table(records)
+        assert not np.allclose(km['person_time'], [9, 9, 6])
+        assert (km['person_time'] >= 0).all()
+
+        # the counts and the person-time both spend the privacy budget
+        ledger, = tmp_path.glob('km-privacy-budget-*.json')
+        assert json.loads(ledger.read_text())['total'] == pytest.approx(2.0)
+
+    def test_person_time_noise_distribution(self):
+        sensitivity, epsilon = BOUNDARIES[-1] - BOUNDARIES[0], 0.5
+        noise = count_noise(
+            np.arange(100_000), ['person_time'], 'LAPLACE', epsilon / sensitivity,
+            discrete=False
+        )
+        # continuous Laplace noise with scale sensitivity / epsilon
+        scale = sensitivity / epsilon
+        assert not np.all(noise == np.round(noise))
+        assert np.median(np.abs(noise)) == pytest.approx(scale * np.log(2), rel=0.05)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the risk set with delayed entry (left truncation)
+"""
+import json
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+def _event_table(df: pd.DataFrame, entry_time_column_name: str | None) -> pd.DataFrame:
+    """ Compute the event table of a dataset at all of its times
+
+    Parameters:
+
+    - df: Dataset with the TIME and CENSOR columns
+    - entry_time_column_name: Name of the entry time column, if any
+
+    Returns:
+
+    - The event table
+    """
+    result = partial.get_km_event_table(
+        mock_data=[df], time_column_name='TIME', censor_column_name='CENSOR',
+        entry_time_column_name=entry_time_column_name,
+        unique_event_times=np.unique(df['TIME']).tolist()
+    )
+    return pd.read_json(StringIO(result))
+
+
+class TestLeftTruncation:
+
+    def test_risk_set_equals_hand_computation(self):
+        df = pd.DataFrame({
+            'TIME': [2, 3, 4, 5, 6, 7],
+            'CENSOR': [1, 0, 1, 1, 0, 1],
+            'ENTRY': [0, 0, 2, 3.5, np.nan, 6.5],
+        })
+        km = _event_table(df, 'ENTRY')
+        # a record is at risk at t when it entered before t: the record that enters
+        # at 2 is not at risk at 2, and the missing entry time is time zero
+        assert km['TIME'].tolist() == [2, 3, 4, 5, 6, 7]
+        assert km['at_risk'].tolist() == [3, 3, 3, 2, 1, 1]
+        assert km['removed'].tolist() == [1, 1, 1, 1, 1, 1]
+
+    def test_entry_at_time_zero_equals_no_entry(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'TIME': rng.integers(1, 30, 500),
+            'CENSOR': rng.integers(0, 2, 500),
+            'ENTRY': np.zeros(500),
+        })
+        pd.testing.assert_frame_equal(
+            _event_table(df, 'ENTRY'), _event_table(df, None), check_dtype=False
+        )
+
+    def test_survival_equals_lifelines(self):
+        rng = np.random.default_rng(2)
+        frames = []
+        for _ in range(3):
+            times = np.round(rng.exponential(10, 300), 3)
+            frames.append(pd.DataFrame({
+                'TIME': times,
+                'CENSOR': rng.integers(0, 2, 300),
+                # entry times never equal an event time
+                'ENTRY': np.where(
+                    rng.random(300) < 0.5,
+                    np.maximum(np.round(rng.uniform(0, 1, 300) * times, 3) - 5e-4, 0),
+                    0
+                ),
+            }))
+        kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+        with MockFederationClient(frames) as client:
+            km = pd.read_json(StringIO(kaplan_meier_central(
+                time_column_name='TIME', censor_column_name='CENSOR',
+                entry_time_column_name='ENTRY', mock_client=client
+            )), precise_float=True)
+
+        df = pd.concat(frames)
+        kmf = KaplanMeierFitter().fit(df['TIME'], df['CENSOR'], entry=df['ENTRY'])
+        expected = kmf.survival_function_.iloc[:, 0]
+        positions = np.searchsorted(
+            expected.index.to_numpy(), km['TIME'].to_numpy(), side='right'
+        ) - 1
+        np.testing.assert_allclose(
+            km['survival_cdf'], expected.to_numpy()[positions], atol=1e-9
+        )
+
+
+class TestNoiseWithDelayedEntry:
+
+    @pytest.fixture
+    def df(self) -> pd.DataFrame:
+        """ Records of which most enter the study late """
+        rng = np.random.default_rng(3)
+        times = rng.integers(1, 40, 400)
+        return pd.DataFrame({
+            'TIME': times,
+            'CENSOR': rng.integers(0, 2, 400),
+            'ENTRY': np.floor(rng.uniform(0, 1, 400) * times),
+        })
+
+    def test_entries_receive_count_noise(self, df, monkeypatch, tmp_path):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('LAPLACE'))
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS', _encode_env_var('0.5')
+        )
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_CACHE_DIRECTORY', _encode_env_var(str(tmp_path))
+        )
+        km = _event_table(df.copy(), 'ENTRY')
+
+        # the entries follow from the number at risk and the removals
+        removed_before = km['removed'].cumsum() - km['removed']
+        recovered = np.diff(km['at_risk'] + removed_before, prepend=0)
+        entries = np.diff(
+            np.searchsorted(np.sort(df['ENTRY']), km['TIME'], side='left'),
+            prepend=0
+        )
+        assert not np.array_equal(recovered, entries)
+        assert np.all(km['at_risk'] >= km['removed'])
+
+        # the event counts and the entries each spend the privacy budget
+        ledger = next(tmp_path.glob('km-privacy-budget-*.json'))
+        assert json.loads(ledger.read_text())['total'] == pytest.approx(1.0)
+
+    @pytest.mark.parametrize('noise_type', ['POISSON', 'GAUSSIAN'])
+    def test_time_noise_shifts_entry_times(self, df, monkeypatch, noise_type):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var(noise_type))
+        monkeypatch.setenv('KAPLAN_MEIER_RANDOM_SEED', _encode_env_var('7'))
+        noised = partial._add_noise_to_event_times(df.copy(), 'TIME', 'ENTRY')
+        assert not np.array_equal(noised['TIME'], df['TIME'])
+        assert np.all(noised['ENTRY'] <= noised['TIME'])
+        if noise_type == 'POISSON':
+            np.testing.assert_array_equal(
+                noised['TIME'] - noised['ENTRY'], df['TIME'] - df['ENTRY']
+            )
+
+    def test_no_record_leaves_before_it_enters(self, df, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('POISSON'))
+        monkeypatch.setenv('KAPLAN_MEIER_RANDOM_SEED', _encode_env_var('7'))
+        result = partial.get_km_event_table(
+            mock_data=[df.copy()], time_column_name='TIME',
+            censor_column_name='CENSOR', entry_time_column_name='ENTRY',
+            unique_event_times=np.arange(100).tolist()
+        )
+        km = pd.read_json(StringIO(result))
+        assert np.all(km['at_risk'] >= km['removed'])
+        assert km['removed'].sum() == len(df)
+
+        intervals = pd.read_json(StringIO(partial.get_km_event_table(
+            mock_data=[df.copy()], time_column_name='TIME',
+            censor_column_name='CENSOR', entry_time_column_name='ENTRY',
+            hazard_intervals=[0, 10, 20, 40, 100]
+        )))
+        assert np.all(intervals['person_time'] >= 0)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+""" Regression tests of the federated Kaplan-Meier against lifelines
+
+The federated result is compared with a centralised lifelines fit on generated
+datasets of increasing size. The federated computation also has to stay within
+a time and memory budget, so that changes to the aggregation cannot silently
+break the results or make them much slower.
+"""
+import time
+import importlib
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter, NelsonAalenFitter
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import (
+    MODULE, TIME_COLUMN_NAME, CENSOR_COLUMN_NAME, MockFederationClient,
+    generate_node_frames
+)
+
+NUMBER_OF_NODES = 3
+
+# The floats in the results are written with 10 decimal places
+TOLERANCE = 1e-9
+
+# The federated computation may take this many times as long as the
+# centralised lifelines fit, with a minimum for small datasets where the
+# overhead of the tasks dominates.
+TIME_BUDGET_FACTOR = 5
+MINIMUM_TIME_BUDGET = 5
+
+# The federated computation may allocate this many times the size of the data,
+# with a minimum for the overhead of small datasets.
+MEMORY_BUDGET_FACTOR = 2
+MINIMUM_MEMORY_BUDGET = 50_000_000
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+@pytest.fixture(scope='module')
+def kaplan_meier_central():
+    # importing the algorithm should not count towards the time budget
+    return importlib.import_module(MODULE).kaplan_meier_central
+
+
+def _run_federated(kaplan_meier_central, frames, **kwargs):
+    """ Run the federated Kaplan-Meier and measure its time and peak memory """
+    with MockFederationClient(frames) as client:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = kaplan_meier_central(
+            time_column_name=TIME_COLUMN_NAME,
+            censor_column_name=CENSOR_COLUMN_NAME,
+            mock_client=client,
+            **kwargs
+        )
+        duration = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return pd.read_json(StringIO(result)), duration, peak_memory
+
+
+@pytest.mark.parametrize(
+    'number_of_records', [10**3, 10**4, 10**5, 10**6, 10**7]
+)
+def test_matches_lifelines(kaplan_meier_central, number_of_records):
+    frames = generate_node_frames(
+        NUMBER_OF_NODES, number_of_records // NUMBER_OF_NODES
+    )
+    km, duration, peak_memory = _run_federated(
+        kaplan_meier_central, frames, estimators=['NELSON_AALEN']
+    )
+
+    df = pd.concat(frames, ignore_index=True)
+    start = time.perf_counter()
+    kmf = KaplanMeierFitter().fit(
+        df[TIME_COLUMN_NAME], event_observed=df[CENSOR_COLUMN_NAME]
+    )
+    lifelines_duration = time.perf_counter() - start
+    naf = NelsonAalenFitter(nelson_aalen_smoothing=False).fit(
+        df[TIME_COLUMN_NAME], event_observed=df[CENSOR_COLUMN_NAME]
+    )
+
+    # lifelines also reports time 0 when there are no records removed at 0
+    times = km[TIME_COLUMN_NAME].to_numpy()
+    event_table = kmf.event_table.loc[times]
+    for column in ['removed', 'observed', 'censored', 'at_risk']:
+        np.testing.assert_array_equal(
+            km[column].to_numpy(), event_table[column].to_numpy()
+        )
+    np.testing.assert_allclose(
+        km['survival_cdf'].to_numpy(),
+        kmf.survival_function_.loc[times].to_numpy().ravel(),
+        rtol=0, atol=TOLERANCE
+    )
+    np.testing.assert_allclose(
+        km['cumulative_hazard'].to_numpy(),
+        naf.cumulative_hazard_.loc[times].to_numpy().ravel(),
+        rtol=0, atol=TOLERANCE
+    )
+
+    time_budget = max(
+        MINIMUM_TIME_BUDGET, TIME_BUDGET_FACTOR * lifelines_duration
+    )
+    assert duration < time_budget, (
+        f'{duration:.2f} s exceeds the time budget of {time_budget:.2f} s'
+    )
+    memory_budget = max(
+        MINIMUM_MEMORY_BUDGET,
+        MEMORY_BUDGET_FACTOR * df.memory_usage(deep=True).sum()
+    )
+    assert peak_memory < memory_budget, (
+        f'{peak_memory} bytes exceeds the memory budget of {memory_budget} bytes'
+    )
+
+
+@pytest.mark.parametrize('number_of_records', [10**3, 10**5])
+def test_restricted_mean_survival_time_matches_lifelines(
+        kaplan_meier_central, number_of_records
+):
+    from lifelines.utils import restricted_mean_survival_time
+
+    frames = generate_node_frames(
+        NUMBER_OF_NODES, number_of_records // NUMBER_OF_NODES
+    )
+    km, _, _ = _run_federated(kaplan_meier_central, frames, estimators=['RMST'])
+
+    df = pd.concat(frames, ignore_index=True)
+    kmf = KaplanMeierFitter().fit(
+        df[TIME_COLUMN_NAME], event_observed=df[CENSOR_COLUMN_NAME]
+    )
+    for horizon in km[TIME_COLUMN_NAME].quantile([0.25, 0.5, 0.75]):
+        row = km[km[TIME_COLUMN_NAME] <= horizon].iloc[-1]
+        # the RMST of an event time only covers the area up to that time
+        expected = restricted_mean_survival_time(
+            kmf, t=row[TIME_COLUMN_NAME]
+        )
+        assert row['rmst'] == pytest.approx(expected, abs=1e-6)
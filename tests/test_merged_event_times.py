@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the merging of event times with too few events
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import (
+    MODULE, TIME_COLUMN_NAME, CENSOR_COLUMN_NAME, MockFederationClient,
+    generate_node_frames
+)
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+ENTRY_TIME_COLUMN_NAME = 'ENTRY_TIME'
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+@pytest.fixture
+def frames() -> list:
+    """ Node datasets in which half of the records enter the study late """
+    rng = np.random.default_rng(1)
+    frames = generate_node_frames(3, 400)
+    for df in frames:
+        late = rng.random(len(df)) < 0.5
+        df[ENTRY_TIME_COLUMN_NAME] = np.where(
+            late, np.floor(rng.uniform(0, 1, len(df)) * df[TIME_COLUMN_NAME]), 0
+        )
+    return frames
+
+
+def _maximum_deviation(frames: list, entry_time_column_name: str | None) -> float:
+    """ Maximum deviation of the federated survival from lifelines
+
+    Parameters:
+
+    - frames: Datasets of the nodes
+    - entry_time_column_name: Name of the entry time column, if any
+
+    Returns:
+
+    - The maximum absolute deviation at the released event times
+    """
+    kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+    with MockFederationClient(frames) as client:
+        km = pd.read_json(StringIO(kaplan_meier_central(
+            time_column_name=TIME_COLUMN_NAME,
+            censor_column_name=CENSOR_COLUMN_NAME,
+            entry_time_column_name=entry_time_column_name,
+            mock_client=client
+        )))
+    df = pd.concat(frames)
+    kmf = KaplanMeierFitter().fit(
+        df[TIME_COLUMN_NAME], df[CENSOR_COLUMN_NAME],
+        entry=df[entry_time_column_name] if entry_time_column_name else None
+    )
+    times = km[TIME_COLUMN_NAME].to_numpy()
+    expected = kmf.survival_function_at_times(times).to_numpy()
+    return np.abs(km['survival_cdf'].to_numpy() - expected).max()
+
+
+class TestMergedEventTimes:
+
+    def test_merged_group_includes_entries_within_group(self, monkeypatch):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME', _encode_env_var('2')
+        )
+        df = pd.DataFrame({
+            'TIME': [1, 2, 3, 4, 5],
+            'CENSOR': [1, 1, 0, 1, 1],
+            'ENTRY': [0, 1.5, 0, 0, 2.5],
+        })
+        km = pd.read_json(StringIO(partial.get_km_event_table(
+            mock_data=[df], time_column_name='TIME', censor_column_name='CENSOR',
+            entry_time_column_name='ENTRY', unique_event_times=[1, 2, 3, 4, 5]
+        )))
+        # the event times are merged into {1, 2} and {3, 4, 5}; the record that
+        # enters at 1.5 is at risk in the first group and the one that enters at
+        # 2.5 in the second group
+        assert km['TIME'].tolist() == [1, 3]
+        assert km['observed'].tolist() == [2, 2]
+        assert km['removed'].tolist() == [2, 3]
+        assert km['at_risk'].tolist() == [4, 3]
+
+    @pytest.mark.parametrize('entry_time_column_name', [None, ENTRY_TIME_COLUMN_NAME])
+    def test_without_merging_equals_lifelines(self, frames, entry_time_column_name):
+        assert _maximum_deviation(frames, entry_time_column_name) < 1e-9
+
+    @pytest.mark.parametrize('minimum_events', [3, 5])
+    @pytest.mark.parametrize('entry_time_column_name', [None, ENTRY_TIME_COLUMN_NAME])
+    def test_merging_stays_close_to_lifelines(
+            self, frames, monkeypatch, minimum_events, entry_time_column_name
+    ):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME',
+            _encode_env_var(str(minimum_events))
+        )
+        # with delayed entry, the deviation should be of the same size as
+        # without it
+        assert _maximum_deviation(frames, entry_time_column_name) < 0.05
+
+    def test_merging_with_delayed_entry_warns(self, frames, monkeypatch, capsys):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME', _encode_env_var('3')
+        )
+        _maximum_deviation(frames, ENTRY_TIME_COLUMN_NAME)
+        assert 'Merged event times with delayed entry' in capsys.readouterr().out
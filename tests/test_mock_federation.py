@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import importlib
+import pytest
+
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import (
+    MODULE, TIME_COLUMN_NAME, CENSOR_COLUMN_NAME, MockFederationClient,
+    generate_node_frames, run_mock_federation
+)
+
+
+class TestMockFederation:
+    """ Runs the federated Kaplan-Meier on a mock federation of many nodes
+    """
+    @pytest.fixture(autouse=True)
+    def node_configuration(self, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+
+    def test_matches_centralised_solution(self):
+        report = run_mock_federation(number_of_nodes=20, records_per_node=500)
+        assert report['max_survival_difference'] < 1e-8
+
+    def test_matches_centralised_solution_in_process_pool(self):
+        report = run_mock_federation(
+            number_of_nodes=5, records_per_node=500, processes=2
+        )
+        assert report['max_survival_difference'] < 1e-8
+
+    def test_resume_only_reruns_failed_organizations(self):
+        central = importlib.import_module(MODULE).kaplan_meier_central
+        kwargs = dict(
+            time_column_name=TIME_COLUMN_NAME,
+            censor_column_name=CENSOR_COLUMN_NAME
+        )
+        with MockFederationClient(generate_node_frames(3, 500)) as client:
+            expected = central(mock_client=client, **kwargs)
+
+            client.failing_organizations = {'get_km_event_table': [1]}
+            central(mock_client=client, **kwargs)
+            failed_task_ids = list(client.tasks)[-2:]
+
+            client.failing_organizations = {}
+            number_of_tasks = len(client.tasks)
+            result = central(
+                mock_client=client, resume_task_ids=failed_task_ids, **kwargs
+            )
+            resumed_task_ids = list(client.tasks)[number_of_tasks:]
+
+        assert result == expected
+        # only the failed organization runs the failed partial method again
+        assert len(resumed_task_ids) == 1
+        runs = client.run.from_task(resumed_task_ids[0])
+        assert [run['organization']['id'] for run in runs] == [1]
+
+    def test_profiling_logs_summary_without_changing_result(
+            self, monkeypatch, capsys
+    ):
+        central = importlib.import_module(MODULE).kaplan_meier_central
+        kwargs = dict(
+            time_column_name=TIME_COLUMN_NAME,
+            censor_column_name=CENSOR_COLUMN_NAME
+        )
+        frames = generate_node_frames(3, 500)
+        with MockFederationClient(frames) as client:
+            expected = central(mock_client=client, **kwargs)
+        capsys.readouterr()
+
+        monkeypatch.setenv('KAPLAN_MEIER_PROFILING', _encode_env_var('true'))
+        with MockFederationClient(frames) as client:
+            result = central(mock_client=client, **kwargs)
+        log = capsys.readouterr().out
+
+        assert result == expected
+        # the partial functions are part of the profile of the central function
+        assert log.count('Profile of ') == 1
+        assert 'Profile of kaplan_meier_central' in log
+        assert 'Peak traced memory' in log
+        assert 'get_km_event_table' in log
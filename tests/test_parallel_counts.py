@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the event counting in a process pool
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+NUMBER_OF_RECORDS = 3000
+NUMBER_OF_PROCESSES = 3
+
+
+@pytest.fixture
+def records() -> pd.DataFrame:
+    """ Records with float event times that are shared between the shards """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'TIME': np.round(rng.exponential(10, NUMBER_OF_RECORDS), 1),
+        'CENSOR': rng.integers(0, 2, NUMBER_OF_RECORDS),
+        'WEIGHT': rng.uniform(0.5, 2, NUMBER_OF_RECORDS),
+    })
+
+
+class TestParallelCounts:
+
+    @pytest.fixture(autouse=True)
+    def node_configuration(self, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_NUMBER_OF_PROCESSES',
+            _encode_env_var(str(NUMBER_OF_PROCESSES))
+        )
+        # every shard should be large enough for the process pool to be used
+        monkeypatch.setattr(partial, 'MINIMUM_NUMBER_OF_RECORDS_PER_SHARD', 100)
+
+    def test_sharded_counts_equal_serial_counts(self, records, capsys):
+        sharded = partial._compute_event_counts(records, 'TIME', 'CENSOR')
+        assert f'in {NUMBER_OF_PROCESSES} shards' in capsys.readouterr().out
+
+        serial = partial._count_events(records, 'TIME', 'CENSOR')
+        pd.testing.assert_frame_equal(sharded, serial, check_dtype=False)
+        assert sharded['removed'].sum() == NUMBER_OF_RECORDS
+
+    def test_sharded_weighted_counts_equal_serial_counts(self, records, capsys):
+        sharded = partial._compute_event_counts(
+            records, 'TIME', 'CENSOR', 'WEIGHT'
+        )
+        assert f'in {NUMBER_OF_PROCESSES} shards' in capsys.readouterr().out
+
+        serial = partial._count_events(records, 'TIME', 'CENSOR', 'WEIGHT')
+        # the sums of the weights are added in a different order
+        pd.testing.assert_frame_equal(sharded, serial, rtol=1e-12)
+        assert sharded['removed'].sum() == pytest.approx(records['WEIGHT'].sum())
+
+    @pytest.mark.parametrize('weight_column_name', [None, 'WEIGHT'])
+    def test_sharded_event_table_equals_serial_event_table(
+            self, records, monkeypatch, weight_column_name
+    ):
+        kwargs = dict(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            unique_event_times=np.unique(records['TIME']).tolist(),
+            weight_column_name=weight_column_name
+        )
+        sharded = partial.get_km_event_table(mock_data=[records], **kwargs)
+        monkeypatch.setenv('KAPLAN_MEIER_NUMBER_OF_PROCESSES', _encode_env_var('1'))
+        serial = partial.get_km_event_table(mock_data=[records], **kwargs)
+
+        pd.testing.assert_frame_equal(
+            pd.read_json(StringIO(sharded)), pd.read_json(StringIO(serial)),
+            rtol=1e-9
+        )
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the Parquet data sources read with Arrow, which are compared with
+pandas
+"""
+import json
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from vantage6.algorithm.tools.exceptions import InputError
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+NUMBER_OF_RECORDS = 2000
+
+
+@pytest.fixture
+def records() -> pd.DataFrame:
+    """ Records of three sites with float event times and an age """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'TIME': np.round(rng.exponential(10, NUMBER_OF_RECORDS), 1),
+        'CENSOR': rng.integers(0, 2, NUMBER_OF_RECORDS),
+        'AGE': rng.integers(20, 90, NUMBER_OF_RECORDS),
+        'SITE': rng.integers(1, 4, NUMBER_OF_RECORDS),
+    })
+
+
+@pytest.fixture(params=['dataset', 'file'])
+def source(request, monkeypatch, tmp_path, records) -> str:
+    """ A hive partitioned Parquet dataset or a single Parquet file """
+    if request.param == 'dataset':
+        path = tmp_path / 'records'
+        records.to_parquet(path, partition_cols=['SITE'], index=False)
+    else:
+        path = tmp_path / 'records.parquet'
+        records.to_parquet(path, index=False)
+    monkeypatch.setenv('USER_REQUESTED_DATABASE_LABELS', 'default')
+    monkeypatch.setenv('DEFAULT_DATABASE_URI', str(path))
+    monkeypatch.setenv('DEFAULT_DATABASE_TYPE', 'parquet')
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    return request.param
+
+
+def _filter_range(
+        column: str, min_: float | None = None, max_: float | None = None,
+        include_min: bool = False, include_max: bool = False
+) -> dict:
+    """ Preprocessing step that selects a range of a column
+
+    Parameters:
+
+    - column: Name of the column
+    - min_, max_: Bounds of the range, None for no bound
+    - include_min, include_max: Whether the bounds are part of the range
+
+    Returns:
+
+    - The preprocessing step
+    """
+    return {
+        'function': 'filter_range',
+        'parameters': {
+            'column': column, 'min_': min_, 'max_': max_,
+            'include_min': include_min, 'include_max': include_max,
+        },
+    }
+
+
+class TestParquet:
+
+    @pytest.mark.parametrize('preprocessing, selection', [
+        ([], lambda df: df.index >= 0),
+        ([_filter_range('AGE', 40, 70, include_min=True)],
+         lambda df: (df['AGE'] >= 40) & (df['AGE'] < 70)),
+        # a filter on the partition column skips the other partitions
+        ([_filter_range('SITE', max_=2, include_max=True),
+          _filter_range('AGE', min_=50)],
+         lambda df: (df['SITE'] <= 2) & (df['AGE'] > 50)),
+    ])
+    def test_event_table_equals_pandas(
+            self, source, records, monkeypatch, capsys, preprocessing, selection
+    ):
+        monkeypatch.setenv('DEFAULT_PREPROCESSING', json.dumps(preprocessing))
+        cohort = records[selection(records)]
+        kwargs = dict(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            unique_event_times=np.unique(cohort['TIME']).tolist()
+        )
+        parquet = partial.get_km_event_table(**kwargs)
+        # only the requested columns are read
+        assert "Reading columns ['TIME', 'CENSOR']" in capsys.readouterr().out
+
+        expected = partial.get_km_event_table(mock_data=[cohort.copy()], **kwargs)
+        pd.testing.assert_frame_equal(
+            pd.read_json(StringIO(parquet)), pd.read_json(StringIO(expected)),
+            check_dtype=False
+        )
+
+    def test_unique_event_times_equal_pandas(self, source, records, monkeypatch):
+        monkeypatch.setenv(
+            'DEFAULT_PREPROCESSING', json.dumps([_filter_range('AGE', max_=60)])
+        )
+        unique_event_times = partial.get_unique_event_times(time_column_name='TIME')
+        assert sorted(unique_event_times) == np.unique(
+            records.loc[records['AGE'] < 60, 'TIME']
+        ).tolist()
+
+    def test_filtered_records_are_counted_before_loading(
+            self, source, records, monkeypatch
+    ):
+        monkeypatch.setenv(
+            'DEFAULT_PREPROCESSING', json.dumps([_filter_range('AGE', min_=88)])
+        )
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS',
+            _encode_env_var(str((records['AGE'] > 88).sum()))
+        )
+        with pytest.raises(InputError, match='must be greater than'):
+            partial.get_unique_event_times(time_column_name='TIME')
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the privacy guards that run before the data is loaded
+"""
+import importlib
+import pandas as pd
+import pytest
+
+from vantage6.algorithm.tools.exceptions import InputError
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+cache = importlib.import_module(f'{MODULE}.cache')
+partial = importlib.import_module(f'{MODULE}.partial')
+
+MINIMUM_NUMBER_OF_RECORDS = 5
+
+
+class TestPreflight:
+
+    @pytest.fixture(autouse=True)
+    def csv_file(self, monkeypatch, tmp_path):
+        self.source = tmp_path / 'data.csv'
+        self.source.write_text(
+            'TIME,CENSOR,AGE\n' + ''.join(f'{i},{i % 2},{50 + i}\n' for i in range(8))
+        )
+        monkeypatch.setenv('USER_REQUESTED_DATABASE_LABELS', 'default')
+        monkeypatch.setenv('DEFAULT_DATABASE_URI', str(self.source))
+        monkeypatch.setenv('DEFAULT_DATABASE_TYPE', 'csv')
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS',
+            _encode_env_var(str(MINIMUM_NUMBER_OF_RECORDS))
+        )
+        monkeypatch.setenv('KAPLAN_MEIER_EVENT_TIME_COLUMN', _encode_env_var('TIME'))
+
+    @pytest.fixture
+    def no_data_loading(self, monkeypatch):
+        """ Fail the test when the data source is read """
+        def read_csv(*args, **kwargs):
+            raise AssertionError('The data source was read')
+        monkeypatch.setattr(pd, 'read_csv', read_csv)
+
+    def test_disallowed_time_column_is_rejected_before_loading(
+            self, no_data_loading
+    ):
+        with pytest.raises(InputError, match="'AGE' is not allowed"):
+            partial.get_unique_event_times(time_column_name='AGE')
+        with pytest.raises(InputError, match="'AGE' is not allowed"):
+            partial.get_km_event_table(
+                time_column_name='AGE', censor_column_name='CENSOR',
+                unique_event_times=[1, 2, 3]
+            )
+
+    def test_too_small_time_grid_is_rejected_before_loading(
+            self, monkeypatch, no_data_loading
+    ):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_MINIMUM_TIME_GRID_WIDTH', _encode_env_var('7')
+        )
+        with pytest.raises(InputError, match='time grid'):
+            partial.get_km_event_table(
+                time_column_name='TIME', censor_column_name='CENSOR',
+                time_grid_width=1
+            )
+        with pytest.raises(InputError, match='hazard intervals'):
+            partial.get_km_event_table(
+                time_column_name='TIME', censor_column_name='CENSOR',
+                hazard_intervals=[0, 7, 10]
+            )
+
+    def test_too_few_records_are_rejected_before_loading(self, no_data_loading):
+        self.source.write_text(
+            'TIME,CENSOR\n' + ''.join(f'{i},1\n' for i in range(5))
+        )
+        with pytest.raises(InputError, match='must be greater than 5'):
+            partial.get_unique_event_times(time_column_name='TIME')
+
+    @pytest.mark.parametrize('content, expected', [
+        ('TIME\n1\n2\n3\n', 3),
+        # without a line ending after the last record
+        ('TIME\n1\n2\n3', 3),
+        ('TIME\n', 0),
+        ('TIME', 0),
+    ])
+    def test_records_are_counted_from_line_endings(self, content, expected):
+        self.source.write_text(content)
+        assert cache._count_records(str(self.source), 'csv', ['TIME']) == expected
+
+    def test_estimated_number_of_records_is_verified_after_loading(self):
+        # the blank lines are counted as records before the data is loaded, but they
+        # are not in the loaded data
+        self.source.write_text(
+            'TIME,CENSOR\n' + ''.join(f'{i},1\n' for i in range(5)) + '\n\n'
+        )
+        assert cache._count_records(str(self.source), 'csv', ['TIME']) == 7
+        with pytest.raises(InputError, match='must be greater than 5'):
+            partial.get_unique_event_times(time_column_name='TIME')
+
+    def test_allowed_request_loads_the_data(self):
+        assert sorted(partial.get_unique_event_times(time_column_name='TIME')) == [
+            *range(8)
+        ]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the precision and the size budget of the results
+"""
+import json
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+utils = importlib.import_module(f'{MODULE}.utils')
+
+
+@pytest.fixture
+def km() -> pd.DataFrame:
+    """ Kaplan-Meier curve of 1000 event times, with a single event each """
+    times = np.arange(1, 1001, dtype=float)
+    at_risk = 1000 - np.arange(1000, dtype=float)
+    hazard = 1 / at_risk
+    return pd.DataFrame({
+        'TIME': times,
+        'removed': np.ones(1000),
+        'observed': np.ones(1000),
+        'censored': np.zeros(1000),
+        'at_risk': at_risk,
+        'hazard': hazard,
+        'survival_cdf': np.cumprod(1 - hazard),
+    })
+
+
+class TestResultSize:
+
+    def test_whole_numbers_are_written_as_integers(self, km):
+        result = json.loads(utils.event_table_to_json(km, 'TIME'))
+        assert result['TIME']['0'] == 1 and isinstance(result['TIME']['0'], int)
+        assert isinstance(result['at_risk']['0'], int)
+        assert isinstance(result['hazard']['0'], float)
+        assert '1.0,' not in utils.event_table_to_json(km, 'TIME')
+
+    def test_float_precision(self, km, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_FLOAT_PRECISION', _encode_env_var('3'))
+        result = pd.read_json(
+            StringIO(utils.event_table_to_json(km, 'TIME')), precise_float=True
+        )
+        np.testing.assert_allclose(
+            result['hazard'], np.round(km['hazard'], 3), rtol=0, atol=1e-15
+        )
+        assert len(utils.event_table_to_json(km, 'TIME')) < len(km.to_json())
+
+    @pytest.mark.parametrize('label, times, at_risk', [
+        ('last', [2, 4, 5], [5, 3, 1]),
+        ('first', [1, 3, 5], [5, 3, 1]),
+    ])
+    def test_coarsening_equals_hand_computation(self, label, times, at_risk):
+        km = pd.DataFrame({
+            'TIME': [1, 2, 3, 4, 5],
+            'observed': [1, 0, 1, 1, 0],
+            'censored': [0, 1, 0, 0, 1],
+            'removed': [1, 1, 1, 1, 1],
+            'at_risk': [5, 4, 3, 2, 1],
+        })
+        coarse = utils.coarsen_event_table(km, 'TIME', 2, label)
+        assert coarse['TIME'].tolist() == times
+        assert coarse['observed'].tolist() == [1, 2, 0]
+        assert coarse['censored'].tolist() == [1, 0, 1]
+        assert coarse['at_risk'].tolist() == at_risk
+
+    def test_result_is_coarsened_to_fit_budget(self, km, monkeypatch, capsys):
+        full = utils.event_table_to_json(km, 'TIME')
+        budget = len(full) // 5
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_RESULT_SIZE_BUDGET', _encode_env_var(str(budget))
+        )
+        result = utils.event_table_to_json(km, 'TIME')
+        assert len(result) <= budget
+        assert 'Combined every 8 event times' in capsys.readouterr().out
+
+        coarse = pd.read_json(StringIO(result)).set_index('TIME')
+        assert coarse['observed'].sum() == km['observed'].sum()
+        # the survival stays exact at the reported event times
+        expected = km.set_index('TIME').loc[coarse.index, 'survival_cdf']
+        np.testing.assert_allclose(coarse['survival_cdf'], expected, atol=1e-10)
+        # the hazard of a group combines the hazards of its event times
+        survival_before = np.concatenate(([1], expected.to_numpy()[:-1]))
+        np.testing.assert_allclose(
+            coarse['hazard'], 1 - expected / survival_before, atol=1e-9
+        )
+
+    def test_budget_is_not_met_without_coarsening(self, km, monkeypatch, capsys):
+        monkeypatch.setenv('KAPLAN_MEIER_RESULT_SIZE_BUDGET', _encode_env_var('100'))
+        result = utils.event_table_to_json(km, 'TIME', allow_coarsening=False)
+        assert len(pd.read_json(StringIO(result))) == len(km)
+        assert 'exceeds the size budget' in capsys.readouterr().out
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the secure aggregation of the event tables
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from vantage6.algorithm.tools.exceptions import PrivacyThresholdViolation
+from vantage6.algorithm.tools.mock_client import MockAlgorithmClient
+from .enconding_env_vars import _encode_env_var
+from .federated_solution import _launch_subtask
+from .mock_federation import (
+    MODULE, TIME_COLUMN_NAME, CENSOR_COLUMN_NAME, generate_node_frames
+)
+
+partial = importlib.import_module(f'{MODULE}.partial')
+secure_aggregation = importlib.import_module(f'{MODULE}.secure_aggregation')
+
+NUMBER_OF_NODES = 3
+SESSION = 'session'
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv(
+        'KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var(str(NUMBER_OF_NODES))
+    )
+
+
+@pytest.fixture
+def frames() -> list:
+    return generate_node_frames(NUMBER_OF_NODES, 200)
+
+
+@pytest.fixture
+def client(frames, tmp_path) -> MockAlgorithmClient:
+    """ Mock client with a CSV file per node """
+    datasets = []
+    for node, df in enumerate(frames):
+        path = tmp_path / f'node_{node}.csv'
+        df.to_csv(path, index=False)
+        datasets.append([{'database': str(path), 'db_type': 'csv'}])
+    return MockAlgorithmClient(
+        datasets=datasets, organization_ids=list(range(NUMBER_OF_NODES)),
+        module=MODULE
+    )
+
+
+class TestSecureAggregation:
+
+    def test_masked_sum_equals_clear_sum(self, client):
+        org_ids = list(range(NUMBER_OF_NODES))
+        first_step = _launch_subtask(
+            client, 'get_unique_event_times', org_ids,
+            time_column_name=TIME_COLUMN_NAME, secure_aggregation_session=SESSION
+        )
+        public_keys = [result['public_key'] for result in first_step]
+        unique_event_times = np.unique(np.concatenate(
+            [result['event_times'] for result in first_step]
+        )).tolist()
+
+        kwargs = dict(
+            time_column_name=TIME_COLUMN_NAME,
+            censor_column_name=CENSOR_COLUMN_NAME,
+            unique_event_times=unique_event_times
+        )
+        masked = [
+            np.asarray(result['masked_counts'], dtype=np.uint64)
+            for result in _launch_subtask(
+                client, 'get_km_event_table', org_ids,
+                secure_aggregation_session=SESSION, public_keys=public_keys,
+                **kwargs
+            )
+        ]
+        clear = [
+            pd.read_json(StringIO(event_table))[
+                secure_aggregation.SECURE_AGGREGATION_COLUMNS
+            ].to_numpy()
+            for event_table in _launch_subtask(
+                client, 'get_km_event_table', org_ids, **kwargs
+            )
+        ]
+
+        assert np.array_equal(
+            secure_aggregation.sum_masked_counts(masked), np.sum(clear, axis=0)
+        )
+        for masked_counts, clear_counts in zip(masked, clear):
+            # the masks hide (almost) every count of the individual nodes
+            assert np.mean(masked_counts.astype(np.int64) == clear_counts) < 0.01
+
+    def test_fingerprint_does_not_depend_on_record_order(self, frames):
+        times = frames[0][TIME_COLUMN_NAME]
+        shuffled = times.sample(frac=1, random_state=0)
+        assert secure_aggregation.fingerprint(shuffled) == (
+            secure_aggregation.fingerprint(times)
+        )
+        assert secure_aggregation.fingerprint(times + 1) != (
+            secure_aggregation.fingerprint(times)
+        )
+
+    def test_masks_cancel_in_sum(self):
+        counts = np.arange(12).reshape(4, 3)
+        keys = [secure_aggregation.get_public_key(SESSION, bytes([node]))
+                for node in range(NUMBER_OF_NODES)]
+        masked = [
+            secure_aggregation.mask_counts(counts, SESSION, keys, bytes([node]))
+            for node in range(NUMBER_OF_NODES)
+        ]
+        assert np.array_equal(
+            secure_aggregation.sum_masked_counts(masked), NUMBER_OF_NODES * counts
+        )
+
+    def test_too_few_organizations_are_refused(self, frames):
+        data_fingerprint = secure_aggregation.fingerprint(frames[0][TIME_COLUMN_NAME])
+        public_key = secure_aggregation.get_public_key(SESSION, data_fingerprint)
+        # the same key twice does not count as another organization
+        public_keys = [public_key, public_key, 'other']
+        with pytest.raises(PrivacyThresholdViolation):
+            partial.get_km_event_table(
+                mock_data=[frames[0]], time_column_name=TIME_COLUMN_NAME,
+                censor_column_name=CENSOR_COLUMN_NAME,
+                unique_event_times=[1, 2, 3],
+                secure_aggregation_session=SESSION, public_keys=public_keys
+            )
+
+    def test_clear_event_table_is_refused_when_required(self, frames, monkeypatch):
+        monkeypatch.setenv(
+            'KAPLAN_MEIER_REQUIRE_SECURE_AGGREGATION', _encode_env_var('true')
+        )
+        with pytest.raises(PrivacyThresholdViolation):
+            partial.get_km_event_table(
+                mock_data=[frames[0]], time_column_name=TIME_COLUMN_NAME,
+                censor_column_name=CENSOR_COLUMN_NAME,
+                unique_event_times=[1, 2, 3]
+            )
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the SQL pushdown, which are compared with pandas
+"""
+import sqlite3
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+NUMBER_OF_RECORDS = 2000
+
+
+@pytest.fixture
+def records() -> pd.DataFrame:
+    """ Records with float event times, entry times, causes and weights """
+    rng = np.random.default_rng(0)
+    times = np.round(rng.exponential(10, NUMBER_OF_RECORDS), 1)
+    return pd.DataFrame({
+        'TIME': times,
+        'CENSOR': rng.integers(0, 2, NUMBER_OF_RECORDS),
+        'ENTRY': np.round(times * rng.uniform(0, 0.5, NUMBER_OF_RECORDS), 1),
+        'CAUSE': rng.integers(1, 3, NUMBER_OF_RECORDS),
+        'WEIGHT': rng.choice([0.5, 1.0, 2.0], NUMBER_OF_RECORDS),
+    })
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch, tmp_path, records):
+    path = tmp_path / 'records.sqlite'
+    with sqlite3.connect(path) as connection:
+        records.to_sql('records', connection, index=False)
+    monkeypatch.setenv('USER_REQUESTED_DATABASE_LABELS', 'default')
+    monkeypatch.setenv('DEFAULT_DATABASE_URI', str(path))
+    monkeypatch.setenv('DEFAULT_DATABASE_TYPE', 'sql')
+    monkeypatch.setenv('DEFAULT_QUERY', 'SELECT * FROM records')
+    monkeypatch.setenv('KAPLAN_MEIER_SQL_PUSHDOWN', _encode_env_var('true'))
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+
+
+def _event_tables(records: pd.DataFrame, **kwargs) -> tuple:
+    """ Compute the event table with the SQL pushdown and with pandas
+
+    Parameters:
+
+    - records: Records that are stored in the database
+    - kwargs: Arguments of ``get_km_event_table``
+
+    Returns:
+
+    - The event tables of the SQL pushdown and of pandas
+    """
+    kwargs = dict(time_column_name='TIME', censor_column_name='CENSOR', **kwargs)
+    if 'time_grid_width' not in kwargs and 'hazard_intervals' not in kwargs:
+        kwargs['unique_event_times'] = np.unique(records['TIME']).tolist()
+    pushdown = partial.get_km_event_table(**kwargs)
+    expected = partial.get_km_event_table(mock_data=[records.copy()], **kwargs)
+    return pushdown, expected
+
+
+class TestSQLPushdown:
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'entry_time_column_name': 'ENTRY'},
+        {'event_type_column_name': 'CAUSE'},
+        {'weight_column_name': 'WEIGHT'},
+        {'time_grid_width': 2.5, 'time_grid_horizon': 30},
+        {'time_grid_width': 2.5, 'time_grid_horizon': 30,
+         'event_type_column_name': 'CAUSE'},
+        {'hazard_intervals': [0, 2.5, 10, 30]},
+        {'hazard_intervals': [1, 2.5, 10, 30], 'event_type_column_name': 'CAUSE'},
+        {'hazard_intervals': [0, 2.5, 10, 30], 'entry_time_column_name': 'ENTRY'},
+    ])
+    def test_event_table_equals_pandas(self, records, kwargs):
+        pushdown, expected = _event_tables(records, **kwargs)
+        pd.testing.assert_frame_equal(
+            pd.read_json(StringIO(pushdown)), pd.read_json(StringIO(expected)),
+            check_dtype=False, rtol=1e-9
+        )
+
+    def test_data_profile_equals_pandas(self, records):
+        pushdown, expected = _event_tables(
+            records, entry_time_column_name='ENTRY', data_profile=True
+        )
+        assert pushdown['profile'] == expected['profile']
+        assert pushdown['profile']['records'] == NUMBER_OF_RECORDS
+
+    def test_unique_event_times_equal_pandas(self, records):
+        pushdown = partial.get_unique_event_times(time_column_name='TIME')
+        expected = partial.get_unique_event_times(
+            mock_data=[records.copy()], time_column_name='TIME'
+        )
+        assert sorted(pushdown) == sorted(expected)
+
+    @pytest.mark.parametrize('kwargs, maximum_rows', [
+        ({'time_grid_width': 2.5, 'time_grid_horizon': 30}, 2 * 14),
+        ({'hazard_intervals': [0, 2.5, 10, 30]}, 2 * 5),
+    ])
+    def test_times_are_binned_in_database(self, records, capsys, kwargs, maximum_rows):
+        _event_tables(records, **kwargs)
+        loaded = [
+            int(line.split('histogram of ')[1].split()[0])
+            for line in capsys.readouterr().out.splitlines()
+            if 'Loaded a histogram of' in line
+        ]
+        # a row per bin and censor value
+        assert loaded and loaded[0] <= maximum_rows
+
+    def test_histogram_is_expanded_for_event_time_noise(self, records, monkeypatch):
+        monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('POISSON'))
+        monkeypatch.setenv('KAPLAN_MEIER_RANDOM_SEED', _encode_env_var('1'))
+        pushdown = pd.read_json(StringIO(partial.get_km_event_table(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            unique_event_times=list(range(200))
+        )))
+        assert pushdown['removed'].sum() == NUMBER_OF_RECORDS
+
+    @pytest.mark.parametrize('kwargs', [
+        {'time_grid_width': 2.5, 'time_grid_horizon': 30},
+        {},
+    ])
+    def test_secure_aggregation_identifies_node(self, records, monkeypatch, kwargs):
+        monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('2'))
+        secure_aggregation = importlib.import_module(f'{MODULE}.secure_aggregation')
+        session = 'session'
+        first_step = partial.get_unique_event_times(
+            time_column_name='TIME', secure_aggregation_session=session
+        )
+        # the public key of another node in the session
+        other = records.iloc[:100]
+        public_keys = [
+            first_step['public_key'],
+            secure_aggregation.get_public_key(
+                session, secure_aggregation.fingerprint(
+                    other['TIME'], np.ones(len(other), dtype=int)
+                )
+            ),
+        ]
+        pushdown, expected = _event_tables(
+            records, secure_aggregation_session=session, public_keys=public_keys,
+            **kwargs
+        )
+        assert pushdown['masked_counts'] == expected['masked_counts']
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the event tables on a fixed time grid
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+partial = importlib.import_module(f'{MODULE}.partial')
+utils = importlib.import_module(f'{MODULE}.utils')
+
+WIDTH = 7
+HORIZON = 21
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+def _grid_event_table(df: pd.DataFrame) -> pd.DataFrame:
+    """ Compute the event table of a dataset on the time grid
+
+    Parameters:
+
+    - df: Dataset with the TIME and CENSOR columns
+
+    Returns:
+
+    - The event table
+    """
+    result = partial.get_km_event_table(
+        mock_data=[df], time_column_name='TIME', censor_column_name='CENSOR',
+        time_grid_width=WIDTH, time_grid_horizon=HORIZON
+    )
+    return pd.read_json(StringIO(result))
+
+
+class TestTimeGrid:
+
+    @pytest.mark.parametrize('width, horizon, expected', [
+        (7, 21, [0, 7, 14, 21]),
+        # the last grid point is the first one at or after the horizon
+        (7, 20, [0, 7, 14, 21]),
+        (0.5, 1.2, [0, 0.5, 1, 1.5]),
+    ])
+    def test_grid_points(self, width, horizon, expected):
+        assert utils.get_time_grid(width, horizon).tolist() == expected
+
+    def test_event_table_equals_hand_computation(self):
+        df = pd.DataFrame({
+            'TIME': [0, 0.5, 3, 7, 7.5, 14, 20, 30],
+            'CENSOR': [0, 1, 1, 0, 1, 1, 1, 1],
+        })
+        km = _grid_event_table(df)
+        # the times are rounded up to the grid, and the record removed after the
+        # horizon is censored at the last grid point
+        assert km['TIME'].tolist() == [0, 7, 14, 21]
+        assert km['observed'].tolist() == [0, 2, 2, 1]
+        assert km['censored'].tolist() == [1, 1, 0, 1]
+        assert km['removed'].tolist() == [1, 3, 2, 2]
+        assert km['at_risk'].tolist() == [8, 7, 4, 2]
+
+    def test_event_tables_have_fixed_length(self):
+        rng = np.random.default_rng(0)
+        tables = [
+            _grid_event_table(pd.DataFrame({
+                'TIME': rng.exponential(scale, 50),
+                'CENSOR': rng.integers(0, 2, 50),
+            }))
+            for scale in (1, 10, 100)
+        ]
+        for km in tables:
+            assert km['TIME'].tolist() == [0, 7, 14, 21]
+            assert km['removed'].sum() == 50
+
+    def test_survival_equals_lifelines_on_snapped_times(self):
+        rng = np.random.default_rng(1)
+        frames = [
+            pd.DataFrame({
+                'TIME': rng.exponential(10, 200),
+                'CENSOR': rng.integers(0, 2, 200),
+            })
+            for _ in range(3)
+        ]
+        kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+        with MockFederationClient(frames) as client:
+            km = pd.read_json(StringIO(kaplan_meier_central(
+                time_column_name='TIME', censor_column_name='CENSOR',
+                time_grid_width=WIDTH, time_grid_horizon=HORIZON,
+                mock_client=client
+            )))
+
+        df = pd.concat(frames)
+        grid = utils.get_time_grid(WIDTH, HORIZON)
+        times = grid[np.minimum(np.searchsorted(grid, df['TIME']), len(grid) - 1)]
+        censor = np.where(df['TIME'] > grid[-1], 0, df['CENSOR'])
+        kmf = KaplanMeierFitter().fit(times, censor)
+        assert km['TIME'].tolist() == grid.tolist()
+        np.testing.assert_allclose(
+            km['survival_cdf'], kmf.survival_function_at_times(grid), atol=1e-9
+        )
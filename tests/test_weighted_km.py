@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+""" Unit tests of the weighted Kaplan-Meier curve
+"""
+import importlib
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+
+from io import StringIO
+from lifelines import KaplanMeierFitter
+from vantage6.algorithm.tools.exceptions import InputError
+from .enconding_env_vars import _encode_env_var
+from .mock_federation import MODULE, MockFederationClient
+
+partial = importlib.import_module(f'{MODULE}.partial')
+
+
+@pytest.fixture(autouse=True)
+def node_configuration(monkeypatch):
+    monkeypatch.setenv('KAPLAN_MEIER_TYPE_NOISE', _encode_env_var('NONE'))
+    monkeypatch.setenv('KAPLAN_MEIER_MINIMUM_ORGANIZATIONS', _encode_env_var('1'))
+
+
+@pytest.fixture
+def frames() -> list:
+    """ Node datasets with tied integer times and sampling weights """
+    rng = np.random.default_rng(0)
+    return [
+        pd.DataFrame({
+            'TIME': rng.integers(1, 60, 300),
+            'CENSOR': rng.integers(0, 2, 300),
+            'WEIGHT': rng.uniform(0.2, 5, 300),
+        })
+        for _ in range(3)
+    ]
+
+
+def _central(frames: list, **kwargs) -> pd.DataFrame:
+    """ Compute the Kaplan-Meier curve of the node datasets
+
+    Parameters:
+
+    - frames: Datasets of the nodes
+    - kwargs: Additional arguments of ``kaplan_meier_central``
+
+    Returns:
+
+    - The Kaplan-Meier curve
+    """
+    kaplan_meier_central = importlib.import_module(MODULE).kaplan_meier_central
+    with MockFederationClient(frames) as client:
+        return pd.read_json(StringIO(kaplan_meier_central(
+            time_column_name='TIME', censor_column_name='CENSOR',
+            mock_client=client, **kwargs
+        )), precise_float=True)
+
+
+class TestWeightedKaplanMeier:
+
+    def test_event_table_equals_hand_computation(self):
+        df = pd.DataFrame({
+            'TIME': [1, 1, 2, 3],
+            'CENSOR': [1, 0, 1, 0],
+            'WEIGHT': [0.5, 2, 1, 1.5],
+        })
+        km = pd.read_json(StringIO(partial.get_km_event_table(
+            mock_data=[df], time_column_name='TIME', censor_column_name='CENSOR',
+            weight_column_name='WEIGHT', unique_event_times=[1, 2, 3]
+        )))
+        assert km['observed'].tolist() == [0.5, 1, 0]
+        assert km['censored'].tolist() == [2, 0, 1.5]
+        assert km['at_risk'].tolist() == [5, 2.5, 1.5]
+        assert km['observed_squared'].tolist() == [0.25, 1, 0]
+        assert km['at_risk_squared'].tolist() == [7.5, 3.25, 2.25]
+
+    def test_survival_equals_lifelines(self, frames):
+        km = _central(frames, weight_column_name='WEIGHT')
+        df = pd.concat(frames)
+        with warnings.catch_warnings():
+            # lifelines warns about weights that are not integers
+            warnings.simplefilter('ignore')
+            kmf = KaplanMeierFitter().fit(
+                df['TIME'], df['CENSOR'], weights=df['WEIGHT']
+            )
+        np.testing.assert_allclose(
+            km['survival_cdf'], kmf.survival_function_at_times(km['TIME']),
+            atol=1e-9
+        )
+
+    def test_unit_weights_give_greenwood_variance(self, frames):
+        for df in frames:
+            df['WEIGHT'] = 1.0
+        weighted = _central(frames, weight_column_name='WEIGHT')
+        km = _central(frames)
+        np.testing.assert_allclose(weighted['survival_cdf'], km['survival_cdf'])
+
+        observed, at_risk = km['observed'], km['at_risk']
+        terms = np.where(
+            at_risk > observed, observed / (at_risk * (at_risk - observed)), 0
+        )
+        np.testing.assert_allclose(
+            weighted['survival_cdf_variance'],
+            km['survival_cdf'] ** 2 * np.cumsum(terms),
+            # the results are written with 10 decimals
+            rtol=0, atol=1e-10
+        )
+
+    @pytest.mark.parametrize('kwargs', [
+        {'entry_time_column_name': 'TIME'},
+        {'event_type_column_name': 'CENSOR'},
+        {'bootstrap_replicates': 10},
+    ])
+    def test_unsupported_combinations_are_rejected(self, frames, kwargs):
+        with pytest.raises(InputError, match='Weights can not be combined'):
+            partial.get_km_event_table(
+                mock_data=[frames[0]], time_column_name='TIME',
+                censor_column_name='CENSOR', weight_column_name='WEIGHT',
+                unique_event_times=[1, 2, 3], **kwargs
+            )
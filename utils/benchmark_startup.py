@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Measure the time it takes a fresh container to get to the algorithm method. This
+# mimics what the vantage6 wrapper does: import the algorithm package and look up the
+# requested method.
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+DEFAULT_PACKAGE = "v6-kaplan-meier-py"
+DEFAULT_METHODS = [
+    "kaplan_meier_central",
+    "get_unique_event_times",
+    "get_km_event_table",
+]
+DEFAULT_REPEAT = 5
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import importlib
+from vantage6.algorithm.tools.wrap import wrap_algorithm
+module = importlib.import_module({package!r})
+getattr(module, {method!r})
+print(time.perf_counter() - start)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure algorithm startup time")
+    parser.add_argument(
+        "-p", "--package", type=str, default=DEFAULT_PACKAGE, help="Algorithm package"
+    )
+    parser.add_argument(
+        "-m",
+        "--methods",
+        type=str,
+        nargs="+",
+        default=DEFAULT_METHODS,
+        help="Methods to measure",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Number of fresh interpreters per method",
+    )
+    parser.add_argument(
+        "-t", "--top", type=int, default=0, help="Show the N slowest imports per method"
+    )
+    return parser.parse_args()
+
+
+def measure(package: str, method: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT.format(package=package, method=method)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(package: str, method: str, top: int) -> list:
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            STARTUP_SCRIPT.format(package=package, method=method),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # only report top level imports, nested imports are included in their parents
+        if not name[1:].startswith(" "):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    args = parse_args()
+    # make sure the package can be imported from a checkout of the repository
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])
+    )
+
+    for method in args.methods:
+        timings = [measure(args.package, method) for _ in range(args.repeat)]
+        print(
+            f"{method}: median {statistics.median(timings) * 1000:.1f} ms, "
+            f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms"
+        )
+        for cumulative, name in slowest_imports(args.package, method, args.top):
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
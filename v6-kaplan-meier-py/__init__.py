@@ -1,2 +1,24 @@
-from .central import *
-from .partial import *
+from importlib import import_module
+
+# The methods are imported on first access. A task only executes a single method, so
+# there is no need to import the modules (and dependencies) of the other methods when
+# the container starts.
+_METHODS = {
+    "kaplan_meier_central": ".central",
+    "kaplan_meier_batch_central": ".central",
+    "get_unique_event_times": ".partial",
+    "get_km_event_table": ".partial",
+    "run_partials": ".partial",
+}
+
+__all__ = list(_METHODS)
+
+
+def __getattr__(name: str):
+    if name not in _METHODS:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    return getattr(import_module(_METHODS[name], __name__), name)
+
+
+def __dir__() -> list:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,643 @@
+"""
+This file contains the data loading of the partial functions and the node-local
+cache. Partial tasks are executed in a fresh container every time, so any work that
+should be reused between tasks is stored in sidecar files next to the data source. The
+sidecars are invalidated as soon as the data source is modified.
+
+Parquet files and (partitioned) Parquet datasets are read with Arrow when it is
+installed, and SQL databases can compute a histogram of the requested columns (see
+sql.py). Only the requested columns are read, and the cohort filter of the node
+preprocessing is pushed down to the dataset scan or query.
+"""
+
+import os
+import re
+import glob
+import hashlib
+import json
+import operator
+import numpy as np
+import pandas as pd
+
+from typing import Callable, List, Tuple
+from functools import wraps
+from vantage6.algorithm.tools.util import get_env_var, info, warn
+
+from .globals import KAPLAN_MEIER_CACHE, KAPLAN_MEIER_CACHE_DIRECTORY
+from .profiling import profile
+
+from .sql import (
+    NUMBER_OF_RECORDS_COLUMN,
+    count_sql_records,
+    get_sql_cohort,
+    load_sql_histogram,
+    sql_pushdown_enabled,
+)
+
+# Comparison operators of the filter conditions that can be pushed down
+FILTER_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+def cache_enabled() -> bool:
+    """
+    Check if the node administrator enabled the node-local cache.
+
+    Returns
+    -------
+    bool
+        True if the cache is enabled.
+    """
+    return get_env_var("KAPLAN_MEIER_CACHE", KAPLAN_MEIER_CACHE).lower() == "true"
+
+
+def get_source_file() -> str | None:
+    """
+    Get the path of the file that backs the database requested by the user.
+
+    Returns
+    -------
+    str | None
+        Path to the data source, or None when the data source is not a file (e.g.
+        when running with a mock client or against a database server).
+    """
+    label = _get_database_label()
+    if not label:
+        return None
+
+    database_uri = os.environ.get(f"{label}_DATABASE_URI")
+    if not database_uri or not os.path.isfile(database_uri):
+        return None
+    return database_uri
+
+
+def cached_data(
+    *column_arguments: str,
+    preflight: Callable | None = None,
+    columns_from: Callable | None = None,
+    sql_bins_from: Callable | None = None,
+) -> callable:
+    """
+    Decorator that adds the node data to a function, like ``@data(1)`` does.
+
+    When the node enabled the cache and the data source is a CSV file, only the
+    columns that are named in the ``column_arguments`` keyword arguments of the
+    decorated function are provided. These columns are memory-mapped from column
+    sidecars, which are created the first time the columns are requested. Parquet data
+    sources are scanned with Arrow, which also only reads these columns and applies the
+    ``filter_range`` preprocessing steps while scanning. When the node enabled the SQL
+    pushdown, these columns are counted inside SQL databases and only the histogram is
+    transferred, with the number of records of every row in the
+    :data:`.sql.NUMBER_OF_RECORDS_COLUMN` column. In all other cases the data is
+    loaded by the vantage6 ``@data(1)`` decorator. When the node enabled profiling,
+    the loading of the data and the call of the decorated function are profiled
+    together.
+
+    Parameters
+    ----------
+    *column_arguments : str
+        Names of the keyword arguments of the decorated function that contain column
+        names, e.g. ``"time_column_name"``.
+    preflight : callable, optional
+        Checks that are executed before any data is loaded, so that invalid requests
+        are rejected early. It is called with the keyword arguments of the decorated
+        function and ``number_of_records``: the number of records in the data source
+        as far as it can be determined without loading the data, or None. After the
+        data has been loaded, it is only called again when the actual number of
+        records differs from this estimate.
+    columns_from : callable, optional
+        Function that gets the column names from the keyword arguments of the
+        decorated function, for functions that do not take the column names as
+        separate arguments. Replaces ``column_arguments`` when set.
+    sql_bins_from : callable, optional
+        Function that gets the :class:`.sql.TimeBins` of the time column from the
+        keyword arguments of the decorated function, or None when the times are used
+        without binning. Only used with the SQL pushdown.
+
+    Returns
+    -------
+    callable
+        Decorated function
+
+    Examples
+    --------
+    >>> @cached_data("time_column_name")
+    >>> def my_partial(df: pd.DataFrame, time_column_name: str):
+    >>>     pass
+    """
+
+    def protection_decorator(func: callable) -> callable:
+        @wraps(func)
+        def load_and_call(*args, mock_data: list | None = None, **kwargs):
+            label = _get_database_label()
+            source = get_source_file()
+            db_type = os.environ.get(f"{label}_DATABASE_TYPE", "csv").lower()
+            if columns_from:
+                columns = columns_from(**kwargs)
+            else:
+                columns = [kwargs[arg] for arg in column_arguments if kwargs.get(arg)]
+
+            preprocessing = os.environ.get(f"{label}_PREPROCESSING")
+            parquet, sql_cohort = None, None
+            if mock_data is None and db_type == "parquet":
+                parquet = _parquet_dataset(
+                    os.environ.get(f"{label}_DATABASE_URI"), preprocessing
+                )
+            elif mock_data is None and db_type == "sql" and sql_pushdown_enabled():
+                sql_cohort = get_sql_cohort(
+                    os.environ.get(f"{label}_DATABASE_URI"),
+                    os.environ.get(f"{label}_QUERY"),
+                    filter_conditions(preprocessing),
+                )
+
+            if mock_data is not None:
+                number_of_records = len(mock_data[0])
+            elif parquet:
+                dataset, predicate = parquet
+                number_of_records = dataset.count_rows(filter=predicate)
+            elif sql_cohort:
+                number_of_records = count_sql_records(sql_cohort)
+            else:
+                number_of_records = _count_records(source, db_type, columns)
+            if preflight:
+                preflight(number_of_records=number_of_records, **kwargs)
+
+            @wraps(func)
+            def guarded_func(df: pd.DataFrame, *args, **kwargs):
+                if preflight and count_records(df) != number_of_records:
+                    preflight(number_of_records=count_records(df), **kwargs)
+                return func(df, *args, **kwargs)
+
+            if parquet:
+                df = _load_parquet_columns(*parquet, columns)
+                return guarded_func(df, *args, **kwargs)
+
+            if sql_cohort:
+                bins = sql_bins_from(**kwargs) if sql_bins_from else None
+                df = load_sql_histogram(sql_cohort, columns, bins)
+                return guarded_func(df, *args, **kwargs)
+
+            # The columnar cache only mirrors plain CSV files, preprocessing could
+            # depend on any of the other columns.
+            if (
+                mock_data is None
+                and cache_enabled()
+                and source
+                and db_type == "csv"
+                and not preprocessing
+            ):
+                df = _load_cached_columns(source, columns)
+                return guarded_func(df, *args, **kwargs)
+
+            # The vantage6 data decorator imports the drivers of all supported
+            # database types, so it is only imported when it is actually used.
+            from vantage6.algorithm.tools.decorators import data
+
+            return data(1)(guarded_func)(*args, mock_data=mock_data, **kwargs)
+
+        # the profile includes loading the data
+        @wraps(func)
+        def decorator(*args, **kwargs):
+            with profile(func.__name__):
+                return load_and_call(*args, **kwargs)
+
+        # the mock client provides data to functions wrapped in a data decorator
+        decorator.wrapped_in_data_decorator = True
+        return decorator
+
+    return protection_decorator
+
+
+def count_records(df: pd.DataFrame) -> int:
+    """
+    Count the records in the data, which can be a histogram of the SQL pushdown.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data.
+
+    Returns
+    -------
+    int
+        Number of records.
+    """
+    if NUMBER_OF_RECORDS_COLUMN in df:
+        return int(df[NUMBER_OF_RECORDS_COLUMN].sum())
+    return len(df)
+
+
+def sidecar_path(source: str, name: str, *key_parts) -> str:
+    """
+    Get the path of a sidecar file that belongs to ``source``.
+
+    The name of the sidecar contains a fingerprint of the database settings of the
+    node (type, query, sheet and preprocessing) and of ``key_parts``, followed by a
+    fingerprint of the source file (modification time and size). Whenever one of
+    these changes, a different path is returned so that stale sidecars are never
+    read. Versions of a sidecar that only differ in the fingerprint of the source file
+    are out of date, see :func:`store_array`.
+
+    Parameters
+    ----------
+    source : str
+        Path to the data source.
+    name : str
+        Name of the sidecar, e.g. ``"index"``.
+    *key_parts
+        JSON serializable values the content of the sidecar depends on.
+
+    Returns
+    -------
+    str
+        Path to the sidecar file.
+    """
+    stat = os.stat(source)
+    # The database type, the query or sheet of the database and the preprocessing (e.g.
+    # a cohort filter) determine the records the sidecar is computed from.
+    label = _get_database_label()
+    database = [
+        os.environ.get(f"{label}_{setting}")
+        for setting in ("DATABASE_TYPE", "QUERY", "SHEET_NAME", "PREPROCESSING")
+    ]
+    key = json.dumps([os.path.abspath(source), *database, *key_parts])
+    key_digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    version = json.dumps([stat.st_mtime_ns, stat.st_size])
+    version_digest = hashlib.sha256(version.encode("utf-8")).hexdigest()[:16]
+
+    directory = get_env_var(
+        "KAPLAN_MEIER_CACHE_DIRECTORY", KAPLAN_MEIER_CACHE_DIRECTORY
+    ) or os.path.dirname(os.path.abspath(source))
+    return os.path.join(
+        directory,
+        f"{os.path.basename(source)}.km-{name}-{key_digest}-{version_digest}.npy",
+    )
+
+
+def load_array(path: str, mmap_mode: str = "r") -> np.ndarray | None:
+    """
+    Memory-map a cached array.
+
+    Parameters
+    ----------
+    path : str
+        Path to the sidecar file.
+    mmap_mode : str, optional
+        Memory-map mode, use ``"c"`` for arrays that are modified in memory (default:
+        ``"r"``).
+
+    Returns
+    -------
+    np.ndarray | None
+        The memory-mapped array, or None if there is no (valid) sidecar.
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        array = np.load(path, mmap_mode=mmap_mode)
+    except (OSError, ValueError):
+        warn(f"Ignoring unreadable cache file '{path}'.")
+        return None
+    info(f"Using cache file '{path}'.")
+    return array
+
+
+def store_array(path: str, array: np.ndarray) -> None:
+    """
+    Store an array as sidecar file and remove stale versions of it, i.e. the same
+    sidecar computed from an earlier version of the data source.
+
+    Failing to write the cache (e.g. because the data is mounted read-only) is not
+    fatal, the computation simply continues without the cache.
+
+    Parameters
+    ----------
+    path : str
+        Path to the sidecar file, as obtained from :func:`sidecar_path`.
+    array : np.ndarray
+        Array to store.
+    """
+    # the prefix contains the name and key of the sidecar, see sidecar_path
+    prefix = path.rsplit("-", 1)[0]
+    try:
+        for stale in glob.glob(f"{glob.escape(prefix)}-*.npy"):
+            if stale != path:
+                os.remove(stale)
+        # write to a temporary file first, so that concurrent tasks never read a
+        # partially written sidecar
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fp:
+            np.save(fp, array)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        warn(f"Could not write cache file '{path}': {exc}")
+        return
+    info(f"Stored cache file '{path}'.")
+
+
+def ledger_path(name: str) -> str | None:
+    """
+    Get the path of a ledger that the node keeps for the database requested by the
+    user.
+
+    Contrary to sidecars, a ledger does not depend on the content of the data source,
+    so it is kept when the data source is modified. It is stored in the cache
+    directory, or next to the data source when that is a file.
+
+    Parameters
+    ----------
+    name : str
+        Name of the ledger, e.g. ``"privacy-budget"``.
+
+    Returns
+    -------
+    str | None
+        Path to the ledger, or None when there is no location to store it.
+    """
+    label = _get_database_label()
+    database_uri = os.environ.get(f"{label}_DATABASE_URI") if label else None
+    source = get_source_file()
+    directory = get_env_var(
+        "KAPLAN_MEIER_CACHE_DIRECTORY", KAPLAN_MEIER_CACHE_DIRECTORY
+    ) or (os.path.dirname(os.path.abspath(source)) if source else None)
+    if not directory:
+        return None
+
+    key = json.dumps([label, database_uri])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"km-{name}-{digest}.json")
+
+
+def add_to_ledger(path: str, amount: float, limit: float = 0) -> float | None:
+    """
+    Add an amount to the total of a ledger, unless the total would exceed a limit.
+
+    The ledger is locked while it is updated, so that tasks that run at the same time
+    can not both spend the last part of the limit.
+
+    Parameters
+    ----------
+    path : str
+        Path to the ledger, as obtained from :func:`ledger_path`.
+    amount : float
+        Amount to add.
+    limit : float, optional
+        Maximum total of the ledger, use 0 for no limit (default: 0).
+
+    Returns
+    -------
+    float | None
+        The new total, or None when the amount was not added because the total would
+        exceed the limit.
+
+    Raises
+    ------
+    OSError
+        If the ledger can not be read or written.
+    """
+    # ledgers are only kept on the (Linux) nodes
+    import fcntl
+
+    with open(path, "a+") as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        fp.seek(0)
+        content = fp.read()
+        total = json.loads(content)["total"] if content else 0.0
+        # allow for the rounding of the sum, e.g. of ten times 0.1
+        if 0 < limit < total + amount - 1e-9:
+            return None
+        total += amount
+        fp.seek(0)
+        fp.truncate()
+        json.dump({"total": total}, fp)
+    return total
+
+
+def _load_cached_columns(source: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Load columns of a CSV file from their memory-mapped sidecars.
+
+    Columns without a (valid) sidecar are parsed from the CSV file, and their sidecar
+    is created so that subsequent tasks can map them directly.
+
+    Parameters
+    ----------
+    source : str
+        Path to the CSV file.
+    columns : List[str]
+        Names of the columns to load. Columns that are not present in the CSV file are
+        ignored.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the requested columns, backed by copy-on-write memory maps.
+    """
+    paths = {column: _column_sidecar_path(source, column) for column in columns}
+    arrays = {column: load_array(path, mmap_mode="c") for column, path in paths.items()}
+
+    missing = [column for column, array in arrays.items() if array is None]
+    if missing:
+        available = pd.read_csv(source, nrows=0).columns
+        missing = [column for column in missing if column in available]
+        info(f"Reading columns {missing} from '{source}'.")
+        parsed = pd.read_csv(source, usecols=missing)
+        for column in missing:
+            arrays[column] = parsed[column].to_numpy()
+            # object columns can not be memory-mapped
+            if arrays[column].dtype.kind in "biuf":
+                store_array(paths[column], arrays[column])
+
+    return pd.DataFrame(
+        {column: array for column, array in arrays.items() if array is not None},
+        copy=False,
+    )
+
+
+def filter_conditions(preprocessing: str | None) -> List[Tuple[str, str, float]] | None:
+    """
+    Translate the preprocessing steps of the node into filter conditions.
+
+    Only ``filter_range`` steps on a named column can be translated, these are
+    typically used to select a cohort.
+
+    Parameters
+    ----------
+    preprocessing : str | None
+        JSON encoded preprocessing steps of the node.
+
+    Returns
+    -------
+    List[Tuple[str, str, float]] | None
+        Conditions as (column, comparison, value) tuples that all need to hold, where
+        the comparison is one of :data:`FILTER_OPERATORS`. None when the preprocessing
+        contains steps that can not be translated.
+    """
+    conditions = []
+    for step in json.loads(preprocessing) if preprocessing else []:
+        parameters = step.get("parameters", {})
+        column = parameters.get("column")
+        if step.get("function") != "filter_range" or not column:
+            info(f"Preprocessing step {step} can not be pushed down.")
+            return None
+
+        if parameters.get("min_") is not None:
+            comparison = ">=" if parameters.get("include_min", False) else ">"
+            conditions.append((column, comparison, parameters["min_"]))
+        if parameters.get("max_") is not None:
+            comparison = "<=" if parameters.get("include_max", False) else "<"
+            conditions.append((column, comparison, parameters["max_"]))
+    return conditions
+
+
+def _parquet_dataset(
+    database_uri: str | None, preprocessing: str | None
+) -> tuple | None:
+    """
+    Open a Parquet file or (hive partitioned) Parquet dataset with Arrow.
+
+    Parameters
+    ----------
+    database_uri : str | None
+        Path to the Parquet file or to the directory containing the dataset.
+    preprocessing : str | None
+        JSON encoded preprocessing steps of the node.
+
+    Returns
+    -------
+    tuple | None
+        The dataset and the filter expression (None when the data is not filtered).
+        None when Arrow is not installed or when the preprocessing contains steps that
+        can not be expressed as a filter, in which case the data should be loaded by
+        vantage6.
+    """
+    if not database_uri or not os.path.exists(database_uri):
+        return None
+    try:
+        import pyarrow.dataset as ds
+    except ImportError:
+        info("Arrow is not installed, loading the Parquet data with pandas.")
+        return None
+
+    conditions = filter_conditions(preprocessing)
+    if conditions is None:
+        return None
+
+    predicate = None
+    for column, comparison, value in conditions:
+        condition = FILTER_OPERATORS[comparison](ds.field(column), value)
+        predicate = condition if predicate is None else predicate & condition
+
+    dataset = ds.dataset(database_uri, format="parquet", partitioning="hive")
+    return dataset, predicate
+
+
+def _load_parquet_columns(dataset, predicate, columns: List[str]) -> pd.DataFrame:
+    """
+    Load columns of a Parquet dataset.
+
+    Only the requested columns are read, and row groups (and partitions) that do not
+    match the filter are skipped using their statistics.
+
+    Parameters
+    ----------
+    dataset : pyarrow.dataset.Dataset
+        The Parquet dataset.
+    predicate : pyarrow.dataset.Expression | None
+        Filter expression, or None to read all rows.
+    columns : List[str]
+        Names of the columns to load. Columns that are not present in the dataset are
+        ignored.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the requested columns of the matching rows.
+    """
+    columns = [column for column in columns if column in dataset.schema.names]
+    info(f"Reading columns {columns} from the Parquet dataset.")
+    table = dataset.to_table(columns=columns, filter=predicate)
+    # release the Arrow buffers while converting, so they are not kept twice
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _column_sidecar_path(source: str, column: str) -> str:
+    """
+    Get the path of the sidecar containing a single column of the data source.
+
+    Parameters
+    ----------
+    source : str
+        Path to the data source.
+    column : str
+        Name of the column.
+
+    Returns
+    -------
+    str
+        Path to the sidecar file.
+    """
+    return sidecar_path(source, "column-" + re.sub(r"\W", "_", column), column)
+
+
+def _count_records(source: str | None, db_type: str, columns: List[str]) -> int | None:
+    """
+    Determine the number of records in the data source without loading the data.
+
+    Parameters
+    ----------
+    source : str | None
+        Path to the data source.
+    db_type : str
+        Type of the data source.
+    columns : List[str]
+        Columns that will be loaded, their sidecars are used when available.
+
+    Returns
+    -------
+    int | None
+        Number of records, or None if this can not be determined cheaply.
+    """
+    if not source:
+        return None
+
+    if db_type == "csv":
+        if cache_enabled():
+            for column in columns:
+                path = _column_sidecar_path(source, column)
+                if os.path.isfile(path):
+                    return len(np.load(path, mmap_mode="r"))
+
+        # Counting the line endings is a lot cheaper than parsing the file. Quoted
+        # line endings and blank lines make this an upper bound of the number of
+        # records, which is verified once the data is loaded.
+        line_endings = 0
+        last_byte = b"\n"
+        with open(source, "rb") as fp:
+            while chunk := fp.read(1 << 20):
+                line_endings += chunk.count(b"\n")
+                last_byte = chunk[-1:]
+        number_of_lines = line_endings + (last_byte != b"\n")
+        # the first line contains the header
+        return max(number_of_lines - 1, 0)
+
+    return None
+
+
+def _get_database_label() -> str | None:
+    """
+    Get the label of the (first) database requested by the user.
+
+    Returns
+    -------
+    str | None
+        Upper case database label, or None when not running on a node.
+    """
+    labels = os.environ.get("USER_REQUESTED_DATABASE_LABELS")
+    if not labels:
+        return None
+    return labels.split(",")[0].upper()
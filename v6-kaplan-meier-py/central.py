@@ -6,25 +6,55 @@ The results in a return statement are sent to the vantage6 server (after
 encryption if that is enabled).
 """
 
+import json
+import hashlib
+import secrets
+import numpy as np
 import pandas as pd
 
-from typing import Dict, List, Union
+from io import StringIO
+from typing import Dict, Generator, List, Tuple, Union
 from vantage6.algorithm.client import AlgorithmClient
 from vantage6.algorithm.tools.util import info, error
 from vantage6.algorithm.tools.decorators import algorithm_client
-from vantage6.algorithm.tools.exceptions import PrivacyThresholdViolation
+from vantage6.algorithm.tools.exceptions import (
+    InputError,
+    PrivacyThresholdViolation,
+)
+from vantage6.common.task_status import TaskStatus
 
+from .enums import Estimator
 from .globals import KAPLAN_MEIER_MINIMUM_ORGANIZATIONS
-from .utils import get_env_var_as_int
+from .profiling import profiled
+from .utils import (
+    get_env_var_as_int,
+    encode_event_times,
+    decode_event_times,
+    get_time_grid,
+    event_table_to_json,
+)
 
 
 @algorithm_client
+@profiled
 def kaplan_meier_central(
     client: AlgorithmClient,
     time_column_name: str,
     censor_column_name: str,
     organizations_to_include: List[int] | None = None,
-) -> Dict[str, Union[str, List[str]]]:
+    bootstrap_replicates: int = 0,
+    confidence_level: float = 0.95,
+    event_type_column_name: str | None = None,
+    entry_time_column_name: str | None = None,
+    estimators: List[str] | None = None,
+    secure_aggregation: bool = False,
+    time_grid_width: float | None = None,
+    time_grid_horizon: float | None = None,
+    hazard_intervals: List[float] | None = None,
+    data_profile: bool = False,
+    weight_column_name: str | None = None,
+    resume_task_ids: List[int] | None = None,
+) -> str | dict:
     """
     Central part of the Federated Kaplan-Meier curve computation.
 
@@ -43,18 +73,215 @@ def kaplan_meier_central(
         Name of the column containing the censoring.
     organizations_to_include : list of int, optional
         List of organization IDs to include (default: None, includes all).
+    bootstrap_replicates : int, optional
+        Number of bootstrap replicates used to compute confidence bands for the
+        survival curve (default: 0, no confidence bands).
+    confidence_level : float, optional
+        Confidence level of the bootstrap confidence bands (default: 0.95).
+    event_type_column_name : str, optional
+        Name of the column containing the cause of the event. When set, the
+        cumulative incidence function of every cause is computed using the
+        Aalen-Johansen estimator (default: None).
+    entry_time_column_name : str, optional
+        Name of the column containing the time at which a record entered the study,
+        for left truncated data (default: None).
+    estimators : list of str, optional
+        Additional estimators to compute from the aggregated event table:
+        ``"NELSON_AALEN"`` for the Nelson-Aalen cumulative hazard and ``"RMST"`` for
+        the restricted mean survival time, both including their variance (default:
+        None).
+    secure_aggregation : bool, optional
+        Mask the event tables of the nodes so that only their sum is revealed to
+        the central method. Can not be combined with bootstrap confidence bands or
+        competing risks (default: False).
+    time_grid_width : float, optional
+        Round the event times on the nodes up to a grid with this width, e.g. 7 for
+        weeks when time is in days. The event tables of all nodes then have the same
+        fixed length, and the first step that collects the unique event times is
+        skipped (default: None, no grid).
+    time_grid_horizon : float, optional
+        Maximum horizon of the time grid, required when a grid width is set
+        (default: None).
+    hazard_intervals : list of float, optional
+        Increasing boundaries of intervals, e.g. ``[0, 365, 730, 1825, 3650]``. When
+        set, a piecewise constant hazard is computed instead of the Kaplan-Meier
+        curve: in every interval, the number of events divided by the person-time.
+        The result then has a row per interval instead of per event time. Can not be
+        combined with bootstrap confidence bands, estimators, secure aggregation or
+        a time grid (default: None).
+    data_profile : bool, optional
+        Let every node return a profile of the quality of its data, such as the
+        number of missing values and the distribution of the censor values. Can not
+        be combined with secure aggregation (default: False).
+    weight_column_name : str, optional
+        Name of the column containing the weight of every record, e.g. inverse
+        probability or sampling weights. The event table then contains the sums of
+        the weights, and the variance of the survival ``survival_cdf_variance`` is
+        computed from the sums of the squared weights. Can not be combined with
+        bootstrap confidence bands, competing risks, left truncation, secure
+        aggregation or hazard intervals (default: None).
+    resume_task_ids : list of int, optional
+        IDs of the subtasks of a previous run of the same analysis that did not
+        finish, in the order in which they were created. The results of the
+        organizations that completed these subtasks are reused, and the partial
+        method is only started again for the other organizations. Can not be
+        combined with secure aggregation (default: None).
 
     Returns
     -------
-    dict
-        Dictionary containing Kaplan-Meier curve and local event tables.
+    str | dict
+        The Kaplan-Meier curve as JSON string. When the data profiles are requested,
+        a dictionary containing the Kaplan-Meier curve (``kaplan_meier``) and the
+        profile of every node (``data_profiles``).
+    """
+    if resume_task_ids and secure_aggregation:
+        raise InputError("Secure aggregation can not be resumed.")
+    organizations_to_include = _get_organizations_to_include(
+        client, organizations_to_include
+    )
+    analysis = _kaplan_meier(
+        organizations_to_include,
+        time_column_name=time_column_name,
+        censor_column_name=censor_column_name,
+        bootstrap_replicates=bootstrap_replicates,
+        confidence_level=confidence_level,
+        event_type_column_name=event_type_column_name,
+        entry_time_column_name=entry_time_column_name,
+        estimators=estimators,
+        secure_aggregation=secure_aggregation,
+        time_grid_width=time_grid_width,
+        time_grid_horizon=time_grid_horizon,
+        hazard_intervals=hazard_intervals,
+        data_profile=data_profile,
+        weight_column_name=weight_column_name,
+    )
+    return _run_analyses(
+        client, [(organizations_to_include, analysis)], resume_task_ids
+    )[0]
+
+
+@algorithm_client
+@profiled
+def kaplan_meier_batch_central(
+    client: AlgorithmClient,
+    analyses: List[dict],
+    organizations_to_include: List[int] | None = None,
+    resume_task_ids: List[int] | None = None,
+) -> List[str | dict]:
+    """
+    Compute multiple Kaplan-Meier curves at once.
+
+    The analyses that target the same organizations share their partial tasks: in
+    every step, each node receives a single task that evaluates the partial methods
+    of all these analyses over a single load of its data.
+
+    Parameters
+    ----------
+    client : Vantage6 client object
+        The client object used for communication with the server.
+    analyses : list of dict
+        The analyses to compute. Every analysis is a dictionary with the arguments of
+        :func:`kaplan_meier_central`, e.g. ``{"time_column_name": "TIME",
+        "censor_column_name": "EVENT"}``.
+    organizations_to_include : list of int, optional
+        Organization IDs to include in analyses that do not specify their own
+        ``organizations_to_include`` (default: None, includes all).
+    resume_task_ids : list of int, optional
+        IDs of the subtasks of a previous run of the same analyses that did not
+        finish, see :func:`kaplan_meier_central` (default: None).
+
+    Returns
+    -------
+    list of str | dict
+        The result of every analysis as returned by :func:`kaplan_meier_central`, in
+        the same order as ``analyses``.
+    """
+    if not analyses:
+        raise InputError("At least one analysis is required.")
+    if resume_task_ids and any(spec.get("secure_aggregation") for spec in analyses):
+        raise InputError("Secure aggregation can not be resumed.")
+
+    default_organizations = None
+    runs = []
+    for spec in analyses:
+        spec = dict(spec)
+        organizations = spec.pop("organizations_to_include", None)
+        if not organizations:
+            if default_organizations is None:
+                default_organizations = _get_organizations_to_include(
+                    client, organizations_to_include
+                )
+            organizations = default_organizations
+        try:
+            runs.append((organizations, _kaplan_meier(organizations, **spec)))
+        except TypeError as exc:
+            raise InputError(f"Invalid analysis {spec}: {exc}") from exc
+
+    info(f"Computing {len(runs)} Kaplan-Meier curves")
+    return _run_analyses(client, runs, resume_task_ids)
+
+
+def _get_organizations_to_include(
+    client: AlgorithmClient, organizations_to_include: List[int] | None
+) -> List[int]:
+    """
+    Get the organizations to include, which are all organizations by default.
+
+    Parameters
+    ----------
+    client : AlgorithmClient
+        The vantage6 client used for communication with the server.
+    organizations_to_include : List[int] | None
+        Organization IDs requested by the user.
+
+    Returns
+    -------
+    List[int]
+        Organization IDs to include.
     """
     if not organizations_to_include:
         info("Collecting participating organizations")
         organizations_to_include = [
             organization.get("id") for organization in client.organization.list()
         ]
+    return organizations_to_include
+
+
+def _kaplan_meier(
+    organizations_to_include: List[int],
+    time_column_name: str,
+    censor_column_name: str,
+    bootstrap_replicates: int = 0,
+    confidence_level: float = 0.95,
+    event_type_column_name: str | None = None,
+    entry_time_column_name: str | None = None,
+    estimators: List[str] | None = None,
+    secure_aggregation: bool = False,
+    time_grid_width: float | None = None,
+    time_grid_horizon: float | None = None,
+    hazard_intervals: List[float] | None = None,
+    data_profile: bool = False,
+    weight_column_name: str | None = None,
+) -> Generator[Tuple[str, dict], list, str | dict]:
+    """
+    Compute a Kaplan-Meier curve, see :func:`kaplan_meier_central` for the arguments.
+
+    The analysis does not start the partial tasks itself. Instead, it yields the name
+    and keyword arguments of the partial method it needs, and receives the results of
+    the nodes in return. This allows :func:`_run_analyses` to combine the partial
+    tasks of multiple analyses.
+
+    Yields
+    ------
+    Tuple[str, dict]
+        Name and keyword arguments of the partial method to run on the organizations.
 
+    Returns
+    -------
+    str | dict
+        The Kaplan-Meier curve as JSON string, or a dictionary that also contains the
+        data profiles of the nodes.
+    """
     MINIMUM_ORGANIZATIONS = get_env_var_as_int(
         "KAPLAN_MEIER_MINIMUM_ORGANIZATIONS", KAPLAN_MEIER_MINIMUM_ORGANIZATIONS
     )
@@ -64,43 +291,635 @@ def kaplan_meier_central(
             f"{MINIMUM_ORGANIZATIONS}."
         )
 
-    info("Collecting unique event times")
-    local_unique_event_times_per_node = _start_partial_and_collect_results(
-        client=client,
-        method="get_unique_event_times",
-        organizations_to_include=organizations_to_include,
-        time_column_name=time_column_name,
-    )
+    if bootstrap_replicates < 0:
+        raise InputError("The number of bootstrap replicates can not be negative.")
+    if not 0 < confidence_level < 1:
+        raise InputError("The confidence level should be between 0 and 1.")
+    estimators = [estimator.upper() for estimator in estimators or []]
+    for estimator in estimators:
+        if estimator not in list(Estimator):
+            raise InputError(
+                f"Unknown estimator '{estimator}', choose from "
+                f"{[estimator.value for estimator in Estimator]}."
+            )
+    if bootstrap_replicates and entry_time_column_name:
+        raise InputError(
+            "Bootstrap confidence bands are not supported for left truncated data."
+        )
+    if secure_aggregation and (bootstrap_replicates or event_type_column_name):
+        raise InputError(
+            "Secure aggregation can not be combined with bootstrap confidence bands "
+            "or competing risks."
+        )
+    if time_grid_width is not None and not (
+        time_grid_width > 0 and time_grid_horizon and time_grid_horizon > 0
+    ):
+        raise InputError("A time grid requires a positive width and horizon.")
+    if data_profile and secure_aggregation:
+        raise InputError("Data profiles can not be combined with secure aggregation.")
+    if weight_column_name and (
+        bootstrap_replicates
+        or event_type_column_name
+        or entry_time_column_name
+        or secure_aggregation
+        or hazard_intervals is not None
+    ):
+        raise InputError(
+            "Weights can not be combined with bootstrap confidence bands, competing "
+            "risks, left truncation, secure aggregation or hazard intervals."
+        )
+
+    if hazard_intervals is not None:
+        boundaries = np.asarray(hazard_intervals, dtype=float)
+        if len(boundaries) < 2 or np.any(np.diff(boundaries) <= 0):
+            raise InputError(
+                "Hazard intervals require at least two increasing boundaries."
+            )
+        if (
+            bootstrap_replicates
+            or estimators
+            or secure_aggregation
+            or time_grid_width is not None
+        ):
+            raise InputError(
+                "Hazard intervals can not be combined with bootstrap confidence "
+                "bands, estimators, secure aggregation or a time grid."
+            )
+
+        # The intervals are the same on all nodes, so the unique event times are
+        # not needed.
+        info("Collecting events and person-time per hazard interval")
+        local_tables_per_node = yield "get_km_event_table", dict(
+            time_column_name=time_column_name,
+            censor_column_name=censor_column_name,
+            event_type_column_name=event_type_column_name,
+            entry_time_column_name=entry_time_column_name,
+            hazard_intervals=boundaries.tolist(),
+            data_profile=data_profile,
+        )
+        if data_profile:
+            data_profiles, local_tables_per_node = _split_data_profiles(
+                local_tables_per_node
+            )
+        hazards = _piecewise_constant_hazard(
+            local_tables_per_node, boundaries, time_column_name
+        )
+        if data_profile:
+            return {"kaplan_meier": hazards, "data_profiles": data_profiles}
+        return hazards
 
-    info("Aggregating unique event times")
-    unique_event_times = set()
-    for local_unique_event_times in local_unique_event_times_per_node:
-        unique_event_times |= set(local_unique_event_times)
+    secure_aggregation_session = secrets.token_hex(16) if secure_aggregation else None
+
+    # The unique event times are not needed when a time grid is used, but the nodes
+    # still need to exchange their public keys for secure aggregation.
+    if time_grid_width is None or secure_aggregation:
+        info("Collecting unique event times")
+        local_unique_event_times_per_node = yield "get_unique_event_times", dict(
+            time_column_name=time_column_name,
+            secure_aggregation_session=secure_aggregation_session,
+            compact=True,
+        )
+
+    public_keys = None
+    if secure_aggregation:
+        public_keys = [
+            result["public_key"] for result in local_unique_event_times_per_node
+        ]
+        local_unique_event_times_per_node = [
+            result["event_times"] for result in local_unique_event_times_per_node
+        ]
+
+    if time_grid_width is not None:
+        info("Using the time grid as event times")
+        unique_event_times = get_time_grid(time_grid_width, time_grid_horizon)
+        event_times_kwargs = {
+            "time_grid_width": time_grid_width,
+            "time_grid_horizon": time_grid_horizon,
+        }
+    else:
+        info("Aggregating unique event times")
+        unique_event_times = np.unique(
+            np.concatenate(
+                [
+                    decode_event_times(local_unique_event_times)
+                    for local_unique_event_times in local_unique_event_times_per_node
+                ]
+            )
+        )
+        event_times_kwargs = {
+            "unique_event_times": encode_event_times(unique_event_times)
+        }
 
     info("Collecting Kaplan-Meier curve and local event tables")
-    local_km_per_node = _start_partial_and_collect_results(
-        client=client,
-        method="get_km_event_table",
-        organizations_to_include=organizations_to_include,
-        unique_event_times=list(unique_event_times),
+    local_km_per_node = yield "get_km_event_table", dict(
+        **event_times_kwargs,
         time_column_name=time_column_name,
         censor_column_name=censor_column_name,
+        bootstrap_replicates=bootstrap_replicates,
+        event_type_column_name=event_type_column_name,
+        entry_time_column_name=entry_time_column_name,
+        secure_aggregation_session=secure_aggregation_session,
+        public_keys=public_keys,
+        data_profile=data_profile,
+        weight_column_name=weight_column_name,
     )
-    local_event_tables = [
-        pd.read_json(event_table) for event_table in local_km_per_node
-    ]
+    if data_profile:
+        data_profiles, local_km_per_node = _split_data_profiles(local_km_per_node)
+
+    if secure_aggregation:
+        info("Aggregating masked event tables")
+        km = _sum_masked_event_tables(
+            local_km_per_node, unique_event_times, time_column_name
+        )
+    else:
+        if bootstrap_replicates:
+            local_bootstraps = [result["bootstrap"] for result in local_km_per_node]
+            local_km_per_node = [result["event_table"] for result in local_km_per_node]
+        local_event_tables = [
+            pd.read_json(StringIO(event_table)) for event_table in local_km_per_node
+        ]
 
-    info("Aggregating event tables")
-    km = pd.concat(local_event_tables).groupby(time_column_name, as_index=False).sum()
-    km["hazard"] = km["observed"] / km["at_risk"]
+        info("Aggregating event tables")
+        local_times = [
+            np.sort(table[time_column_name].to_numpy()) for table in local_event_tables
+        ]
+        times, local_event_tables = _align_event_tables(
+            local_event_tables, time_column_name
+        )
+        km = (
+            pd.concat(local_event_tables)
+            .groupby(time_column_name, as_index=False)
+            .sum()
+        )
+    km["hazard"] = _hazard(km["observed"].to_numpy(), km["at_risk"].to_numpy())
     km["survival_cdf"] = (1 - km["hazard"]).cumprod()
+    if weight_column_name:
+        km["survival_cdf_variance"] = km["survival_cdf"] ** 2 * np.cumsum(
+            _greenwood_terms(km)
+        )
+
+    if bootstrap_replicates:
+        info("Computing bootstrap confidence bands")
+        lower, upper = _bootstrap_confidence_bands(
+            local_bootstraps, local_times, times, confidence_level
+        )
+        km["survival_cdf_lower"] = lower
+        km["survival_cdf_upper"] = upper
+
+    if event_type_column_name:
+        info("Computing cumulative incidence functions")
+        km = _cumulative_incidence(km)
+
+    if Estimator.NELSON_AALEN in estimators:
+        info("Computing Nelson-Aalen cumulative hazard")
+        km = _nelson_aalen(km)
+
+    if Estimator.RMST in estimators:
+        info("Computing restricted mean survival time")
+        km = _restricted_mean_survival_time(km, time_column_name)
 
     info("Kaplan-Meier curve computed")
-    return km.to_json()
+    km = event_table_to_json(km, time_column_name)
+    if data_profile:
+        return {"kaplan_meier": km, "data_profiles": data_profiles}
+    return km
+
+
+def _split_data_profiles(results: List[dict]) -> Tuple[List[dict], list]:
+    """
+    Split the data profiles from the event tables of the nodes.
+
+    Parameters
+    ----------
+    results : List[dict]
+        Results of :func:`.partial.get_km_event_table` with the data profile.
+
+    Returns
+    -------
+    Tuple[List[dict], list]
+        The data profile of every node, and the results as they are returned without
+        the data profile.
+    """
+    data_profiles = [result.pop("profile") for result in results]
+    for i, profile in enumerate(data_profiles):
+        info(f"Data profile of node {i}: {profile}")
+    results = [
+        result["event_table"] if list(result) == ["event_table"] else result
+        for result in results
+    ]
+    return data_profiles, results
+
+
+def _run_analyses(
+    client: AlgorithmClient,
+    analyses: List[Tuple[List[int], Generator]],
+    resume_task_ids: List[int] | None = None,
+) -> List[str | dict]:
+    """
+    Run analyses, combining the partial tasks of analyses on the same organizations.
+
+    In every step, the pending partial methods of the analyses are grouped by their
+    organizations. A group with a single analysis starts the partial method directly,
+    larger groups start a single ``run_partials`` task that evaluates all of them.
+
+    Parameters
+    ----------
+    client : AlgorithmClient
+        The vantage6 client used for communication with the server.
+    analyses : List[Tuple[List[int], Generator]]
+        The organizations and the analysis, see :func:`_kaplan_meier`.
+    resume_task_ids : List[int] | None, optional
+        IDs of the subtasks of a previous run of the same analyses. The partial
+        tasks are started in the same order, so that the n-th partial task reuses
+        the results of the n-th subtask (default: None).
+
+    Returns
+    -------
+    List[str | dict]
+        The result of every analysis.
+    """
+    resume_task_ids = iter(resume_task_ids or [])
+    results = [None] * len(analyses)
+    requests = {i: next(analysis) for i, (_, analysis) in enumerate(analyses)}
+    while requests:
+        groups = {}
+        for i in requests:
+            groups.setdefault(tuple(sorted(analyses[i][0])), []).append(i)
+
+        responses = {}
+        for indices in groups.values():
+            organizations = analyses[indices[0]][0]
+            if len(indices) == 1:
+                method, kwargs = requests[indices[0]]
+                responses[indices[0]] = _start_partial_and_collect_results(
+                    client,
+                    method,
+                    organizations,
+                    resume_task_id=next(resume_task_ids, None),
+                    **kwargs,
+                )
+                continue
+
+            tasks = [
+                {"method": requests[i][0], "kwargs": requests[i][1]} for i in indices
+            ]
+            node_results = _start_partial_and_collect_results(
+                client,
+                "run_partials",
+                organizations,
+                resume_task_id=next(resume_task_ids, None),
+                tasks=tasks,
+            )
+            for position, i in enumerate(indices):
+                responses[i] = [result[position] for result in node_results]
+
+        requests = {}
+        for i, response in responses.items():
+            try:
+                requests[i] = analyses[i][1].send(response)
+            except StopIteration as stop:
+                results[i] = stop.value
+    return results
+
+
+def _hazard(observed: np.ndarray, at_risk: np.ndarray) -> np.ndarray:
+    """
+    Compute the hazard at every event time.
+
+    Parameters
+    ----------
+    observed : np.ndarray
+        Number of observed events, the last axis is time.
+    at_risk : np.ndarray
+        Number of records at risk, the last axis is time.
+
+    Returns
+    -------
+    np.ndarray
+        The hazard, which is zero where nobody is at risk.
+    """
+    # Noise on the event counts can empty the risk set at the tail of the curve, in
+    # which case no hazard can be estimated anymore.
+    observed = np.asarray(observed, dtype=float)
+    at_risk = np.asarray(at_risk, dtype=float)
+    return np.divide(observed, at_risk, out=np.zeros_like(observed), where=at_risk > 0)
+
+
+def _piecewise_constant_hazard(
+    local_tables_per_node: List[str], boundaries: np.ndarray, time_column_name: str
+) -> str:
+    """
+    Compute a piecewise constant hazard from the interval tables of all nodes.
+
+    The hazard of an interval is the number of events divided by the person-time in
+    the interval, with standard error ``sqrt(events) / person_time``. The standard
+    error is reported rather than the variance, as the variance is too small to be
+    written with a fixed number of decimal places when time is in days. The survival
+    at the end of an interval follows from the cumulative hazard as
+    ``exp(-cumulative_hazard)``.
+    When the observed events are counted per cause, the cause-specific hazards are
+    computed as well.
+
+    Parameters
+    ----------
+    local_tables_per_node : List[str]
+        Interval tables of every node, see
+        :func:`.partial._count_events_per_interval`.
+    boundaries : np.ndarray
+        Increasing boundaries of the intervals.
+    time_column_name : str
+        Name of the column containing the survival times, which contains the start
+        of every interval.
+
+    Returns
+    -------
+    str
+        The piecewise constant hazard as JSON string, with a row for every interval.
+    """
+    info("Aggregating events and person-time per hazard interval")
+    # Nodes report every interval, also when they merged intervals with too few
+    # events, see :func:`.partial._merge_small_interval_counts`.
+    starts = boundaries[:-1]
+    local_tables = [
+        pd.read_json(StringIO(table)).set_index(time_column_name).reindex(starts)
+        for table in local_tables_per_node
+    ]
+    km = pd.concat(local_tables).groupby(level=0).sum()
+    km = km.rename_axis(time_column_name).reset_index()
+    km.insert(1, "interval_end", boundaries[1:])
+
+    person_time = km["person_time"].to_numpy(dtype=float)
+    for column in [column for column in km if column.startswith("observed_")]:
+        km[f"hazard_{column[len('observed_'):]}"] = _hazard(km[column], person_time)
+    km["hazard"] = _hazard(km["observed"], person_time)
+    km["hazard_standard_error"] = _hazard(np.sqrt(km["observed"]), person_time)
+    km["cumulative_hazard"] = np.cumsum(km["hazard"] * np.diff(boundaries))
+    km["survival_cdf"] = np.exp(-km["cumulative_hazard"])
+
+    info("Piecewise constant hazard computed")
+    # the hazard is a rate, so intervals can not be combined afterwards
+    return event_table_to_json(km, time_column_name, allow_coarsening=False)
+
+
+def _sum_masked_event_tables(
+    local_masked_counts: List[dict],
+    unique_event_times: np.ndarray,
+    time_column_name: str,
+) -> pd.DataFrame:
+    """
+    Sum the masked event tables of all nodes.
+
+    The masks of the nodes cancel out in the sum, so that only the aggregated event
+    table is revealed.
+
+    Parameters
+    ----------
+    local_masked_counts : List[dict]
+        Masked counts of every node, at every global event time in sorted order.
+    unique_event_times : np.ndarray
+        Global unique event times in sorted order.
+    time_column_name : str
+        Name of the column containing the survival times.
+
+    Returns
+    -------
+    pd.DataFrame
+        The aggregated event table.
+    """
+    # only import the cryptography machinery when it is used
+    from .secure_aggregation import SECURE_AGGREGATION_COLUMNS, sum_masked_counts
+
+    counts = sum_masked_counts(
+        [result["masked_counts"] for result in local_masked_counts]
+    )
+    km = pd.DataFrame(counts, columns=SECURE_AGGREGATION_COLUMNS)
+    km.insert(0, time_column_name, unique_event_times)
+    return km
+
+
+def _align_event_tables(
+    local_event_tables: List[pd.DataFrame], time_column_name: str
+) -> Tuple[np.ndarray, List[pd.DataFrame]]:
+    """
+    Align the event tables of all nodes to the same event times.
+
+    Nodes can merge event times that do not have enough events. Such a node has no
+    events at the merged event times, and its number of records at risk equals the
+    number at risk at its next event time.
+
+    Parameters
+    ----------
+    local_event_tables : List[pd.DataFrame]
+        Event tables of every node.
+    time_column_name : str
+        Name of the column containing the survival times.
+
+    Returns
+    -------
+    Tuple[np.ndarray, List[pd.DataFrame]]
+        The global event times in sorted order and the aligned event tables.
+    """
+    times = np.unique(
+        np.concatenate(
+            [table[time_column_name].to_numpy() for table in local_event_tables]
+        )
+    )
+    aligned_event_tables = []
+    for table in local_event_tables:
+        table = table.set_index(time_column_name).reindex(times)
+        table["at_risk"] = table["at_risk"].bfill()
+        if "at_risk_squared" in table:
+            table["at_risk_squared"] = table["at_risk_squared"].bfill()
+        aligned_event_tables.append(
+            table.fillna(0).rename_axis(time_column_name).reset_index()
+        )
+    return times, aligned_event_tables
+
+
+def _cumulative_incidence(km: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute the Aalen-Johansen cumulative incidence function of every cause.
+
+    The cumulative incidence of cause k is the sum over the event times of the
+    overall survival just before the event time times the cause specific hazard. All
+    causes are computed at once as a (event times, causes) matrix.
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Aggregated event table containing the ``survival_cdf``, ``at_risk`` and the
+        ``observed_<cause>`` columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        The event table with a ``cumulative_incidence_<cause>`` column for every cause.
+    """
+    # Not every node observes every cause, these are missing after concatenation
+    cause_columns = [column for column in km if column.startswith("observed_")]
+    km[cause_columns] = km[cause_columns].fillna(0)
+
+    survival_before = np.concatenate(([1.0], km["survival_cdf"].to_numpy()[:-1]))
+    hazards = _hazard(
+        km[cause_columns].to_numpy(dtype=float),
+        km["at_risk"].to_numpy(dtype=float)[:, None],
+    )
+    incidence = np.cumsum(survival_before[:, None] * hazards, axis=0)
+    for i, column in enumerate(cause_columns):
+        km[column.replace("observed_", "cumulative_incidence_")] = incidence[:, i]
+    return km
+
+
+def _nelson_aalen(km: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute the Nelson-Aalen cumulative hazard and its variance.
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Aggregated event table containing the ``observed`` and ``at_risk`` columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        The event table with the ``cumulative_hazard`` and
+        ``cumulative_hazard_variance`` columns.
+    """
+    observed = km["observed"].to_numpy(dtype=float)
+    at_risk = km["at_risk"].to_numpy(dtype=float)
+    # with weights, the variance follows from the squared weights of the events
+    observed_squared = km.get("observed_squared", km["observed"]).to_numpy(dtype=float)
+    km["cumulative_hazard"] = np.cumsum(_hazard(observed, at_risk))
+    km["cumulative_hazard_variance"] = np.cumsum(_hazard(observed_squared, at_risk**2))
+    return km
+
+
+def _greenwood_terms(km: pd.DataFrame) -> np.ndarray:
+    """
+    Compute the terms of Greenwood's formula for the variance of the survival,
+    d_i / (n_i * (n_i - d_i)) at every event time.
+
+    For weighted event tables, the counts are the sums of the weights, and the first
+    n_i is replaced by the effective number at risk n_i^2 / m_i, with m_i the sum of
+    the squared weights at risk (Xie and Liu, 2005).
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Aggregated event table containing the ``observed`` and ``at_risk`` columns,
+        and the ``at_risk_squared`` column for weighted event tables.
+
+    Returns
+    -------
+    np.ndarray
+        The term of every event time.
+    """
+    observed = km["observed"].to_numpy(dtype=float)
+    at_risk = km["at_risk"].to_numpy(dtype=float)
+    if "at_risk_squared" in km:
+        at_risk_squared = km["at_risk_squared"].to_numpy(dtype=float)
+        return _hazard(observed * at_risk_squared, at_risk**2 * (at_risk - observed))
+    return _hazard(observed, at_risk * (at_risk - observed))
+
+
+def _restricted_mean_survival_time(
+    km: pd.DataFrame, time_column_name: str
+) -> pd.DataFrame:
+    """
+    Compute the restricted mean survival time (RMST) and its variance, using every
+    event time as horizon.
+
+    The RMST up to horizon tau is the area under the survival curve between 0 and tau.
+    Its variance is the sum over the event times t_i <= tau of
+    A_i^2 * d_i / (n_i * (n_i - d_i)), with A_i the area under the curve between t_i
+    and tau. Writing A_i = R(tau) - R(t_i), with R the cumulative area, the sum
+    expands into cumulative sums, so that the variance for all horizons is computed
+    in a single pass.
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Aggregated event table containing the ``survival_cdf``, ``observed`` and
+        ``at_risk`` columns, sorted by time.
+    time_column_name : str
+        Name of the column representing time.
+
+    Returns
+    -------
+    pd.DataFrame
+        The event table with the ``rmst`` and ``rmst_variance`` columns.
+    """
+    times = km[time_column_name].to_numpy(dtype=float)
+    survival_before = np.concatenate(([1.0], km["survival_cdf"].to_numpy()[:-1]))
+    area = np.cumsum(survival_before * np.diff(times, prepend=0.0))
+
+    weights = _greenwood_terms(km)
+
+    km["rmst"] = area
+    km["rmst_variance"] = (
+        area**2 * np.cumsum(weights)
+        - 2 * area * np.cumsum(weights * area)
+        + np.cumsum(weights * area**2)
+    ).clip(min=0)
+    return km
+
+
+def _bootstrap_confidence_bands(
+    local_bootstraps: List[Dict[str, List[List[int]]]],
+    local_times: List[np.ndarray],
+    times: np.ndarray,
+    confidence_level: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute percentile confidence bands from the bootstrapped event counts.
+
+    The replicates of all nodes are summed, after which the survival curves of all
+    replicates are computed at once as a (replicates, event times) matrix.
+
+    Parameters
+    ----------
+    local_bootstraps : List[Dict[str, List[List[int]]]]
+        Replicated ``observed`` and ``removed`` counts of every node, for the event
+        times of the node in sorted order.
+    local_times : List[np.ndarray]
+        Event times of every node in sorted order.
+    times : np.ndarray
+        Global event times in sorted order.
+    confidence_level : float
+        Confidence level of the bands.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Lower and upper confidence band of the survival curve.
+    """
+    observed = np.zeros((0, len(times)))
+    removed = np.zeros((0, len(times)))
+    for local_bootstrap, node_times in zip(local_bootstraps, local_times):
+        # Nodes that merged event times only return replicates for their own event
+        # times, no records are removed at the other event times.
+        columns = np.searchsorted(times, node_times)
+        local_observed = np.asarray(local_bootstrap["observed"])
+        local_removed = np.asarray(local_bootstrap["removed"])
+        if not len(observed):
+            observed = np.zeros((len(local_observed), len(times)))
+            removed = np.zeros((len(local_removed), len(times)))
+        observed[:, columns] += local_observed
+        removed[:, columns] += local_removed
+    at_risk = np.cumsum(removed[:, ::-1], axis=1)[:, ::-1]
+    survival = np.cumprod(1 - _hazard(observed, at_risk), axis=1)
+
+    alpha = 1 - confidence_level
+    lower, upper = np.quantile(survival, [alpha / 2, 1 - alpha / 2], axis=0)
+    return lower, upper
 
 
 def _start_partial_and_collect_results(
-    client: AlgorithmClient, method: str, organizations_to_include: List[int], **kwargs
+    client: AlgorithmClient,
+    method: str,
+    organizations_to_include: List[int],
+    resume_task_id: int | None = None,
+    **kwargs,
 ) -> List[Dict[str, Union[str, List[str]]]]:
     """
     Launches a partial task to multiple organizations and collects their results when
@@ -114,6 +933,10 @@ def _start_partial_and_collect_results(
         The method/function to be executed as a subtask by the organizations.
     organization_ids : List[int]
         A list of organization IDs to which the subtask will be distributed.
+    resume_task_id : int | None, optional
+        ID of an earlier subtask of the same method. When it had the same arguments,
+        the results of the organizations that completed it are reused, and the
+        subtask is only started for the other organizations (default: None).
     **kwargs : dict
         Additional keyword arguments to be passed to the method/function.
 
@@ -122,13 +945,90 @@ def _start_partial_and_collect_results(
     List[Dict[str, Union[str, List[str]]]]
         A list of dictionaries containing results obtained from the organizations.
     """
+    # The arguments are identified by their hash in the task description, so that
+    # a resumed run can check that it reuses the results of the same subtask.
+    arguments_hash = hashlib.sha256(
+        json.dumps(kwargs, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    results = []
+    if resume_task_id is not None:
+        completed = _get_completed_results(
+            client, resume_task_id, method, arguments_hash
+        )
+        results = [
+            completed[organization]
+            for organization in organizations_to_include
+            if organization in completed
+        ]
+        organizations_to_include = [
+            organization
+            for organization in organizations_to_include
+            if organization not in completed
+        ]
+        info(f"Reusing the results of {len(results)} organizations")
+        if not organizations_to_include:
+            return results
+
     info(f"Including {len(organizations_to_include)} organizations in the analysis")
     task = client.task.create(
         input_={"method": method, "kwargs": kwargs},
         organizations=organizations_to_include,
+        name=method,
+        description=arguments_hash,
     )
 
-    info("Waiting for results")
-    results = client.wait_for_results(task_id=task["id"])
+    info(f"Waiting for results of subtask {task['id']}")
+    results += client.wait_for_results(task_id=task["id"])
     info(f"Results obtained for {method}!")
     return results
+
+
+def _get_completed_results(
+    client: AlgorithmClient, task_id: int, method: str, arguments_hash: str
+) -> dict:
+    """
+    Get the results of the organizations that completed an earlier subtask.
+
+    The results can only be reused when the subtask had the same arguments, which
+    is not the case when e.g. an organization failed in an earlier step of the
+    analysis.
+
+    Parameters
+    ----------
+    client : AlgorithmClient
+        The vantage6 client used for communication with the server.
+    task_id : int
+        ID of the earlier subtask.
+    method : str
+        The method the subtask should have executed.
+    arguments_hash : str
+        Hash of the arguments the subtask should have had.
+
+    Returns
+    -------
+    dict
+        The result of every organization that completed the subtask, or no results
+        when the subtask had different arguments.
+
+    Raises
+    ------
+    InputError
+        If the subtask did not execute the method.
+    """
+    task = client.task.get(task_id)
+    if task.get("name") != method:
+        raise InputError(
+            f"Subtask {task_id} did not run '{method}', so it can not be resumed."
+        )
+    if task.get("description") != arguments_hash:
+        info(f"Subtask {task_id} had different arguments, its results are not reused")
+        return {}
+
+    info(f"Waiting for subtask {task_id} to finish")
+    client.wait_for_results(task_id=task_id)
+    completed = {}
+    for run in client.run.from_task(task_id):
+        if run.get("status") == TaskStatus.COMPLETED:
+            completed[run["organization"]["id"]] = client.result.get(run["id"])
+    return completed
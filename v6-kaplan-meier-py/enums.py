@@ -5,3 +5,10 @@ class NoiseType(str, Enum):
     NONE = "NONE"
     GAUSSIAN = "GAUSSIAN"
     POISSON = "POISSON"
+    LAPLACE = "LAPLACE"
+    GEOMETRIC = "GEOMETRIC"
+
+
+class Estimator(str, Enum):
+    NELSON_AALEN = "NELSON_AALEN"
+    RMST = "RMST"
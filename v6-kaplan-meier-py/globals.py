@@ -8,9 +8,74 @@ KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS = 3
 
 KAPLAN_MEIER_ALLOWED_EVENT_TIME_COLUMNS_REGEX = ".*"
 
-# Default noise type for event counts. Can be either "POISSON" or "GAUSSIAN".
+# Default noise type. "POISSON" and "GAUSSIAN" perturb the individual event times,
+# "LAPLACE" and "GEOMETRIC" perturb the aggregated event counts instead.
 KAPLAN_MEIER_TYPE_NOISE = "POISSON"
 
 # Default gaussian noise SNR for event times, not that by default Poisson noise is
 # used for event counts.
 KAPLAN_MEIER_PRIVACY_SNR_EVENT_TIME = 0.0
+
+# Default privacy budget (epsilon) for the count-level noise types "LAPLACE" and
+# "GEOMETRIC". Smaller values add more noise to the event counts.
+KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS = 1.0
+
+# Number of processes used to compute the event table on the node. Large datasets are
+# split in shards that are aggregated in parallel. Use 0 to use all available cores.
+KAPLAN_MEIER_NUMBER_OF_PROCESSES = 1
+
+# Whether the node may store sidecar files (e.g. a sorted index of the event times)
+# that are reused by subsequent tasks. Sidecars are stored next to the data source,
+# unless a different directory is set. They are invalidated when the source changes.
+KAPLAN_MEIER_CACHE = "false"
+
+KAPLAN_MEIER_CACHE_DIRECTORY = ""
+
+# Minimum number of observed events at every event time that is shared. Adjacent event
+# times are merged until every event time meets this threshold. Use 0 to disable.
+KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME = 0
+
+# Secret of this node that is used to derive its keys for secure aggregation. Without
+# a secret the keys only depend on the session and the data of the node, so setting a
+# long random value is recommended when secure aggregation is used.
+KAPLAN_MEIER_SECURE_AGGREGATION_SECRET = ""
+
+# Whether this node only shares event tables using secure aggregation. When enabled,
+# requests for an event table in clear text are refused.
+KAPLAN_MEIER_REQUIRE_SECURE_AGGREGATION = "false"
+
+# Whether the partial functions may aggregate the data inside SQL databases. When
+# enabled, the records of the node query are counted per distinct value of the
+# requested columns and only this histogram is transferred to the algorithm.
+KAPLAN_MEIER_SQL_PUSHDOWN = "false"
+
+# Minimum width of the time grid the user can request. Coarser grids share less
+# information about the individual event times. Use 0 to allow any grid.
+KAPLAN_MEIER_MINIMUM_TIME_GRID_WIDTH = 0
+
+# Number of decimal places of the floats in the results (at most 15).
+KAPLAN_MEIER_FLOAT_PRECISION = 10
+
+# Maximum size of a result in bytes. When a result is larger, consecutive event times
+# are combined until it fits. Use 0 to disable.
+KAPLAN_MEIER_RESULT_SIZE_BUDGET = 0
+
+# Whether the data profile that the user can request may contain the minimum and the
+# maximum event time of the node. These are the event times of individual records.
+KAPLAN_MEIER_DATA_PROFILE_TIME_RANGE = "false"
+
+# Whether the partial and central functions are profiled. When enabled, a summary of
+# the time spent per function and of the allocated memory is written to the node log.
+KAPLAN_MEIER_PROFILING = "false"
+
+# Secret of this node from which the noise on the event counts is derived. With a
+# secret, an event count always receives the same noise for the same event time, so
+# that repeated tasks can not average the noise away. Without a secret, fresh noise is
+# drawn for every task.
+KAPLAN_MEIER_NOISE_SECRET = ""
+
+# Total privacy budget (epsilon) that all tasks together may spend on noise on the
+# event counts of this node. Every task that shares noised event counts spends
+# KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS, which is recorded in a ledger in the
+# cache directory (or next to the data source). Use 0 to only record the spent budget.
+KAPLAN_MEIER_PRIVACY_BUDGET_EVENT_COUNTS = 0
@@ -1,24 +1,260 @@
+import os
 import re
+import hashlib
 import pandas as pd
 import numpy as np
 
 from typing import List
 from vantage6.algorithm.tools.util import get_env_var, info, warn, error
-from vantage6.algorithm.tools.decorators import data
-from vantage6.algorithm.tools.exceptions import InputError, EnvironmentVariableError
+from vantage6.algorithm.tools.exceptions import (
+    InputError,
+    EnvironmentVariableError,
+    PrivacyThresholdViolation,
+)
 
-from .utils import get_env_var_as_int, get_env_var_as_list, get_env_var_as_float
+from .utils import (
+    get_env_var_as_int,
+    get_env_var_as_list,
+    get_env_var_as_float,
+    encode_event_times,
+    decode_event_times,
+    get_time_grid,
+    event_table_to_json,
+)
 from .globals import (
+    KAPLAN_MEIER_MINIMUM_ORGANIZATIONS,
     KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS,
     KAPLAN_MEIER_ALLOWED_EVENT_TIME_COLUMNS_REGEX,
     KAPLAN_MEIER_PRIVACY_SNR_EVENT_TIME,
     KAPLAN_MEIER_TYPE_NOISE,
+    KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS,
+    KAPLAN_MEIER_NUMBER_OF_PROCESSES,
+    KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME,
+    KAPLAN_MEIER_MINIMUM_TIME_GRID_WIDTH,
+    KAPLAN_MEIER_DATA_PROFILE_TIME_RANGE,
+    KAPLAN_MEIER_NOISE_SECRET,
+    KAPLAN_MEIER_PRIVACY_BUDGET_EVENT_COUNTS,
+    KAPLAN_MEIER_REQUIRE_SECURE_AGGREGATION,
 )
 from .enums import NoiseType
+from .sql import NUMBER_OF_RECORDS_COLUMN, TIME_SUM_COLUMN, TimeBins
+from .cache import (
+    cached_data,
+    cache_enabled,
+    get_source_file,
+    sidecar_path,
+    load_array,
+    store_array,
+    ledger_path,
+    add_to_ledger,
+)
+
+# Keyword arguments of the partial methods that contain the names of the columns
+# they use
+COLUMN_ARGUMENTS = (
+    "time_column_name",
+    "censor_column_name",
+    "event_type_column_name",
+    "entry_time_column_name",
+    "weight_column_name",
+)
+
+# Splitting the data in shards only pays off when every process has a reasonable
+# amount of work to do.
+MINIMUM_NUMBER_OF_RECORDS_PER_SHARD = 100_000
+
+
+def _privacy_gaurds(
+    time_column_name: str,
+    number_of_records: int | None = None,
+    time_grid_width: float | None = None,
+    hazard_intervals: List[float] | None = None,
+    **kwargs,
+) -> None:
+    """
+    Check that the request is allowed by the node before any data is loaded.
+
+    The checks that do not need any data are executed first, so that disallowed
+    requests are rejected without loading the data.
+
+    Parameters
+    ----------
+    time_column_name : str
+        Name of the column representing time.
+    number_of_records : int | None, optional
+        Number of records in the data source, the check is skipped when this is not
+        known yet (default: None).
+    time_grid_width : float | None, optional
+        Width of the requested time grid (default: None, no grid).
+    hazard_intervals : List[float] | None, optional
+        Boundaries of the requested hazard intervals (default: None, no intervals).
+    **kwargs
+        Other arguments of the partial function, which are not checked.
+
+    Raises
+    ------
+    InputError
+        If the time column, the time grid or the hazard intervals are not allowed, or
+        there are not enough records.
+    """
+    info("Check that the selected time column is allowed by the node")
+    ALLOWED_EVENT_TIME_COLUMNS_REGEX = get_env_var_as_list(
+        "KAPLAN_MEIER_EVENT_TIME_COLUMN", KAPLAN_MEIER_ALLOWED_EVENT_TIME_COLUMNS_REGEX
+    )
+    for pattern in ALLOWED_EVENT_TIME_COLUMNS_REGEX:
+        if re.match(pattern, time_column_name):
+            break
+    else:
+        info(f"Allowed event time columns: {ALLOWED_EVENT_TIME_COLUMNS_REGEX}")
+        raise InputError(
+            f"Column '{time_column_name}' is not allowed as a time column."
+        )
+
+    MINIMUM_TIME_GRID_WIDTH = get_env_var_as_float(
+        "KAPLAN_MEIER_MINIMUM_TIME_GRID_WIDTH", KAPLAN_MEIER_MINIMUM_TIME_GRID_WIDTH
+    )
+    if time_grid_width is not None and time_grid_width < MINIMUM_TIME_GRID_WIDTH:
+        raise InputError(
+            f"The width of the time grid must be at least {MINIMUM_TIME_GRID_WIDTH}."
+        )
+    if (
+        hazard_intervals is not None
+        and len(hazard_intervals) > 1
+        and np.min(np.diff(hazard_intervals)) < MINIMUM_TIME_GRID_WIDTH
+    ):
+        raise InputError(
+            f"The width of the hazard intervals must be at least "
+            f"{MINIMUM_TIME_GRID_WIDTH}."
+        )
+
+    if number_of_records is None:
+        return
+
+    info("Checking number of records in the data source.")
+    MINIMUM_NUMBER_OF_RECORDS = get_env_var_as_int(
+        "KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS", KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS
+    )
+    if number_of_records <= MINIMUM_NUMBER_OF_RECORDS:
+        raise InputError(
+            "Number of records in 'df' must be greater than "
+            f"{MINIMUM_NUMBER_OF_RECORDS}."
+        )
+
+
+def _check_columns_exist(df: pd.DataFrame, *column_names: str | None) -> None:
+    """
+    Check that the requested columns are present in the data.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    *column_names : str | None
+        Names of the requested columns, optional columns that are not requested
+        (None) are skipped.
+
+    Raises
+    ------
+    InputError
+        If one of the columns is not found in the DataFrame.
+    """
+    for column_name in column_names:
+        if column_name and column_name not in df.columns:
+            raise InputError(f"Column '{column_name}' not found in the data frame.")
+
+
+def _check_numeric_columns(df: pd.DataFrame, *column_names: str | None) -> None:
+    """
+    Check that the requested columns contain numbers.
 
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    *column_names : str | None
+        Names of the requested columns, optional columns that are not requested
+        (None) are skipped.
+
+    Raises
+    ------
+    InputError
+        If one of the columns is not numerical.
+    """
+    for column_name in column_names:
+        if column_name and not pd.api.types.is_numeric_dtype(df[column_name]):
+            raise InputError(f"Column '{column_name}' should contain numbers.")
+
+
+def _sql_time_bins(
+    time_column_name: str,
+    time_grid_width: float | None = None,
+    time_grid_horizon: float | None = None,
+    hazard_intervals: List[float] | None = None,
+    entry_time_column_name: str | None = None,
+    data_profile: bool = False,
+    secure_aggregation_session: str | None = None,
+    **kwargs,
+) -> TimeBins | None:
+    """
+    Get the bins in which the SQL pushdown can count the event times.
+
+    With a time grid or hazard intervals only the bin of every event time is used, so
+    the database can count the records per bin. The event times are not binned when
+    noise is added to them, when they are compared to the entry times, when they are
+    part of the data profile or when they identify the node in a secure aggregation
+    session (the fingerprint of the unbinned event times is used in both steps).
+
+    Parameters
+    ----------
+    time_column_name : str
+        Name of the column representing time.
+    time_grid_width : float | None, optional
+        Width of the requested time grid (default: None, no grid).
+    time_grid_horizon : float | None, optional
+        Horizon of the requested time grid (default: None, no grid).
+    hazard_intervals : List[float] | None, optional
+        Boundaries of the requested hazard intervals (default: None, no intervals).
+    entry_time_column_name : str | None, optional
+        Name of the column representing the entry time (default: None).
+    data_profile : bool, optional
+        Whether the data profile is requested (default: False).
+    secure_aggregation_session : str | None, optional
+        Identifier of the secure aggregation session (default: None).
+    **kwargs
+        Other arguments of :func:`get_km_event_table`, which are not used.
+
+    Returns
+    -------
+    TimeBins | None
+        The bins, or None when the event times can not be binned.
+    """
+    NOISE_TYPE = get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper()
+    if (
+        NOISE_TYPE in (NoiseType.GAUSSIAN, NoiseType.POISSON)
+        or entry_time_column_name
+        or data_profile
+        or secure_aggregation_session
+    ):
+        return None
 
-@data(1)
-def get_unique_event_times(df: pd.DataFrame, time_column_name: str) -> List[str]:
+    if hazard_intervals is not None:
+        boundaries = np.asarray(hazard_intervals, dtype=float)
+        if len(boundaries) < 2 or np.any(np.diff(boundaries) <= 0):
+            return None
+        return TimeBins(time_column_name, boundaries.tolist(), "left", time_sum=True)
+    if time_grid_width and time_grid_width > 0 and time_grid_horizon:
+        grid = get_time_grid(time_grid_width, time_grid_horizon)
+        return TimeBins(time_column_name, grid.tolist(), "right")
+    return None
+
+
+@cached_data("time_column_name", preflight=_privacy_gaurds)
+def get_unique_event_times(
+    df: pd.DataFrame,
+    time_column_name: str,
+    secure_aggregation_session: str | None = None,
+    compact: bool = False,
+) -> List[str] | dict:
     """
     Get unique event times from a DataFrame.
 
@@ -28,34 +264,79 @@ def get_unique_event_times(df: pd.DataFrame, time_column_name: str) -> List[str]
         Input DataFrame supplied by the node.
     time_column_name : str
         Name of the column representing time.
+    secure_aggregation_session : str, optional
+        Identifier of the secure aggregation session. When set, the public key of
+        this node for the session is returned as well (default: None).
+    compact : bool, optional
+        Return the unique event times in the compact encoding of
+        :func:`.utils.encode_event_times` instead of as a list (default: False).
 
     Returns
     -------
-    List[str]
-        List of unique event times.
+    List[str] | dict
+        List of unique event times, or their compact encoding. In a secure
+        aggregation session, a dictionary containing the unique event times
+        (``event_times``) and the public key of this node (``public_key``).
 
     Raises
     ------
     InputError
-        If the time column is not found in the DataFrame.
+        If the time column is not found in the DataFrame, or is not numerical.
     """
     info("Getting unique event times.")
     info(f"Time column name: {time_column_name}.")
-    info("Checking privacy guards.")
-    _privacy_gaurds(df, time_column_name)
+    _check_columns_exist(df, time_column_name)
+    _check_numeric_columns(df, time_column_name)
 
-    df = _add_noise_to_event_times(df, time_column_name)
+    public_key = None
+    if secure_aggregation_session:
+        # only import the cryptography machinery when it is used
+        from .secure_aggregation import fingerprint, get_public_key
+
+        public_key = get_public_key(
+            secure_aggregation_session,
+            fingerprint(df[time_column_name], _records_per_row(df)),
+        )
 
-    return df[time_column_name].unique().tolist()
+    source = get_source_file() if cache_enabled() else None
+    if source:
+        path = sidecar_path(source, "times", time_column_name, *_noise_settings())
+        unique_event_times = load_array(path)
+        if unique_event_times is None:
+            df = _add_noise_to_event_times(df, time_column_name)
+            unique_event_times = np.unique(df[time_column_name].dropna().to_numpy())
+            store_array(path, unique_event_times)
+    else:
+        df = _add_noise_to_event_times(df, time_column_name)
+        unique_event_times = df[time_column_name].unique()
+
+    if compact:
+        unique_event_times = encode_event_times(unique_event_times)
+    else:
+        unique_event_times = unique_event_times.tolist()
+
+    if public_key:
+        return {"event_times": unique_event_times, "public_key": public_key}
+    return unique_event_times
 
 
-@data(1)
+@cached_data(*COLUMN_ARGUMENTS, preflight=_privacy_gaurds, sql_bins_from=_sql_time_bins)
 def get_km_event_table(
     df: pd.DataFrame,
     time_column_name: str,
     censor_column_name: str,
-    unique_event_times: List[int | float],
-) -> str:
+    unique_event_times: List[int | float] | dict | None = None,
+    bootstrap_replicates: int = 0,
+    event_type_column_name: str | None = None,
+    entry_time_column_name: str | None = None,
+    secure_aggregation_session: str | None = None,
+    public_keys: List[str] | None = None,
+    time_grid_width: float | None = None,
+    time_grid_horizon: float | None = None,
+    hazard_intervals: List[float] | None = None,
+    data_profile: bool = False,
+    weight_column_name: str | None = None,
+) -> str | dict:
     """
     Calculate death counts, total counts, and at-risk counts at each unique event time.
 
@@ -67,106 +348,1651 @@ def get_km_event_table(
         Name of the column representing time.
     censor_column_name : str
         Name of the column representing censoring.
-    unique_event_times : List[int | float]
-        List of unique event times.
+    unique_event_times : List[int | float] | dict, optional
+        List of unique event times, or their compact encoding as returned by
+        :func:`get_unique_event_times`. Not used when a time grid is requested.
+    bootstrap_replicates : int, optional
+        Number of bootstrap replicates of the event counts to draw (default: 0, no
+        bootstrapping).
+    event_type_column_name : str, optional
+        Name of the column containing the cause of the event (competing risks). When
+        set, the observed events are also counted per cause in the ``observed_<cause>``
+        columns (default: None).
+    entry_time_column_name : str, optional
+        Name of the column containing the time at which the record entered the study
+        (left truncation). When set, records are only at risk from their entry time
+        onwards (default: None).
+    secure_aggregation_session : str, optional
+        Identifier of the secure aggregation session. When set, the event counts are
+        masked so that they can only be used in the sum over all nodes (default:
+        None).
+    public_keys : List[str], optional
+        Public keys of all nodes in the secure aggregation session (default: None).
+    time_grid_width : float, optional
+        Width of the time grid. When set, the event times are rounded up to the grid
+        points of :func:`.utils.get_time_grid`, and the event table contains all grid
+        points (default: None).
+    time_grid_horizon : float, optional
+        Maximum horizon of the time grid, records that are removed after the last grid
+        point are censored at the last grid point (default: None).
+    hazard_intervals : List[float], optional
+        Increasing boundaries of the intervals of a piecewise constant hazard. When
+        set, the event table contains the number of events and the person-time of
+        every interval (starting at the interval start) instead of the counts at
+        every event time, see :func:`_count_events_per_interval` (default: None).
+    data_profile : bool, optional
+        Return the data quality profile of :func:`_profile_data` together with the
+        event table (default: False).
+    weight_column_name : str, optional
+        Name of the column containing the weight of every record, e.g. inverse
+        probability or sampling weights. When set, the counts are sums of the weights
+        and the sums of the squared weights are added for the variance, see
+        :func:`_count_events`. Can not be combined with bootstrap replicates,
+        competing risks, left truncation, secure aggregation, hazard intervals or
+        noise on the event counts (default: None).
 
     Returns
     -------
-    str
-        The Kaplan-Meier event table as a JSON string.
-    """
-    info("Checking privacy guards.")
-    _privacy_gaurds(df, time_column_name)
+    str | dict
+        The Kaplan-Meier event table as a JSON string. When bootstrap replicates are
+        requested, a dictionary containing the event table (``event_table``) and the
+        replicated event counts (``bootstrap``). In a secure aggregation session, a
+        dictionary containing the masked counts (``masked_counts``) at every global
+        event time in sorted order. When the data profile is requested, it is added
+        to the dictionary (``profile``), and a plain event table is returned in a
+        dictionary as well (``event_table``).
 
-    df = _add_noise_to_event_times(df, time_column_name)
+    Raises
+    ------
+    InputError
+        If the data contains invalid values, see :func:`_check_data_profile`.
+    PrivacyThresholdViolation
+        If the node requires secure aggregation and the event table is requested in
+        clear text, or if fewer organizations than the minimum take part in the
+        secure aggregation.
+    """
+    REQUIRE_SECURE_AGGREGATION = get_env_var(
+        "KAPLAN_MEIER_REQUIRE_SECURE_AGGREGATION",
+        KAPLAN_MEIER_REQUIRE_SECURE_AGGREGATION,
+    )
+    if REQUIRE_SECURE_AGGREGATION.lower() == "true" and not secure_aggregation_session:
+        raise PrivacyThresholdViolation(
+            "This node only shares event tables using secure aggregation."
+        )
 
-    # Group by the time column, aggregating both death and total counts simultaneously
-    km_df = (
-        df.groupby(time_column_name)
-        .agg(
-            removed=(censor_column_name, "count"), observed=(censor_column_name, "sum")
+    _check_columns_exist(
+        df,
+        time_column_name,
+        censor_column_name,
+        event_type_column_name,
+        entry_time_column_name,
+        weight_column_name,
+    )
+    if weight_column_name and (
+        bootstrap_replicates
+        or event_type_column_name
+        or entry_time_column_name
+        or secure_aggregation_session
+        or hazard_intervals is not None
+    ):
+        raise InputError(
+            "Weights can not be combined with bootstrap replicates, competing risks, "
+            "left truncation, secure aggregation or hazard intervals."
         )
-        .reset_index()
+    if data_profile and secure_aggregation_session:
+        raise InputError("A data profile can not be shared in secure aggregation.")
+    # The profile is computed on the data as supplied, before any noise is added
+    profile = _profile_data(
+        df,
+        time_column_name,
+        censor_column_name,
+        entry_time_column_name,
+        weight_column_name,
     )
+    _check_data_profile(profile)
+    if not data_profile:
+        profile = None
+
+    if hazard_intervals is not None:
+        boundaries = np.asarray(hazard_intervals, dtype=float)
+        if len(boundaries) < 2 or np.any(np.diff(boundaries) <= 0):
+            raise InputError(
+                "Hazard intervals require at least two increasing boundaries."
+            )
+        df = _add_noise_to_event_times(df, time_column_name, entry_time_column_name)
+        km_df = _count_events_per_interval(
+            df,
+            time_column_name,
+            censor_column_name,
+            boundaries,
+            event_type_column_name,
+            entry_time_column_name,
+        )
+        km_df = _add_noise_to_event_counts(km_df, time_column_name)
+        km_df = _add_noise_to_person_time(km_df, time_column_name, boundaries)
+        km_df = _merge_small_interval_counts(km_df, time_column_name)
+        # the person-time is not a count, so intervals are never combined afterwards
+        return _add_profile(
+            event_table_to_json(km_df, time_column_name, allow_coarsening=False),
+            profile,
+        )
+
+    if time_grid_width is not None:
+        if time_grid_width <= 0 or not time_grid_horizon or time_grid_horizon <= 0:
+            raise InputError("A time grid requires a positive width and horizon.")
+        unique_event_times = get_time_grid(time_grid_width, time_grid_horizon)
+    elif unique_event_times is None:
+        raise InputError("Either unique event times or a time grid is required.")
+    elif isinstance(unique_event_times, dict):
+        unique_event_times = decode_event_times(unique_event_times)
+    if secure_aggregation_session:
+        if not public_keys:
+            raise InputError("Public keys are required for secure aggregation.")
+        # the masks only hide the counts of this node among those of other nodes
+        MINIMUM_ORGANIZATIONS = get_env_var_as_int(
+            "KAPLAN_MEIER_MINIMUM_ORGANIZATIONS", KAPLAN_MEIER_MINIMUM_ORGANIZATIONS
+        )
+        if len(set(public_keys)) < MINIMUM_ORGANIZATIONS:
+            raise PrivacyThresholdViolation(
+                "Number of organizations in the secure aggregation should be at least "
+                f"{MINIMUM_ORGANIZATIONS}."
+            )
+        # only import the cryptography machinery when it is used
+        from .secure_aggregation import (
+            SECURE_AGGREGATION_COLUMNS,
+            fingerprint,
+            mask_counts,
+        )
+
+        # the keys are derived from the data before noise is added to it
+        data_fingerprint = fingerprint(df[time_column_name], _records_per_row(df))
+
+    # The sorted index only contains the event times and the (binary) censor column
+    index = None
+    if (
+        not event_type_column_name
+        and not entry_time_column_name
+        and not weight_column_name
+        and time_grid_width is None
+        and NUMBER_OF_RECORDS_COLUMN not in df
+    ):
+        index = _get_event_time_index(df, time_column_name, censor_column_name)
+
+    if index is not None:
+        km_df = _count_events_from_index(index, unique_event_times, time_column_name)
+    else:
+        df = _add_noise_to_event_times(df, time_column_name, entry_time_column_name)
+        if time_grid_width is not None:
+            df = _snap_to_time_grid(
+                df, time_column_name, censor_column_name, unique_event_times
+            )
+        km_df = _compute_event_counts(
+            df, time_column_name, censor_column_name, weight_column_name
+        )
+        if event_type_column_name:
+            km_df = pd.merge(
+                km_df,
+                _count_events_per_type(
+                    df, time_column_name, censor_column_name, event_type_column_name
+                ),
+                on=time_column_name,
+                how="left",
+            )
+
+        # Make sure all global times are available and sort it by time
+        km_df = pd.merge(
+            pd.DataFrame({time_column_name: unique_event_times}),
+            km_df,
+            on=time_column_name,
+            how="left",
+        ).fillna(0)
+        km_df.sort_values(by=time_column_name, inplace=True)
+
     km_df["censored"] = km_df["removed"] - km_df["observed"]
 
-    # Make sure all global times are available and sort it by time
-    km_df = pd.merge(
-        pd.DataFrame({time_column_name: unique_event_times}),
-        km_df,
-        on=time_column_name,
-        how="left",
-    ).fillna(0)
-    km_df.sort_values(by=time_column_name, inplace=True)
+    km_df = _add_noise_to_event_counts(
+        km_df, time_column_name, weighted=bool(weight_column_name)
+    )
+
+    if entry_time_column_name:
+        # The entries are counted per event time before merging, so that records that
+        # enter within a group of merged event times are at risk in that group
+        km_df["entered"] = _count_entries(
+            df, km_df, time_column_name, censor_column_name, entry_time_column_name
+        )
+        km_df = _add_noise_to_entry_counts(km_df, time_column_name)
+
+    if weight_column_name:
+        # the minimum number of events applies to the records, not to their weights
+        km_df = _merge_small_event_counts(
+            km_df, time_column_name, events_column_name="observed_records"
+        ).drop(columns="observed_records")
+    else:
+        km_df = _merge_small_event_counts(km_df, time_column_name)
 
     # Calculate "at-risk" counts at each unique event time
-    km_df["at_risk"] = km_df["removed"].iloc[::-1].cumsum().iloc[::-1]
+    if entry_time_column_name:
+        if len(km_df) < len(unique_event_times):
+            warn(
+                "Merged event times with delayed entry: records that enter within a "
+                "merged event time are at risk at that event time, which biases the "
+                "survival when many records enter between the event times."
+            )
+        km_df["at_risk"] = _at_risk_with_delayed_entry(km_df)
+        km_df.drop(columns="entered", inplace=True)
+    else:
+        km_df["at_risk"] = km_df["removed"].iloc[::-1].cumsum().iloc[::-1]
+    if weight_column_name:
+        km_df["at_risk_squared"] = (
+            km_df["removed_squared"].iloc[::-1].cumsum().iloc[::-1]
+        )
 
-    # Convert DataFrame to JSON
-    return km_df.to_json()
+    if secure_aggregation_session:
+        counts = _align_to_event_times(km_df, time_column_name, unique_event_times)
+        masked = mask_counts(
+            counts[SECURE_AGGREGATION_COLUMNS].to_numpy(),
+            secure_aggregation_session,
+            public_keys,
+            data_fingerprint,
+        )
+        return {"masked_counts": masked.tolist()}
+
+    if bootstrap_replicates:
+        # the bootstrap replicates refer to the event times of the event table
+        return _add_profile(
+            {
+                "event_table": event_table_to_json(
+                    km_df, time_column_name, allow_coarsening=False
+                ),
+                "bootstrap": _bootstrap_event_counts(km_df, bootstrap_replicates),
+            },
+            profile,
+        )
+
+    # Convert DataFrame to JSON, merged event times are reported at their first time
+    return _add_profile(
+        event_table_to_json(km_df, time_column_name, label="first"), profile
+    )
 
 
-def _privacy_gaurds(df: pd.DataFrame, time_column_name: str) -> pd.DataFrame:
+def _profile_data(
+    df: pd.DataFrame,
+    time_column_name: str,
+    censor_column_name: str,
+    entry_time_column_name: str | None = None,
+    weight_column_name: str | None = None,
+) -> dict:
     """
-    Check if the input data is valid and apply privacy guards.
+    Profile the quality of the data used for the event table.
+
+    The profile only contains counts, unless the node allows sharing the minimum and
+    maximum event time.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    entry_time_column_name : str, optional
+        Name of the column representing the entry time (default: None).
+    weight_column_name : str, optional
+        Name of the column representing the weights (default: None).
+
+    Returns
+    -------
+    dict
+        Number of records (``records``), and for the time column the number of
+        missing (``null``) and negative (``negative``) times. For the censor column
+        the number of missing values and of every censor value, where values other
+        than 0 and 1 are counted as ``other``. With an entry time column, the number
+        of missing entry times and of entry times after the event time. With a weight
+        column, the number of missing and negative weights.
+
+    Raises
+    ------
+    InputError
+        If the time, entry time or weight column is not numerical.
     """
+    _check_numeric_columns(
+        df, time_column_name, entry_time_column_name, weight_column_name
+    )
 
-    info("Checking number of records in the DataFrame.")
-    MINIMUM_NUMBER_OF_RECORDS = get_env_var_as_int(
-        "KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS", KAPLAN_MEIER_MINIMUM_NUMBER_OF_RECORDS
+    records = _records_per_row(df)
+    times = df[time_column_name].to_numpy(dtype=float)
+    time_missing = np.isnan(times)
+    time_profile = {
+        "null": int(records[time_missing].sum()),
+        "negative": int(records[times < 0].sum()),
+    }
+    SHARE_TIME_RANGE = get_env_var(
+        "KAPLAN_MEIER_DATA_PROFILE_TIME_RANGE", KAPLAN_MEIER_DATA_PROFILE_TIME_RANGE
     )
-    if len(df) <= MINIMUM_NUMBER_OF_RECORDS:
-        raise InputError(
-            "Number of records in 'df' must be greater than "
-            f"{MINIMUM_NUMBER_OF_RECORDS}."
-        )
+    if SHARE_TIME_RANGE.lower() == "true" and not time_missing.all():
+        time_profile["min"] = float(np.nanmin(times))
+        time_profile["max"] = float(np.nanmax(times))
 
-    info("Check that the selected time column is allowed by the node")
-    ALLOWED_EVENT_TIME_COLUMNS_REGEX = get_env_var_as_list(
-        "KAPLAN_MEIER_EVENT_TIME_COLUMN", KAPLAN_MEIER_ALLOWED_EVENT_TIME_COLUMNS_REGEX
+    censor = df[censor_column_name]
+    censor_missing = censor.isna().to_numpy()
+    censor_profile = {
+        "null": int(records[censor_missing].sum()),
+        "0": int(records[(censor == 0).to_numpy()].sum()),
+        "1": int(records[(censor == 1).to_numpy()].sum()),
+    }
+    censor_profile["other"] = (
+        int(records.sum())
+        - censor_profile["null"]
+        - censor_profile["0"]
+        - censor_profile["1"]
     )
-    for pattern in ALLOWED_EVENT_TIME_COLUMNS_REGEX:
-        if re.match(pattern, time_column_name):
-            break
-    else:
-        info(f"Allowed event time columns: {ALLOWED_EVENT_TIME_COLUMNS_REGEX}")
+
+    profile = {
+        "records": int(records.sum()),
+        "complete_records": int(records[~time_missing & ~censor_missing].sum()),
+        "time": time_profile,
+        "censor": censor_profile,
+    }
+    if entry_time_column_name:
+        entry_times = df[entry_time_column_name].to_numpy(dtype=float)
+        profile["entry_time"] = {
+            "null": int(records[np.isnan(entry_times)].sum()),
+            "after_time": int(records[entry_times > times].sum()),
+        }
+    if weight_column_name:
+        weights = df[weight_column_name].to_numpy(dtype=float)
+        profile["weight"] = {
+            "null": int(records[np.isnan(weights)].sum()),
+            "negative": int(records[weights < 0].sum()),
+        }
+    return profile
+
+
+def _check_data_profile(profile: dict) -> None:
+    """
+    Check the data quality profile, so that invalid data is reported instead of
+    resulting in a wrong event table.
+
+    Records with a missing time or censor value are ignored in the event table, for
+    which a warning is logged.
+
+    Parameters
+    ----------
+    profile : dict
+        Data profile, see :func:`_profile_data`.
+
+    Raises
+    ------
+    InputError
+        If the data has no complete records, or has negative times, censor values
+        other than 0 and 1, entry times after the event time or negative weights.
+    """
+    incomplete = profile["records"] - profile["complete_records"]
+    if incomplete:
+        warn(f"Ignoring {incomplete} records with a missing time or censor value.")
+
+    if not profile["complete_records"]:
+        raise InputError("The data contains no records with a time and censor value.")
+    if profile["time"]["negative"]:
         raise InputError(
-            f"Column '{time_column_name}' is not allowed as a time column."
+            f"Found {profile['time']['negative']} records with a negative time."
+        )
+    if profile["censor"]["other"]:
+        raise InputError(
+            f"Found {profile['censor']['other']} records with a censor value other "
+            "than 0 and 1."
+        )
+    if profile.get("entry_time", {}).get("after_time"):
+        raise InputError(
+            f"Found {profile['entry_time']['after_time']} records with an entry time "
+            "after the event time."
+        )
+    if profile.get("weight", {}).get("null"):
+        warn(f"Ignoring {profile['weight']['null']} records with a missing weight.")
+    if profile.get("weight", {}).get("negative"):
+        raise InputError(
+            f"Found {profile['weight']['negative']} records with a negative weight."
         )
 
-    if time_column_name not in df.columns:
-        raise InputError(f"Column '{time_column_name}' not found in the data frame.")
+
+def _add_profile(result: str | dict, profile: dict | None) -> str | dict:
+    """
+    Add the data profile to the result of :func:`get_km_event_table`.
+
+    Parameters
+    ----------
+    result : str | dict
+        Event table as JSON string, or dictionary containing the event table.
+    profile : dict | None
+        Data profile, or None when it is not requested.
+
+    Returns
+    -------
+    str | dict
+        The result, in a dictionary with the profile (``profile``) when requested.
+    """
+    if profile is None:
+        return result
+    if isinstance(result, str):
+        result = {"event_table": result}
+    return {**result, "profile": profile}
 
 
-def _add_noise_to_event_times(df: pd.DataFrame, time_column_name: str) -> pd.DataFrame:
+def _partial_tasks_columns(tasks: List[dict], **kwargs) -> List[str]:
     """
-    Add noise to the event times in a DataFrame when this is requisted by the data-
-    station.
+    Get the names of all columns used by a batch of partial tasks.
+
+    Parameters
+    ----------
+    tasks : List[dict]
+        The partial tasks, see :func:`run_partials`.
+    **kwargs
+        Other arguments of :func:`run_partials`, which are not used.
+
+    Returns
+    -------
+    List[str]
+        Unique column names.
+    """
+    columns = {}
+    for task in tasks:
+        for argument in COLUMN_ARGUMENTS:
+            if task.get("kwargs", {}).get(argument):
+                columns[task["kwargs"][argument]] = None
+    return list(columns)
+
+
+def _partial_tasks_privacy_guards(
+    tasks: List[dict], number_of_records: int | None = None, **kwargs
+) -> None:
+    """
+    Check that every task in a batch of partial tasks is allowed by the node.
+
+    Parameters
+    ----------
+    tasks : List[dict]
+        The partial tasks, see :func:`run_partials`.
+    number_of_records : int | None, optional
+        Number of records in the data source (default: None).
+    **kwargs
+        Other arguments of :func:`run_partials`, which are not used.
+    """
+    for task in tasks:
+        _privacy_gaurds(number_of_records=number_of_records, **task.get("kwargs", {}))
+
+
+@cached_data(
+    columns_from=_partial_tasks_columns, preflight=_partial_tasks_privacy_guards
+)
+def run_partials(df: pd.DataFrame, tasks: List[dict]) -> list:
+    """
+    Run multiple partial methods over a single load of the data.
 
     Parameters
     ----------
     df : pd.DataFrame
-        Input DataFrame which contains the ``time_column_name`` column.
+        Input DataFrame.
+    tasks : List[dict]
+        The partial methods to run. Every task is a dictionary containing the name of
+        the partial method (``method``), which is either ``get_unique_event_times`` or
+        ``get_km_event_table``, and its keyword arguments (``kwargs``).
+
+    Returns
+    -------
+    list
+        The result of every task, in the same order as ``tasks``.
+
+    Raises
+    ------
+    InputError
+        If a task requests an unknown method.
+    """
+    methods = {
+        "get_unique_event_times": get_unique_event_times,
+        "get_km_event_table": get_km_event_table,
+    }
+    results = []
+    for task in tasks:
+        if task.get("method") not in methods:
+            raise InputError(f"Unknown partial method '{task.get('method')}'.")
+        kwargs = task.get("kwargs", {})
+        info(f"Running '{task['method']}' on columns {_partial_tasks_columns([task])}")
+
+        # The partial methods modify the data (e.g. by adding noise), so every task
+        # receives its own copy of the columns it uses.
+        columns = [column for column in _partial_tasks_columns([task]) if column in df]
+        if NUMBER_OF_RECORDS_COLUMN in df:
+            columns.append(NUMBER_OF_RECORDS_COLUMN)
+        method = methods[task["method"]].__wrapped__
+        results.append(method(df[columns].copy(), **kwargs))
+    return results
+
+
+def _snap_to_time_grid(
+    df: pd.DataFrame, time_column_name: str, censor_column_name: str, grid: np.ndarray
+) -> pd.DataFrame:
+    """
+    Round the event times up to the next grid point.
+
+    Records that are removed after the last grid point are censored at the last grid
+    point, so that they are at risk at every grid point.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
     time_column_name : str
-        Privacy sensitive column name to which noise is going to b.
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    grid : np.ndarray
+        Sorted grid points.
 
     Returns
     -------
     pd.DataFrame
-        The DataFrame with added noise to the ``time_column_name``.
+        DataFrame with the event times on the grid.
     """
-    NOISE_TYPE = get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper()
-    if NOISE_TYPE == NoiseType.NONE:
-        info("No noise is applied to the event times.")
-        return df
+    times = df[time_column_name].to_numpy(dtype=float)
+    beyond_horizon = times > grid[-1]
+    positions = np.searchsorted(grid, times, side="left")
+    snapped = grid[np.minimum(positions, len(grid) - 1)]
+
+    df[time_column_name] = np.where(np.isnan(times), np.nan, snapped)
+    df[censor_column_name] = np.where(beyond_horizon, 0, df[censor_column_name])
+    return df
+
+
+def _align_to_event_times(
+    km_df: pd.DataFrame, time_column_name: str, unique_event_times: List[int | float]
+) -> pd.DataFrame:
+    """
+    Expand the event table to all global event times in sorted order.
+
+    Event times that were merged by this node have no events, and the number of
+    records at risk equals the number at risk at the next event time.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Event table sorted by time.
+    time_column_name : str
+        Name of the column representing time.
+    unique_event_times : List[int | float]
+        List of global unique event times.
+
+    Returns
+    -------
+    pd.DataFrame
+        Event table with a row for every global event time.
+    """
+    table = km_df.set_index(time_column_name).reindex(np.unique(unique_event_times))
+    table["at_risk"] = table["at_risk"].bfill()
+    return table.fillna(0).rename_axis(time_column_name).reset_index()
+
+
+def _merge_small_event_counts(
+    km_df: pd.DataFrame, time_column_name: str, events_column_name: str = "observed"
+) -> pd.DataFrame:
+    """
+    Merge adjacent event times until each of them has the minimum number of observed
+    events required by the node.
+
+    Event times are merged greedily from the first event time onwards: a group is
+    closed as soon as it reaches the minimum number of events. A remaining group at
+    the end that does not reach the minimum is merged into the previous group. Every
+    group is released at its first event time. Groups are found by binary search in the
+    cumulative number of events, so the work scales with the number of groups rather
+    than with the number of event times.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Event table sorted by time.
+    time_column_name : str
+        Name of the column representing time.
+    events_column_name : str, optional
+        Name of the column containing the number of observed events (default:
+        "observed").
+
+    Returns
+    -------
+    pd.DataFrame
+        The event table in which every event time has at least the minimum number of
+        observed events.
+
+    Raises
+    ------
+    PrivacyThresholdViolation
+        If the total number of observed events is below the minimum.
+    """
+    MINIMUM_EVENTS = get_env_var_as_int(
+        "KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME", KAPLAN_MEIER_MINIMUM_EVENTS_PER_TIME
+    )
+    if MINIMUM_EVENTS <= 0 or km_df.empty:
+        return km_df
+
+    cumulative_observed = km_df[events_column_name].cumsum().to_numpy()
+    if cumulative_observed[-1] < MINIMUM_EVENTS:
+        raise PrivacyThresholdViolation(
+            "Number of observed events should be at least "
+            f"{MINIMUM_EVENTS} to share an event table."
+        )
+
+    starts = []
+    start, events_before = 0, 0.0
+    while start < len(km_df):
+        # last event time of the group: the first time the group reaches the minimum
+        end = np.searchsorted(
+            cumulative_observed, events_before + MINIMUM_EVENTS, side="left"
+        )
+        if end >= len(km_df):
+            # the remaining event times end up in the previous group
+            break
+        starts.append(start)
+        start, events_before = end + 1, cumulative_observed[end]
+    starts = np.asarray(starts)
+
+    info(f"Merged {len(km_df)} event times into {len(starts)} event times.")
+    count_columns = [column for column in km_df if column != time_column_name]
+    merged = pd.DataFrame(
+        np.add.reduceat(km_df[count_columns].to_numpy(dtype=float), starts, axis=0),
+        columns=count_columns,
+    )
+    merged.insert(0, time_column_name, km_df[time_column_name].to_numpy()[starts])
+    return merged
+
+
+def _count_entries(
+    df: pd.DataFrame,
+    km_df: pd.DataFrame,
+    time_column_name: str,
+    censor_column_name: str,
+    entry_time_column_name: str,
+) -> np.ndarray:
+    """
+    Count the records that enter the study after the previous event time and before
+    each event time (left truncation).
+
+    The records that entered before the first event time are counted at the first
+    event time. The counts are computed for all event times at once by binary search
+    in the sorted entry times.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame, with the same noise applied as used for ``km_df``.
+    km_df : pd.DataFrame
+        Event table, sorted by time.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    entry_time_column_name : str
+        Name of the column representing the entry time.
+
+    Returns
+    -------
+    np.ndarray
+        Number of records that entered at each event time.
+    """
+    # Only records that are counted in the event table can enter the risk set. A
+    # missing entry time means the record was followed from the start.
+    records = df.dropna(subset=[time_column_name, censor_column_name])
+    entry_times = records[entry_time_column_name].to_numpy(
+        dtype=float, na_value=-np.inf
+    )
+    order = np.argsort(entry_times, kind="stable")
+    cumulative_records = np.concatenate(
+        ([0], np.cumsum(_records_per_row(records)[order]))
+    )
+
+    times = km_df[time_column_name].to_numpy(dtype=float)
+    positions = np.searchsorted(entry_times[order], times, side="left")
+    return np.diff(cumulative_records[positions], prepend=0)
+
+
+def _merge_small_interval_counts(
+    km_df: pd.DataFrame, time_column_name: str
+) -> pd.DataFrame:
+    """
+    Merge adjacent hazard intervals until each of them has the minimum number of
+    observed events required by the node, and spread the counts of every merged group
+    over its intervals.
+
+    The intervals are merged as in :func:`_merge_small_event_counts`, but the
+    person-time is not: it stays in the interval it was spent in. The counts of a
+    merged group are spread over its intervals in proportion to their person-time,
+    i.e. the group has a constant hazard. This only uses the counts of the group and
+    the person-time, so the counts of the individual intervals are not revealed.
+    Keeping all counts of a group in its first interval would bias the hazards, as
+    the person-time of the other intervals would have no events.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Interval table, see :func:`_count_events_per_interval`.
+    time_column_name : str
+        Name of the column representing the start of the interval.
+
+    Returns
+    -------
+    pd.DataFrame
+        The interval table with a row for every interval.
+    """
+    merged = _merge_small_event_counts(
+        km_df.drop(columns="person_time"), time_column_name
+    )
+    if len(merged) == len(km_df):
+        return km_df
+
+    starts = km_df[time_column_name].to_numpy()
+    groups = np.searchsorted(merged[time_column_name].to_numpy(), starts, "right") - 1
+    person_time = km_df["person_time"].to_numpy(dtype=float)
+    group_person_time = np.bincount(groups, weights=person_time)[groups]
+    # a group without person-time keeps its counts in its first interval
+    first = np.concatenate(([True], groups[1:] != groups[:-1]))
+    share = np.divide(
+        person_time,
+        group_person_time,
+        out=first.astype(float),
+        where=group_person_time > 0,
+    )
+
+    count_columns = [column for column in merged if column != time_column_name]
+    spread = merged[count_columns].to_numpy(dtype=float)[groups] * share[:, None]
+    km_df = pd.DataFrame(spread, columns=count_columns)
+    km_df.insert(0, time_column_name, starts)
+    km_df["person_time"] = person_time
+    return km_df
+
+
+def _at_risk_with_delayed_entry(km_df: pd.DataFrame) -> np.ndarray:
+    """
+    Calculate the number of records at risk when records enter the study after time
+    zero (left truncation).
+
+    A record is at risk at time t when it entered before t and was not removed before
+    t. The risk set is therefore the cumulative number of entries minus the
+    cumulative number of removals before t, and at least the number of removals at
+    t. When event times are merged, the entries
+    of the whole group are included, so that the records that enter within the group
+    and are removed in it are part of its risk set.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Event table containing the ``entered`` and ``removed`` columns, sorted by
+        time, see :func:`_count_entries`.
+
+    Returns
+    -------
+    np.ndarray
+        Number of records at risk at each event time.
+    """
+    removed = km_df["removed"].to_numpy()
+    removed_before = np.cumsum(removed) - removed
+    at_risk = np.cumsum(km_df["entered"].to_numpy()) - removed_before
+    # The records that are removed at an event time were at risk at that time. With
+    # noise on the entries and removals the difference can be smaller, and clipping
+    # it is post-processing.
+    return np.maximum(at_risk, removed)
+
+
+def _count_events_per_interval(
+    df: pd.DataFrame,
+    time_column_name: str,
+    censor_column_name: str,
+    boundaries: np.ndarray,
+    event_type_column_name: str | None = None,
+    entry_time_column_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Count the events and the person-time in every interval of a piecewise constant
+    hazard.
+
+    Interval ``i`` contains the times ``boundaries[i] <= t < boundaries[i + 1]``. A
+    record is removed in the interval that contains its event time, and contributes
+    the time it was followed within an interval to the person-time of that interval.
+    The person-time of all intervals is computed at once by binary search of the
+    boundaries in the sorted event (and entry) times.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    boundaries : np.ndarray
+        Increasing boundaries of the intervals.
+    event_type_column_name : str, optional
+        Name of the column representing the cause of the event. When set, the
+        observed events are also counted per cause (default: None).
+    entry_time_column_name : str, optional
+        Name of the column representing the entry time. When set, records only
+        contribute person-time from their entry time onwards (default: None).
+
+    Returns
+    -------
+    pd.DataFrame
+        Table with the start of every interval, the ``observed``, ``censored`` and
+        ``removed`` counts and the ``person_time``.
+    """
+    records = df.dropna(subset=[time_column_name, censor_column_name])
+    times = records[time_column_name].to_numpy(dtype=float)
+    observed = records[censor_column_name].to_numpy() == 1
+    number_of_records = _records_per_row(records)
+    # the times of the records in a bin of the SQL pushdown are only known as a sum
+    time_sums = None
+    if TIME_SUM_COLUMN in records:
+        time_sums = records[TIME_SUM_COLUMN].to_numpy(dtype=float)
+    number_of_intervals = len(boundaries) - 1
+
+    intervals = np.searchsorted(boundaries, times, side="right") - 1
+    inside = (intervals >= 0) & (intervals < number_of_intervals)
+    intervals, observed = intervals[inside], observed[inside]
+    weights = number_of_records[inside]
+
+    km_df = pd.DataFrame({time_column_name: boundaries[:-1]})
+    if event_type_column_name:
+        causes = records[event_type_column_name].to_numpy()[inside]
+        for cause in np.unique(causes[observed]):
+            selection = observed & (causes == cause)
+            km_df[f"observed_{cause}"] = np.bincount(
+                intervals[selection],
+                weights=weights[selection],
+                minlength=number_of_intervals,
+            )
+    km_df["observed"] = np.bincount(
+        intervals[observed], weights=weights[observed], minlength=number_of_intervals
+    )
+    km_df["removed"] = np.bincount(
+        intervals, weights=weights, minlength=number_of_intervals
+    )
+    km_df["censored"] = km_df["removed"] - km_df["observed"]
+
+    person_time = _person_time_per_interval(
+        times, boundaries, number_of_records, time_sums
+    )
+    if entry_time_column_name:
+        # A missing entry time means the record was followed from the start
+        entry_times = records[entry_time_column_name].to_numpy(
+            dtype=float, na_value=boundaries[0]
+        )
+        person_time -= _person_time_per_interval(
+            entry_times, boundaries, number_of_records
+        )
+    km_df["person_time"] = person_time
+    return km_df
+
+
+def _person_time_per_interval(
+    times: np.ndarray,
+    boundaries: np.ndarray,
+    number_of_records: np.ndarray | None = None,
+    time_sums: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Sum the time between the first boundary and every time, per interval.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Times of the records.
+    boundaries : np.ndarray
+        Increasing boundaries of the intervals.
+    number_of_records : np.ndarray, optional
+        Number of records of every time, for a histogram (default: None, one record
+        per time).
+    time_sums : np.ndarray, optional
+        Sum of the times of the records of every time, for a histogram in which the
+        times are binned by interval (default: None, the time times the number of
+        records).
+
+    Returns
+    -------
+    np.ndarray
+        For every interval, the sum over all records of the part of the interval
+        that lies before the time of the record.
+    """
+    if number_of_records is None:
+        number_of_records = np.ones(len(times))
+    if time_sums is None:
+        time_sums = times * number_of_records
+    # records before the first boundary do not contribute any person-time
+    before = times < boundaries[0]
+    time_sums = np.where(before, number_of_records * boundaries[0], time_sums)
+
+    order = np.argsort(np.maximum(times, boundaries[0]), kind="stable")
+    times = np.maximum(times, boundaries[0])[order]
+    cumulative_records = np.concatenate(([0.0], np.cumsum(number_of_records[order])))
+    cumulative_times = np.concatenate(([0.0], np.cumsum(time_sums[order])))
+    # number of records before every boundary
+    positions = np.searchsorted(times, boundaries, side="left")
+    inside = np.diff(cumulative_records[positions])
+    beyond = cumulative_records[-1] - cumulative_records[positions[1:]]
+    return (
+        np.diff(cumulative_times[positions])
+        - inside * boundaries[:-1]
+        + beyond * np.diff(boundaries)
+    )
+
+
+def _count_events_per_type(
+    df: pd.DataFrame,
+    time_column_name: str,
+    censor_column_name: str,
+    event_type_column_name: str,
+) -> pd.DataFrame:
+    """
+    Count the number of observed events per cause at each local event time.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    event_type_column_name : str
+        Name of the column representing the cause of the event.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with an ``observed_<cause>`` column for every cause.
+    """
+    events = df[df[censor_column_name] == 1]
+    counts = (
+        pd.Series(_records_per_row(events), index=events.index)
+        .groupby([events[time_column_name], events[event_type_column_name]])
+        .sum()
+        .unstack(fill_value=0)
+    )
+    counts.columns = [f"observed_{cause}" for cause in counts.columns]
+    return counts.reset_index()
+
+
+def _bootstrap_event_counts(km_df: pd.DataFrame, replicates: int) -> dict:
+    """
+    Draw Poisson bootstrap replicates of the local event counts.
+
+    Resampling the records with Poisson(1) weights is equivalent to drawing every
+    count of the (observed, censored) histogram from a Poisson distribution with the
+    count as mean. All replicates are therefore drawn at once from the (noised) event
+    table, without touching the individual records.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Event table containing the ``observed`` and ``censored`` columns, sorted by
+        time.
+    replicates : int
+        Number of bootstrap replicates.
+
+    Returns
+    -------
+    dict
+        The replicated ``observed`` and ``removed`` counts, both as nested lists of
+        shape (replicates, number of event times).
+    """
+    info(f"Drawing {replicates} bootstrap replicates of the event counts.")
+    # The replicates of the nodes are summed, so they need to be independent. A fixed
+    # seed would give every node the same random stream.
+    rng = np.random.default_rng()
+    size = (replicates, len(km_df))
+    observed = rng.poisson(km_df["observed"].to_numpy(dtype=float), size)
+    censored = rng.poisson(km_df["censored"].to_numpy(dtype=float), size)
+    return {"observed": observed.tolist(), "removed": (observed + censored).tolist()}
+
+
+def _get_event_time_index(
+    df: pd.DataFrame, time_column_name: str, censor_column_name: str
+) -> np.ndarray | None:
+    """
+    Get the sorted event time index of the data source.
+
+    The index contains the (noised) event times in sorted order together with the
+    cumulative number of observed events. It is stored as sidecar of the data source,
+    so that subsequent tasks do not need to sort and group the data again.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame, only used when the index needs to be (re)built.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+
+    Returns
+    -------
+    np.ndarray | None
+        Structured array with the fields ``time`` and ``cumulative_observed``, or
+        None when the node does not allow caching or the source is not a file.
+    """
+    source = get_source_file() if cache_enabled() else None
+    if not source:
+        return None
+
+    path = sidecar_path(
+        source, "index", time_column_name, censor_column_name, *_noise_settings()
+    )
+    index = load_array(path)
+    if index is not None:
+        return index
+
+    info("Building sorted event time index.")
+    df = _add_noise_to_event_times(df, time_column_name)
+    df = df[[time_column_name, censor_column_name]].dropna()
+    times = df[time_column_name].to_numpy()
+    order = np.argsort(times, kind="stable")
+
+    index = np.empty(
+        len(times), dtype=[("time", times.dtype), ("cumulative_observed", "f8")]
+    )
+    index["time"] = times[order]
+    index["cumulative_observed"] = np.cumsum(
+        df[censor_column_name].to_numpy(dtype=float)[order]
+    )
+    store_array(path, index)
+    return index
+
+
+def _count_events_from_index(
+    index: np.ndarray, unique_event_times: List[int | float], time_column_name: str
+) -> pd.DataFrame:
+    """
+    Count the number of removed and observed records at each global event time using
+    binary search in the sorted event time index.
+
+    Parameters
+    ----------
+    index : np.ndarray
+        Sorted event time index, see :func:`_get_event_time_index`.
+    unique_event_times : List[int | float]
+        List of global unique event times.
+    time_column_name : str
+        Name of the column representing time.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the ``removed`` and ``observed`` counts per global event time,
+        sorted by time.
+    """
+    times = np.sort(np.asarray(unique_event_times))
+    start = np.searchsorted(index["time"], times, side="left")
+    end = np.searchsorted(index["time"], times, side="right")
+    cumulative_observed = np.concatenate(([0.0], index["cumulative_observed"]))
+    return pd.DataFrame(
+        {
+            time_column_name: times,
+            "removed": (end - start).astype(float),
+            "observed": cumulative_observed[end] - cumulative_observed[start],
+        }
+    )
+
+
+def _compute_event_counts(
+    df: pd.DataFrame,
+    time_column_name: str,
+    censor_column_name: str,
+    weight_column_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Count the number of removed and observed records at each local event time.
+
+    When the node allows multiple processes, the records are split into contiguous
+    shards which are counted in a process pool. As counts are additive, the shard
+    results are reduced by summing them per event time. Any noise on the event times
+    has already been applied to the full DataFrame, so the result is identical to the
+    serial computation.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    weight_column_name : str, optional
+        Name of the column representing the weights, see :func:`_count_events`
+        (default: None).
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the ``removed`` and ``observed`` counts per event time.
+    """
+    NUMBER_OF_PROCESSES = get_env_var_as_int(
+        "KAPLAN_MEIER_NUMBER_OF_PROCESSES", KAPLAN_MEIER_NUMBER_OF_PROCESSES
+    )
+    if NUMBER_OF_PROCESSES == 0:
+        NUMBER_OF_PROCESSES = os.cpu_count() or 1
+
+    df = df[
+        [
+            time_column_name,
+            censor_column_name,
+            *filter(None, [weight_column_name]),
+            *[column for column in [NUMBER_OF_RECORDS_COLUMN] if column in df],
+        ]
+    ]
+    number_of_shards = min(
+        NUMBER_OF_PROCESSES, len(df) // MINIMUM_NUMBER_OF_RECORDS_PER_SHARD
+    )
+    if number_of_shards <= 1:
+        return _count_events(
+            df, time_column_name, censor_column_name, weight_column_name
+        )
+
+    # only import the process pool machinery when it is used
+    from concurrent.futures import ProcessPoolExecutor
+
+    info(f"Counting events in {number_of_shards} shards in parallel.")
+    bounds = np.linspace(0, len(df), number_of_shards + 1, dtype=int)
+    shards = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    with ProcessPoolExecutor(max_workers=number_of_shards) as executor:
+        shard_counts = list(
+            executor.map(
+                _count_events,
+                shards,
+                [time_column_name] * number_of_shards,
+                [censor_column_name] * number_of_shards,
+                [weight_column_name] * number_of_shards,
+            )
+        )
+
+    return pd.concat(shard_counts).groupby(time_column_name, as_index=False).sum()
+
+
+def _count_events(
+    df: pd.DataFrame,
+    time_column_name: str,
+    censor_column_name: str,
+    weight_column_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Count the number of removed and observed records at each event time of (a shard
+    of) the data.
+
+    With weights, the ``removed`` and ``observed`` counts are the sums of the weights
+    of the records, and the ``removed_squared`` and ``observed_squared`` columns
+    contain the sums of the squared weights. The number of observed records is kept
+    in the ``observed_records`` column. Records without a weight are ignored. The rows
+    of a histogram of the SQL pushdown count as their number of records.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    time_column_name : str
+        Name of the column representing time.
+    censor_column_name : str
+        Name of the column representing censoring.
+    weight_column_name : str, optional
+        Name of the column representing the weights (default: None).
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the ``removed`` and ``observed`` counts per event time.
+    """
+    if weight_column_name:
+        weights = df[weight_column_name].to_numpy(dtype=float)
+        observed = df[censor_column_name].to_numpy(dtype=float)
+        records = _records_per_row(df)
+        complete = ~np.isnan(weights) & ~np.isnan(observed)
+        weights, observed = weights[complete], observed[complete]
+        records = records[complete]
+        return (
+            pd.DataFrame(
+                {
+                    time_column_name: df[time_column_name].to_numpy()[complete],
+                    "removed": records * weights,
+                    "observed": records * weights * observed,
+                    "removed_squared": records * weights**2,
+                    "observed_squared": records * weights**2 * observed,
+                    "observed_records": records * observed,
+                }
+            )
+            .groupby(time_column_name)
+            .sum()
+            .reset_index()
+        )
+
+    if NUMBER_OF_RECORDS_COLUMN in df:
+        records = df[NUMBER_OF_RECORDS_COLUMN].where(df[censor_column_name].notna(), 0)
+        return (
+            pd.DataFrame(
+                {
+                    time_column_name: df[time_column_name],
+                    "removed": records,
+                    "observed": records * df[censor_column_name],
+                }
+            )
+            .groupby(time_column_name)
+            .sum()
+            .reset_index()
+        )
+
+    # Group by the time column, aggregating both death and total counts simultaneously
+    return (
+        df.groupby(time_column_name)
+        .agg(
+            removed=(censor_column_name, "count"), observed=(censor_column_name, "sum")
+        )
+        .reset_index()
+    )
+
+
+def _add_noise_to_event_times(
+    df: pd.DataFrame, time_column_name: str, entry_time_column_name: str | None = None
+) -> pd.DataFrame:
+    """
+    Add noise to the event times in a DataFrame when this is requisted by the data-
+    station.
+
+    The entry times are shifted by the same noise as the event times of their record,
+    so that a record is never removed before it entered the study.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame which contains the ``time_column_name`` column.
+    time_column_name : str
+        Privacy sensitive column name to which noise is going to b.
+    entry_time_column_name : str | None, optional
+        Name of the column representing the entry time (default: None).
+
+    Returns
+    -------
+    pd.DataFrame
+        The DataFrame with added noise to the ``time_column_name``.
+    """
+    NOISE_TYPE = get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper()
+    if NOISE_TYPE == NoiseType.NONE:
+        info("No noise is applied to the event times.")
+        return df
+    if NOISE_TYPE in (NoiseType.LAPLACE, NoiseType.GEOMETRIC):
+        info("Event times are not perturbed, noise is applied to the event counts.")
+        return df
+    if NOISE_TYPE not in (NoiseType.GAUSSIAN, NoiseType.POISSON):
+        raise EnvironmentVariableError(f"Invalid noise type: {NOISE_TYPE}")
+
+    # every record receives its own noise
+    df = _expand_histogram(df)
+    times = df[time_column_name].to_numpy(dtype=float, copy=True)
     if NOISE_TYPE == NoiseType.GAUSSIAN:
         info("Gaussian noise is added to the event times.")
-        return __apply_gaussian_noise(df, time_column_name)
-    elif NOISE_TYPE == NoiseType.POISSON:
+        df = __apply_gaussian_noise(df, time_column_name)
+    else:
         info("Poisson noise is applied to the event times.")
-        return __apply_poisson_noise(df, time_column_name)
+        df = __apply_poisson_noise(df, time_column_name)
+
+    if entry_time_column_name:
+        # The entry time is never after the event time (see _check_data_profile), so
+        # this also holds after the shift. A missing entry time stays missing.
+        shift = df[time_column_name].to_numpy(dtype=float) - times
+        df[entry_time_column_name] = (
+            df[entry_time_column_name].to_numpy(dtype=float) + shift
+        )
+    return df
+
+
+def _expand_histogram(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expand a histogram of the SQL pushdown to one row per record.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame, which is returned as is when it is not a histogram.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with a row for every record.
+    """
+    if NUMBER_OF_RECORDS_COLUMN not in df:
+        return df
+    info("Expanding the histogram to one row per record.")
+    number_of_records = df[NUMBER_OF_RECORDS_COLUMN].to_numpy()
+    df = df.drop(columns=NUMBER_OF_RECORDS_COLUMN)
+    return df.loc[df.index.repeat(number_of_records)].reset_index(drop=True)
+
+
+def _records_per_row(df: pd.DataFrame) -> np.ndarray:
+    """
+    Get the number of records that every row of the data represents.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame, which can be a histogram of the SQL pushdown.
+
+    Returns
+    -------
+    np.ndarray
+        Number of records of every row, which is one unless the data is a histogram.
+    """
+    if NUMBER_OF_RECORDS_COLUMN in df:
+        return df[NUMBER_OF_RECORDS_COLUMN].to_numpy()
+    return np.ones(len(df), dtype=int)
+
+
+def _add_noise_to_event_counts(
+    km_df: pd.DataFrame, time_column_name: str, weighted: bool = False
+) -> pd.DataFrame:
+    """
+    Add noise to the aggregated event counts when this is requested by the data-
+    station.
+
+    Contrary to the event time noise, this noise is applied after aggregation. It
+    therefore scales with the number of rows in the event table rather than with the
+    number of records in the data. Every count receives its own noise, which depends
+    on the event time and the column of the count rather than on its position in the
+    table, see :func:`__count_noise`. Every call spends the privacy budget of the node,
+    see :func:`_spend_privacy_budget`.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Event table containing the ``observed`` and ``censored`` columns, aligned to
+        the global event times.
+    time_column_name : str
+        Name of the column representing time.
+    weighted : bool, optional
+        Whether the counts are sums of weights (default: False).
+
+    Returns
+    -------
+    pd.DataFrame
+        The event table with noised ``observed``, ``censored`` and ``removed`` counts.
+
+    Raises
+    ------
+    InputError
+        If the counts are weighted, as their sensitivity depends on the weights.
+    """
+    NOISE_TYPE = get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper()
+    if NOISE_TYPE not in (NoiseType.LAPLACE, NoiseType.GEOMETRIC):
+        return km_df
+    if weighted:
+        raise InputError(
+            "Weighted event counts can not be shared with noise on the event counts, "
+            "as a single record can change them by more than one."
+        )
+
+    EPSILON = get_env_var_as_float(
+        "KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS",
+        KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS,
+    )
+    if EPSILON <= 0:
+        raise EnvironmentVariableError(
+            f"Privacy budget for the event counts should be positive, got {EPSILON}."
+        )
+    _spend_privacy_budget(EPSILON)
+
+    # A single record contributes to exactly one cell of the (observed, censored)
+    # histogram, so the L1 sensitivity of the histogram is 1. The same holds when the
+    # observed events are split per cause.
+    cause_columns = [column for column in km_df if column.startswith("observed_")]
+    columns = [*(cause_columns or ["observed"]), "censored"]
+    counts = km_df[columns].to_numpy(dtype=float)
+    info(
+        f"{NOISE_TYPE.title()} noise is applied to the event counts "
+        f"(epsilon={EPSILON})."
+    )
+    noise = __count_noise(
+        km_df[time_column_name].to_numpy(), columns, NOISE_TYPE, EPSILON
+    )
+
+    # Negative counts do not make sense, the clipping is post-processing and does not
+    # affect the privacy guarantee.
+    km_df[columns] = np.clip(counts + noise, 0, None)
+    if cause_columns:
+        km_df["observed"] = km_df[cause_columns].sum(axis=1)
+    km_df["removed"] = km_df["observed"] + km_df["censored"]
+    return km_df
+
+
+def _add_noise_to_person_time(
+    km_df: pd.DataFrame, time_column_name: str, boundaries: np.ndarray
+) -> pd.DataFrame:
+    """
+    Add noise to the person-time of the hazard intervals when the node adds noise to
+    the event counts.
+
+    A single record spends at most ``boundaries[-1] - boundaries[0]`` person-time in
+    all intervals together, which is the L1 sensitivity of the person-time. Laplace
+    noise with this scale divided by the privacy budget is added, also when the
+    event counts receive geometric noise, as the person-time is not a count. The
+    noise spends the privacy budget once more, see :func:`_spend_privacy_budget`.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Interval table containing the ``person_time`` column.
+    time_column_name : str
+        Name of the column representing the start of the interval.
+    boundaries : np.ndarray
+        Increasing boundaries of the intervals.
+
+    Returns
+    -------
+    pd.DataFrame
+        The interval table with the noised ``person_time``.
+    """
+    NOISE_TYPE = get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper()
+    if NOISE_TYPE not in (NoiseType.LAPLACE, NoiseType.GEOMETRIC):
+        return km_df
+
+    EPSILON = get_env_var_as_float(
+        "KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS",
+        KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS,
+    )
+    _spend_privacy_budget(EPSILON)
+
+    sensitivity = boundaries[-1] - boundaries[0]
+    info(f"Laplace noise is applied to the person-time (epsilon={EPSILON}).")
+    noise = __count_noise(
+        km_df[time_column_name].to_numpy(),
+        ["person_time"],
+        NoiseType.LAPLACE,
+        EPSILON / sensitivity,
+        discrete=False,
+    )
+    # clipping negative person-time is post-processing
+    km_df["person_time"] = np.clip(km_df["person_time"] + noise[:, 0], 0, None)
+    return km_df
+
+
+def _add_noise_to_entry_counts(
+    km_df: pd.DataFrame, time_column_name: str
+) -> pd.DataFrame:
+    """
+    Add noise to the number of records that enter the study at every event time when
+    the node adds noise to the event counts.
+
+    The number at risk follows from the entries and the removals, so without this
+    noise the exact entries could be recovered from the shared event table. A single
+    record enters at exactly one event time, so the entries are noised with the same
+    mechanism as the event counts. This spends the privacy budget once more, see
+    :func:`_spend_privacy_budget`.
+
+    Parameters
+    ----------
+    km_df : pd.DataFrame
+        Event table containing the ``entered`` column, see :func:`_count_entries`.
+    time_column_name : str
+        Name of the column representing time.
+
+    Returns
+    -------
+    pd.DataFrame
+        The event table with the noised ``entered`` counts.
+    """
+    NOISE_TYPE = get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper()
+    if NOISE_TYPE not in (NoiseType.LAPLACE, NoiseType.GEOMETRIC):
+        return km_df
+
+    EPSILON = get_env_var_as_float(
+        "KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS",
+        KAPLAN_MEIER_PRIVACY_EPSILON_EVENT_COUNTS,
+    )
+    _spend_privacy_budget(EPSILON)
+
+    info(f"{NOISE_TYPE.title()} noise is applied to the entries (epsilon={EPSILON}).")
+    noise = __count_noise(
+        km_df[time_column_name].to_numpy(), ["entered"], NOISE_TYPE, EPSILON
+    )
+    # clipping negative counts is post-processing
+    km_df["entered"] = np.clip(km_df["entered"] + noise[:, 0], 0, None)
+    return km_df
+
+
+def _spend_privacy_budget(epsilon: float) -> None:
+    """
+    Spend privacy budget on noise on the event counts.
+
+    Repeated tasks each release noised event counts, so their privacy budgets add up.
+    The spent budget is recorded in a ledger of the node, and tasks are refused once
+    the total budget set by the node would be exceeded.
+
+    Parameters
+    ----------
+    epsilon : float
+        Privacy budget of the task.
+
+    Raises
+    ------
+    EnvironmentVariableError
+        If the node set a total budget, but the spent budget can not be recorded.
+    PrivacyThresholdViolation
+        If the total budget of the node would be exceeded.
+    """
+    BUDGET = get_env_var_as_float(
+        "KAPLAN_MEIER_PRIVACY_BUDGET_EVENT_COUNTS",
+        KAPLAN_MEIER_PRIVACY_BUDGET_EVENT_COUNTS,
+    )
+    path = ledger_path("privacy-budget")
+    try:
+        if path is None:
+            raise OSError(
+                "the data source is not a file and there is no cache directory"
+            )
+        total = add_to_ledger(path, epsilon, BUDGET)
+    except OSError as exc:
+        if BUDGET > 0:
+            raise EnvironmentVariableError(
+                f"The spent privacy budget can not be recorded: {exc}."
+            ) from exc
+        warn(f"The spent privacy budget is not recorded: {exc}.")
+        return
+
+    if total is None:
+        raise PrivacyThresholdViolation(
+            f"The privacy budget of {BUDGET} for the event counts of this node has "
+            "been spent."
+        )
+    info(f"Spent a privacy budget of {total} on the event counts of this node.")
+
+
+def _noise_settings() -> list:
+    """
+    Get the node settings that determine the noise on the event times. Cached results
+    that depend on the noised event times are keyed on these settings.
+
+    Returns
+    -------
+    list
+        Noise type, random seed and signal-to-noise ratio.
+    """
+    return [
+        get_env_var("KAPLAN_MEIER_TYPE_NOISE", KAPLAN_MEIER_TYPE_NOISE).upper(),
+        get_env_var("KAPLAN_MEIER_RANDOM_SEED", "0"),
+        get_env_var(
+            "KAPLAN_MEIER_PRIVACY_SNR_EVENT_TIME",
+            str(KAPLAN_MEIER_PRIVACY_SNR_EVENT_TIME),
+        ),
+    ]
+
+
+def __count_noise(
+    times: np.ndarray,
+    columns: List[str],
+    noise_type: str,
+    epsilon: float,
+    discrete: bool = True,
+) -> np.ndarray:
+    """
+    Draw noise for the event counts, rounded Laplace noise or two-sided geometric
+    noise (the discrete Laplace mechanism). Laplace noise can also be drawn without
+    rounding, for values that are not counts.
+
+    When the node set a noise secret, the noise of a count is derived from a keyed
+    hash of the event time, the column, the mechanism and the privacy budget. The same
+    count therefore always receives the same noise, and the noise of a count does not
+    depend on the other event times that are requested. Without a secret, fresh noise
+    is drawn for every task.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Event time of every row of the event table.
+    columns : List[str]
+        Names of the noised columns.
+    noise_type : str
+        Either ``"LAPLACE"`` or ``"GEOMETRIC"``.
+    epsilon : float
+        Privacy budget divided by the sensitivity.
+    discrete : bool, optional
+        Whether the Laplace noise is rounded to integers (default: True).
+
+    Returns
+    -------
+    np.ndarray
+        Noise of shape (number of event times, number of columns), integer valued
+        unless ``discrete`` is False.
+    """
+    SECRET = get_env_var("KAPLAN_MEIER_NOISE_SECRET", KAPLAN_MEIER_NOISE_SECRET)
+    shape = (len(times), len(columns), 2)
+    if SECRET:
+        key = hashlib.sha256(SECRET.encode("utf-8")).digest()
+        bits = np.empty(shape, dtype=np.uint64)
+        for j, column in enumerate(columns):
+            prefix = f"{noise_type}|{epsilon!r}|{column}|"
+            for i, time in enumerate(times):
+                digest = hashlib.blake2b(
+                    (prefix + float(time).hex()).encode("utf-8"),
+                    key=key,
+                    digest_size=16,
+                ).digest()
+                bits[i, j] = np.frombuffer(digest, dtype="<u8")
     else:
-        raise EnvironmentVariableError(f"Invalid noise type: {NOISE_TYPE}")
+        bits = np.random.default_rng().integers(
+            0, np.iinfo(np.uint64).max, size=shape, dtype=np.uint64, endpoint=True
+        )
+    # the 53 most significant bits give a uniform variable in the open interval (0, 1)
+    uniform = ((bits >> np.uint64(11)).astype(float) + 0.5) / 2.0**53
+
+    if noise_type == NoiseType.LAPLACE:
+        centered = uniform[..., 0] - 0.5
+        laplace = -np.sign(centered) * np.log1p(-2 * np.abs(centered)) / epsilon
+        return np.round(laplace) if discrete else laplace
+
+    # The difference of two i.i.d. geometric variables with success probability
+    # 1 - exp(-epsilon) follows the two-sided geometric distribution. The geometric
+    # variables are drawn by inverting their distribution function.
+    geometric = np.maximum(np.ceil(-np.log1p(-uniform) / epsilon), 1)
+    return geometric[..., 0] - geometric[..., 1]
 
 
 def __apply_gaussian_noise(df: pd.DataFrame, time_column_name: str) -> pd.DataFrame:
@@ -0,0 +1,182 @@
+"""
+This file contains the opt-in profiling of the partial and central functions. When the
+node administrator enables it, every call is run under cProfile and tracemalloc and a
+summary is written to the node log. The summary only contains aggregated statistics
+per function and per line of code (number of calls, time and allocated memory), so it
+never contains values from the data.
+"""
+
+import os
+import time
+import pstats
+import cProfile
+import tracemalloc
+
+from contextlib import contextmanager
+from functools import wraps
+from typing import Generator, List
+from vantage6.algorithm.tools.util import get_env_var, info
+
+from .globals import KAPLAN_MEIER_PROFILING
+
+# Number of functions and lines of code that are reported in the summary
+NUMBER_OF_STATISTICS = 20
+
+# Only the outermost profiled call is profiled, so that the partial functions that are
+# called by ``run_partials`` or by a mock client are part of the profile of the caller.
+_active = False
+
+
+def profiling_enabled() -> bool:
+    """
+    Check if the node administrator enabled the profiling.
+
+    Returns
+    -------
+    bool
+        True if the profiling is enabled.
+    """
+    return (
+        get_env_var("KAPLAN_MEIER_PROFILING", KAPLAN_MEIER_PROFILING).lower() == "true"
+    )
+
+
+@contextmanager
+def profile(name: str) -> Generator[None, None, None]:
+    """
+    Profile the code that is executed in this context when profiling is enabled, and
+    write a summary to the log when it exits.
+
+    The peak memory is only measured when tracemalloc is not already tracing, as it
+    would otherwise be reset for the code that started tracing.
+
+    Parameters
+    ----------
+    name : str
+        Name of the profiled function, used in the summary.
+    """
+    global _active
+    if _active or not profiling_enabled():
+        yield
+        return
+
+    _active = True
+    trace_memory = not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - start
+        snapshot, peak_memory = None, None
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        _active = False
+        for line in _summarize(name, duration, profiler, snapshot, peak_memory):
+            info(line)
+
+
+def profiled(func: callable) -> callable:
+    """
+    Decorator that profiles every call of a function when profiling is enabled.
+
+    Parameters
+    ----------
+    func : callable
+        Function to profile
+
+    Returns
+    -------
+    callable
+        Decorated function
+    """
+
+    @wraps(func)
+    def decorator(*args, **kwargs):
+        with profile(func.__name__):
+            return func(*args, **kwargs)
+
+    return decorator
+
+
+def _summarize(
+    name: str,
+    duration: float,
+    profiler: cProfile.Profile,
+    snapshot: tracemalloc.Snapshot | None,
+    peak_memory: int | None,
+) -> List[str]:
+    """
+    Summarize a profile in the lines that are written to the log.
+
+    Parameters
+    ----------
+    name : str
+        Name of the profiled function
+    duration : float
+        Wall clock time of the profiled function in seconds
+    profiler : cProfile.Profile
+        Profiler that profiled the function
+    snapshot : tracemalloc.Snapshot, optional
+        Memory allocations at the end of the function, None when they were not traced
+    peak_memory : int, optional
+        Peak of the traced memory in bytes, None when it was not traced
+
+    Returns
+    -------
+    List[str]
+        Lines of the summary
+    """
+    stats = pstats.Stats(profiler)
+    lines = [f"Profile of {name}: {duration:.3f} s"]
+    if peak_memory is not None:
+        lines.append(f"Peak traced memory: {peak_memory / 2**20:.1f} MiB")
+
+    lines.append(f"Top {NUMBER_OF_STATISTICS} functions by cumulative time:")
+    lines.append(f"{'ncalls':>10} {'tottime':>10} {'cumtime':>10}  function")
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    functions = functions[:NUMBER_OF_STATISTICS]
+    for (filename, lineno, function), (_, ncalls, tottime, cumtime, _) in functions:
+        lines.append(
+            f"{ncalls:>10} {tottime:>10.3f} {cumtime:>10.3f}  "
+            f"{_location(filename, lineno)}({function})"
+        )
+
+    if snapshot is not None:
+        lines.append(f"Top {NUMBER_OF_STATISTICS} lines by memory still allocated:")
+        lines.append(f"{'size':>12} {'count':>10}  line")
+        for statistic in snapshot.statistics("lineno")[:NUMBER_OF_STATISTICS]:
+            frame = statistic.traceback[0]
+            lines.append(
+                f"{statistic.size / 2**10:>9.1f} KiB {statistic.count:>10}  "
+                f"{_location(frame.filename, frame.lineno)}"
+            )
+    return lines
+
+
+def _location(filename: str, lineno: int) -> str:
+    """
+    Shorten a line of code to the file and the directory that contains it.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file
+    lineno : int
+        Line number in the file
+
+    Returns
+    -------
+    str
+        Location as ``directory/file:line``
+    """
+    directory, name = os.path.split(filename)
+    if directory:
+        name = f"{os.path.basename(directory)}/{name}"
+    return f"{name}:{lineno}"
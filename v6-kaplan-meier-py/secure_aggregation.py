@@ -0,0 +1,226 @@
+"""
+This file contains the pairwise masking used for secure aggregation.
+
+Every pair of nodes agrees on a shared secret using an X25519 key exchange, for which
+the public keys are relayed by the central method. Each node adds the masks it shares
+with the nodes that come after it and subtracts the masks it shares with the nodes
+that come before it. The masks are expanded from the shared secrets with the SHAKE-256
+extendable output function. All arithmetic is done modulo 2^64, so the masks cancel
+exactly when the masked count vectors of all nodes are summed. The central method
+therefore only learns the summed counts.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+
+from typing import List
+from cryptography.hazmat.primitives.asymmetric.x25519 import (
+    X25519PrivateKey,
+    X25519PublicKey,
+)
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from vantage6.algorithm.tools.util import get_env_var, warn
+from vantage6.algorithm.tools.exceptions import InputError
+
+from .globals import KAPLAN_MEIER_SECURE_AGGREGATION_SECRET
+
+# Columns of the event table that are summed using secure aggregation, in this order
+SECURE_AGGREGATION_COLUMNS = ["removed", "observed", "censored", "at_risk"]
+
+
+def fingerprint(data: pd.Series, number_of_records: np.ndarray | None = None) -> bytes:
+    """
+    Compute the fingerprint of node data that is used as secret input for the keys.
+
+    The fingerprint is computed from the sorted histogram of the values, so that it
+    does not depend on the order of the records, which is not stable for e.g. SQL
+    queries, nor on whether the data is loaded as records or as a histogram.
+
+    Parameters
+    ----------
+    data : pd.Series
+        Node data, it must contain the same values in both steps of the algorithm.
+    number_of_records : np.ndarray, optional
+        Number of records of every value, for a histogram (default: None, one record
+        per value).
+
+    Returns
+    -------
+    bytes
+        SHA-256 digest of the data.
+    """
+    if number_of_records is None:
+        number_of_records = np.ones(len(data), dtype=np.int64)
+    histogram = (
+        pd.Series(np.asarray(number_of_records, dtype=np.int64), index=data.to_numpy())
+        .groupby(level=0, dropna=False)
+        .sum()
+    )
+    values_hash = pd.util.hash_pandas_object(histogram.index, index=False).to_numpy()
+    return hashlib.sha256(
+        values_hash.tobytes() + histogram.to_numpy(dtype="<i8").tobytes()
+    ).digest()
+
+
+def get_public_key(session: str, data_fingerprint: bytes) -> str:
+    """
+    Get the public key of this node for a secure aggregation session.
+
+    Parameters
+    ----------
+    session : str
+        Identifier of the secure aggregation session, chosen by the central method.
+    data_fingerprint : bytes
+        Fingerprint of the node data, see :func:`fingerprint`.
+
+    Returns
+    -------
+    str
+        Hex encoded public key.
+    """
+    return _public_key_hex(_get_private_key(session, data_fingerprint))
+
+
+def mask_counts(
+    counts: np.ndarray, session: str, public_keys: List[str], data_fingerprint: bytes
+) -> np.ndarray:
+    """
+    Mask a matrix of non-negative integer counts.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Counts to mask, every node should supply a matrix of the same shape.
+    session : str
+        Identifier of the secure aggregation session.
+    public_keys : List[str]
+        Hex encoded public keys of all participating nodes.
+    data_fingerprint : bytes
+        Fingerprint of the node data, see :func:`fingerprint`.
+
+    Returns
+    -------
+    np.ndarray
+        The masked counts as unsigned 64 bit integers.
+
+    Raises
+    ------
+    InputError
+        If the public key of this node is not (uniquely) present in ``public_keys``.
+    """
+    private_key = _get_private_key(session, data_fingerprint)
+    own_public_key = _public_key_hex(private_key)
+    if public_keys.count(own_public_key) != 1:
+        raise InputError("Could not identify this node in the secure aggregation.")
+    own_position = public_keys.index(own_public_key)
+
+    masked = np.round(counts).astype(np.uint64)
+    for position, public_key in enumerate(public_keys):
+        if position == own_position:
+            continue
+        shared_secret = private_key.exchange(
+            X25519PublicKey.from_public_bytes(bytes.fromhex(public_key))
+        )
+        mask = _expand_mask(shared_secret, session, masked.shape)
+        # unsigned integer arithmetic wraps around, i.e. it is modulo 2^64
+        if own_position < position:
+            masked += mask
+        else:
+            masked -= mask
+    return masked
+
+
+def sum_masked_counts(masked_counts: List[np.ndarray]) -> np.ndarray:
+    """
+    Sum the masked counts of all nodes, which removes the masks.
+
+    Parameters
+    ----------
+    masked_counts : List[np.ndarray]
+        Masked counts of every node.
+
+    Returns
+    -------
+    np.ndarray
+        Summed counts.
+    """
+    total = np.zeros_like(np.asarray(masked_counts[0], dtype=np.uint64))
+    for masked in masked_counts:
+        total += np.asarray(masked, dtype=np.uint64)
+    return total.astype(np.int64)
+
+
+def _expand_mask(shared_secret: bytes, session: str, shape: tuple) -> np.ndarray:
+    """
+    Expand a shared secret into a mask of uniformly distributed 64 bit integers.
+
+    Parameters
+    ----------
+    shared_secret : bytes
+        Secret shared by a pair of nodes.
+    session : str
+        Identifier of the secure aggregation session.
+    shape : tuple
+        Shape of the mask.
+
+    Returns
+    -------
+    np.ndarray
+        The mask as unsigned 64 bit integers.
+    """
+    xof = hashlib.shake_256(b"km-mask" + shared_secret + session.encode("utf-8"))
+    mask = np.frombuffer(xof.digest(8 * int(np.prod(shape))), dtype="<u8")
+    return mask.astype(np.uint64).reshape(shape)
+
+
+def _get_private_key(session: str, data_fingerprint: bytes) -> X25519PrivateKey:
+    """
+    Derive the private key of this node for a secure aggregation session.
+
+    The key needs to be the same in both steps of the algorithm, which run in
+    different containers. It is therefore derived from the node secret, the session
+    and the node data, which are all available in both steps.
+
+    Parameters
+    ----------
+    session : str
+        Identifier of the secure aggregation session.
+    data_fingerprint : bytes
+        Fingerprint of the node data, which is used as additional secret input.
+
+    Returns
+    -------
+    X25519PrivateKey
+        The private key.
+    """
+    secret = get_env_var(
+        "KAPLAN_MEIER_SECURE_AGGREGATION_SECRET", KAPLAN_MEIER_SECURE_AGGREGATION_SECRET
+    )
+    if not secret:
+        warn(
+            "No secure aggregation secret is set, the key is derived from the session "
+            "and the data only."
+        )
+    key_material = hashlib.sha256()
+    for part in (secret.encode("utf-8"), session.encode("utf-8"), data_fingerprint):
+        key_material.update(hashlib.sha256(part).digest())
+    return X25519PrivateKey.from_private_bytes(key_material.digest())
+
+
+def _public_key_hex(private_key: X25519PrivateKey) -> str:
+    """
+    Get the hex encoded public key that belongs to a private key.
+
+    Parameters
+    ----------
+    private_key : X25519PrivateKey
+        The private key.
+
+    Returns
+    -------
+    str
+        Hex encoded public key.
+    """
+    public_key = private_key.public_key()
+    return public_key.public_bytes(Encoding.Raw, PublicFormat.Raw).hex()
@@ -0,0 +1,304 @@
+"""
+This file contains the SQL pushdown of the partial functions. Instead of loading all
+records of the node query into pandas, the records are counted per distinct
+combination of the requested columns inside the database. Only this histogram is
+transferred to the algorithm, where the number of records of every row is used as a
+frequency weight. When the partial function only needs the event times in bins (a
+time grid or hazard intervals), the event times are binned inside the database as
+well.
+"""
+
+import os
+import pandas as pd
+
+from typing import List, NamedTuple, Tuple
+from vantage6.algorithm.tools.util import get_env_var, info
+
+from .globals import KAPLAN_MEIER_SQL_PUSHDOWN
+
+# Name of the column that contains the number of records in the histogram
+NUMBER_OF_RECORDS_COLUMN = "km_number_of_records"
+
+# Name of the column that contains the sum of the event times of the records in a bin
+TIME_SUM_COLUMN = "km_time_sum"
+
+# File extensions of embedded databases and their SQLAlchemy URI, as used by vantage6
+EMBEDDED_DATABASES = {"sqlite": "sqlite:///{0}"}
+
+
+class SQLCohort(NamedTuple):
+    """The records selected by the node query, with the pushed down filters."""
+
+    engine: object
+    query: str
+    columns: List[str]
+    where: str
+    parameters: dict
+
+
+class TimeBins(NamedTuple):
+    """Bins of the time column that are computed inside the database.
+
+    With ``closed="right"`` the edges are the points of a time grid with a constant
+    width, and the bins are ``edges[i - 1] < t <= edges[i]``. With ``closed="left"``
+    the edges are the boundaries of hazard intervals, and the bins are
+    ``edges[i] <= t < edges[i + 1]``. Negative times, times before the first edge and
+    times after the last edge are in separate bins.
+    """
+
+    column: str
+    edges: List[float]
+    closed: str
+    time_sum: bool = False
+
+
+def sql_pushdown_enabled() -> bool:
+    """
+    Check if the node administrator enabled the SQL pushdown.
+
+    Returns
+    -------
+    bool
+        True if the SQL pushdown is enabled.
+    """
+    return (
+        get_env_var("KAPLAN_MEIER_SQL_PUSHDOWN", KAPLAN_MEIER_SQL_PUSHDOWN).lower()
+        == "true"
+    )
+
+
+def get_sql_cohort(
+    database_uri: str | None,
+    query: str | None,
+    conditions: List[Tuple[str, str, float]] | None,
+) -> SQLCohort | None:
+    """
+    Prepare the node query for the SQL pushdown.
+
+    Parameters
+    ----------
+    database_uri : str | None
+        URI of the database, or the path of an embedded database.
+    query : str | None
+        Query of the node that selects the records.
+    conditions : List[Tuple[str, str, float]] | None
+        Filter conditions of the node preprocessing, see
+        :func:`.cache.filter_conditions`. None when the preprocessing can not be
+        pushed down.
+
+    Returns
+    -------
+    SQLCohort | None
+        The cohort, or None when the pushdown is not possible.
+    """
+    if not database_uri or not query or conditions is None:
+        return None
+
+    # SQLAlchemy is a dependency of the vantage6 algorithm tools, but it is only
+    # needed for SQL databases.
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(_sqlalchemy_uri(database_uri))
+    query = query.strip().rstrip(";")
+    with engine.connect() as connection:
+        columns = list(
+            connection.execute(
+                text(f"SELECT * FROM ({query}) AS cohort WHERE 1 = 0")
+            ).keys()
+        )
+
+    # Column names are only used in the SQL statements after they have been checked
+    # against the columns of the query, and they are always quoted.
+    quote = engine.dialect.identifier_preparer.quote
+    where, parameters = [], {}
+    for i, (column, comparison, value) in enumerate(conditions):
+        if column not in columns:
+            info(f"Filter column '{column}' not found, skipping the SQL pushdown.")
+            return None
+        where.append(f"{quote(column)} {comparison} :value_{i}")
+        parameters[f"value_{i}"] = value
+
+    return SQLCohort(
+        engine=engine,
+        query=query,
+        columns=columns,
+        where=f"WHERE {' AND '.join(where)}" if where else "",
+        parameters=parameters,
+    )
+
+
+def count_sql_records(cohort: SQLCohort) -> int:
+    """
+    Count the records of the cohort inside the database.
+
+    Parameters
+    ----------
+    cohort : SQLCohort
+        The cohort, as obtained from :func:`get_sql_cohort`.
+
+    Returns
+    -------
+    int
+        Number of records.
+    """
+    from sqlalchemy import text
+
+    statement = f"SELECT COUNT(*) FROM ({cohort.query}) AS cohort {cohort.where}"
+    with cohort.engine.connect() as connection:
+        return connection.execute(text(statement), cohort.parameters).scalar()
+
+
+def load_sql_histogram(
+    cohort: SQLCohort, columns: List[str], bins: TimeBins | None = None
+) -> pd.DataFrame:
+    """
+    Load the requested columns of the cohort as a histogram.
+
+    The database counts the records per distinct combination of the requested
+    columns, which is returned in the :data:`NUMBER_OF_RECORDS_COLUMN` column. Every
+    row of the histogram therefore represents that number of records.
+
+    When bins are requested, the records are grouped by the bin of their time instead
+    of by their time. The time of a row is then the first (``closed="left"``) or last
+    (``closed="right"``) time in its bin, which lies in the same bin as all records of
+    the row. With ``time_sum``, the sum of the times of the records of every row is
+    returned in the :data:`TIME_SUM_COLUMN` column. When the database can not compute
+    the bins, the times are loaded without binning.
+
+    Parameters
+    ----------
+    cohort : SQLCohort
+        The cohort, as obtained from :func:`get_sql_cohort`.
+    columns : List[str]
+        Names of the columns to load. Columns that are not selected by the node query
+        are ignored.
+    bins : TimeBins, optional
+        Bins of the time column (default: None, no binning).
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the requested columns and the number of records of every row.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    columns = [column for column in columns if column in cohort.columns]
+    if not columns:
+        return pd.DataFrame()
+
+    quote = cohort.engine.dialect.identifier_preparer.quote
+    selection = ", ".join(quote(column) for column in columns)
+    statement = (
+        f"SELECT {selection}, COUNT(*) AS {NUMBER_OF_RECORDS_COLUMN} "
+        f"FROM ({cohort.query}) AS cohort {cohort.where} GROUP BY {selection}"
+    )
+    parameters = cohort.parameters
+    result_columns = [*columns, NUMBER_OF_RECORDS_COLUMN]
+    binned = bins is not None and bins.column in columns
+    if binned:
+        statement, parameters, result_columns = _binned_statement(cohort, columns, bins)
+
+    with cohort.engine.connect() as connection:
+        try:
+            result = connection.execute(text(statement), parameters).fetchall()
+        except DBAPIError as exception:
+            if not binned:
+                raise
+            info(f"Could not bin the times in the database: {exception.orig}")
+            return load_sql_histogram(cohort, columns)
+    histogram = pd.DataFrame(result, columns=result_columns)
+    info(f"Loaded a histogram of {len(histogram)} rows from the database.")
+    return histogram
+
+
+def _binned_statement(
+    cohort: SQLCohort, columns: List[str], bins: TimeBins
+) -> Tuple[str, dict, List[str]]:
+    """
+    Build the statement that counts the records per bin of the time column and per
+    distinct combination of the other columns.
+
+    The bins of a time grid have a constant width and are found by rounding up the
+    time divided by the width. Hazard intervals are found by comparing the time with
+    every boundary.
+
+    Parameters
+    ----------
+    cohort : SQLCohort
+        The cohort, as obtained from :func:`get_sql_cohort`.
+    columns : List[str]
+        Names of the requested columns, which include the time column.
+    bins : TimeBins
+        Bins of the time column.
+
+    Returns
+    -------
+    Tuple[str, dict, List[str]]
+        The statement, its parameters and the names of the columns of its result.
+    """
+    quote = cohort.engine.dialect.identifier_preparer.quote
+    time = quote(bins.column)
+    edges = [float(edge) for edge in bins.edges]
+    parameters = {**cohort.parameters, "first_edge": edges[0], "last_edge": edges[-1]}
+    if bins.closed == "right":
+        parameters["width"] = edges[1] - edges[0]
+        time_bin = (
+            f"WHEN {time} <= :first_edge THEN 0 "
+            f"WHEN {time} > :last_edge THEN {len(edges)} "
+            f"ELSE CEILING({time} / :width)"
+        )
+        representative = "MAX"
+    else:
+        conditions = [f"WHEN {time} < :first_edge THEN -1"]
+        for i, edge in enumerate(edges[1:]):
+            parameters[f"edge_{i}"] = edge
+            conditions.append(f"WHEN {time} < :edge_{i} THEN {i}")
+        time_bin = f"{' '.join(conditions)} ELSE {len(edges)}"
+        representative = "MIN"
+    # Negative times have their own bin, so that they are still reported as negative
+    time_bin = f"CASE WHEN {time} < 0 THEN -2 {time_bin} END"
+
+    others = [quote(column) for column in columns if column != bins.column]
+    selection = [
+        *others,
+        f"{representative}({time}) AS {time}",
+        f"COUNT(*) AS {NUMBER_OF_RECORDS_COLUMN}",
+    ]
+    result_columns = [
+        *[column for column in columns if column != bins.column],
+        bins.column,
+        NUMBER_OF_RECORDS_COLUMN,
+    ]
+    if bins.time_sum:
+        selection.append(f"SUM({time}) AS {TIME_SUM_COLUMN}")
+        result_columns.append(TIME_SUM_COLUMN)
+
+    statement = (
+        f"SELECT {', '.join(selection)} FROM ("
+        f"SELECT cohort.*, {time_bin} AS km_time_bin "
+        f"FROM ({cohort.query}) AS cohort {cohort.where}"
+        f") AS binned GROUP BY {', '.join([*others, 'km_time_bin'])}"
+    )
+    return statement, parameters, result_columns
+
+
+def _sqlalchemy_uri(database_uri: str) -> str:
+    """
+    Get the SQLAlchemy URI of a database.
+
+    Parameters
+    ----------
+    database_uri : str
+        URI of the database, or the path of an embedded database.
+
+    Returns
+    -------
+    str
+        SQLAlchemy URI.
+    """
+    if os.path.isabs(database_uri) and not database_uri.endswith("/"):
+        extension = database_uri.rsplit(".", 1)[-1]
+        if extension in EMBEDDED_DATABASES:
+            return EMBEDDED_DATABASES[extension].format(database_uri)
+    return database_uri
@@ -1,4 +1,22 @@
-from vantage6.algorithm.tools.util import get_env_var
+import zlib
+import base64
+import numpy as np
+import pandas as pd
+
+from vantage6.algorithm.tools.util import get_env_var, info, warn
+
+from .globals import KAPLAN_MEIER_FLOAT_PRECISION, KAPLAN_MEIER_RESULT_SIZE_BUDGET
+
+# Columns of an event table that count records, or sum their (squared) weights, these
+# are summed when event times are combined. The number of observed events per cause
+# (``observed_<cause>``) are counts as well.
+COUNT_COLUMNS = [
+    "removed",
+    "observed",
+    "censored",
+    "removed_squared",
+    "observed_squared",
+]
 
 
 # FIXME: FM 22-05-2024 This function will be released with vantage6 4.5.0, and can be
@@ -81,3 +99,245 @@ def get_env_var_as_list(envvar_name: str, default: str, separator: str = ",") ->
     """
     envvar = get_env_var(envvar_name, default)
     return envvar.split(separator)
+
+
+def encode_event_times(event_times: np.ndarray) -> dict:
+    """
+    Encode event times in a compact, JSON serializable format.
+
+    The unique event times are sorted. Integer event times are stored as the first
+    event time and the differences between consecutive event times, using the
+    smallest unsigned integer type that fits the largest difference. Other event times
+    are stored as 64-bit floats. The array is compressed and base64 encoded.
+
+    Parameters
+    ----------
+    event_times : np.ndarray
+        Event times, missing event times are ignored.
+
+    Returns
+    -------
+    dict
+        The encoded event times, see :func:`decode_event_times`.
+    """
+    event_times = np.asarray(event_times, dtype=float)
+    event_times = np.unique(event_times[~np.isnan(event_times)])
+
+    integral = np.all(event_times == np.round(event_times)) and np.all(
+        np.abs(event_times) < 2**53
+    )
+    if integral and len(event_times):
+        event_times = event_times.astype(np.int64)
+        deltas = np.diff(event_times)
+        dtype = np.min_scalar_type(deltas.max() if len(deltas) else 0)
+        return {
+            "encoding": "delta",
+            "start": int(event_times[0]),
+            "dtype": dtype.newbyteorder("<").str,
+            "values": _encode_array(deltas.astype(dtype.newbyteorder("<"))),
+        }
+    return {
+        "encoding": "sorted",
+        "dtype": "<f8",
+        "values": _encode_array(event_times.astype("<f8")),
+    }
+
+
+def decode_event_times(encoded: dict | list) -> np.ndarray:
+    """
+    Decode event times that were encoded by :func:`encode_event_times`.
+
+    Parameters
+    ----------
+    encoded : dict | list
+        The encoded event times. A plain list of event times is also accepted.
+
+    Returns
+    -------
+    np.ndarray
+        The sorted unique event times.
+    """
+    if not isinstance(encoded, dict):
+        return np.unique(np.asarray(encoded, dtype=float))
+
+    values = np.frombuffer(
+        zlib.decompress(base64.b64decode(encoded["values"])), dtype=encoded["dtype"]
+    )
+    if encoded["encoding"] == "delta":
+        event_times = np.empty(len(values) + 1, dtype=np.int64)
+        event_times[0] = encoded["start"]
+        np.cumsum(values, out=event_times[1:])
+        event_times[1:] += encoded["start"]
+        return event_times
+    return values.astype(float)
+
+
+def get_time_grid(width: float, horizon: float) -> np.ndarray:
+    """
+    Get the time grid with a fixed width up to a maximum horizon.
+
+    Parameters
+    ----------
+    width : float
+        Distance between two grid points, e.g. 7 for weeks when time is in days.
+        Must be positive.
+    horizon : float
+        Maximum horizon. The last grid point is the first grid point at or after the
+        horizon. Must be positive.
+
+    Returns
+    -------
+    np.ndarray
+        The grid points, starting at 0.
+    """
+    return width * np.arange(int(np.ceil(horizon / width)) + 1)
+
+
+def event_table_to_json(
+    km: pd.DataFrame,
+    time_column_name: str,
+    label: str = "last",
+    allow_coarsening: bool = True,
+) -> str:
+    """
+    Serialize an event table or Kaplan-Meier curve to JSON within the size budget.
+
+    Columns that only contain whole numbers are written as integers, and other
+    columns with the number of decimal places set by the node. When the result
+    exceeds the size budget of the node, the resolution is halved until it fits:
+    consecutive event times are combined, see :func:`coarsen_event_table`.
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Event table sorted by time.
+    time_column_name : str
+        Name of the column containing the event times.
+    label : str, optional
+        Event time that represents combined event times, see
+        :func:`coarsen_event_table` (default: "last").
+    allow_coarsening : bool, optional
+        Whether event times may be combined to fit the size budget. Disable this when
+        other results refer to the event times of the table (default: True).
+
+    Returns
+    -------
+    str
+        The event table as JSON string.
+    """
+    FLOAT_PRECISION = get_env_var_as_int(
+        "KAPLAN_MEIER_FLOAT_PRECISION", KAPLAN_MEIER_FLOAT_PRECISION
+    )
+    SIZE_BUDGET = get_env_var_as_int(
+        "KAPLAN_MEIER_RESULT_SIZE_BUDGET", KAPLAN_MEIER_RESULT_SIZE_BUDGET
+    )
+
+    result = _compact_dtypes(km).to_json(double_precision=FLOAT_PRECISION)
+    group_size = 1
+    while allow_coarsening and 0 < SIZE_BUDGET < len(result) and group_size < len(km):
+        group_size *= 2
+        coarse = coarsen_event_table(km, time_column_name, group_size, label)
+        result = _compact_dtypes(coarse).to_json(double_precision=FLOAT_PRECISION)
+
+    if group_size > 1:
+        info(f"Combined every {group_size} event times to fit the result size budget.")
+    if 0 < SIZE_BUDGET < len(result):
+        warn(f"The result of {len(result)} bytes exceeds the size budget.")
+    return result
+
+
+def coarsen_event_table(
+    km: pd.DataFrame, time_column_name: str, group_size: int, label: str = "last"
+) -> pd.DataFrame:
+    """
+    Combine groups of consecutive event times.
+
+    The counts of a group are summed and the number at risk is the number at risk at
+    the first event time of the group. When ``label`` is ``"last"``, the group is
+    reported at its last event time, and all other columns (e.g. the survival) take
+    their value at that time, so that these remain exact at the reported event times.
+    The hazard is recomputed from the survival. When ``label`` is ``"first"``, the
+    group is reported at its first event time, as is done when nodes merge event
+    times.
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Event table sorted by time.
+    time_column_name : str
+        Name of the column containing the event times.
+    group_size : int
+        Number of consecutive event times to combine.
+    label : str, optional
+        Either ``"first"`` or ``"last"`` (default: "last").
+
+    Returns
+    -------
+    pd.DataFrame
+        The coarsened event table.
+    """
+    starts = np.arange(0, len(km), group_size)
+    ends = np.minimum(starts + group_size, len(km)) - 1
+    representative = ends if label == "last" else starts
+
+    coarse = km.iloc[representative].reset_index(drop=True)
+    count_columns = [
+        column
+        for column in km
+        if column in COUNT_COLUMNS or column.startswith("observed_")
+    ]
+    coarse[count_columns] = np.add.reduceat(
+        km[count_columns].to_numpy(dtype=float), starts, axis=0
+    )
+    for column in ["at_risk", "at_risk_squared"]:
+        if column in km:
+            coarse[column] = km[column].to_numpy()[starts]
+    if "hazard" in km and "survival_cdf" in km:
+        survival = coarse["survival_cdf"].to_numpy()
+        survival_before = np.concatenate(([1.0], survival[:-1]))
+        coarse["hazard"] = np.divide(
+            survival_before - survival,
+            survival_before,
+            out=np.zeros_like(survival),
+            where=survival_before > 0,
+        )
+    return coarse
+
+
+def _compact_dtypes(km: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert float columns that only contain whole numbers to integers.
+
+    Parameters
+    ----------
+    km : pd.DataFrame
+        Event table.
+
+    Returns
+    -------
+    pd.DataFrame
+        Event table with integer columns where possible.
+    """
+    km = km.copy(deep=False)
+    for column in km.select_dtypes(include="float"):
+        values = km[column].to_numpy()
+        if np.all(np.isfinite(values)) and np.all(values == np.round(values)):
+            km[column] = values.astype(np.int64)
+    return km
+
+
+def _encode_array(array: np.ndarray) -> str:
+    """
+    Compress an array and encode it as base64 string.
+
+    Parameters
+    ----------
+    array : np.ndarray
+        Array to encode.
+
+    Returns
+    -------
+    str
+        The encoded array.
+    """
+    return base64.b64encode(zlib.compress(array.tobytes())).decode("ascii")